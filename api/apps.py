@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class ApiConfig(AppConfig):
     name = 'api'
+
+    def ready(self):
+        from . import receivers  # noqa: F401
+        from todo_list_project.db import sqlite  # noqa: F401
@@ -0,0 +1,278 @@
+import asyncio
+import functools
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import user_logged_in
+from django.core import signals
+from django.core.exceptions import RequestAborted
+from django.core.handlers.asgi import ASGIHandler
+from django.db import close_old_connections
+from django.http import HttpResponse, QueryDict
+from django.urls import set_script_prefix
+from rest_framework.exceptions import AuthenticationFailed, Throttled
+
+from api.authentication import SignedTokenAuthentication
+from api.events import RESET, format_event, get_broker
+from api.throttling import PasswordAttemptThrottle, ServiceOverloaded, take_attempt
+from users.backends import CustomBackend
+from users.hashers import HashingOverloaded
+
+
+class AsyncAPIHandler(ASGIHandler):
+    """
+    ASGI handler serving the API without a thread per connection.
+
+    Django 3.0 has neither async views nor async ORM and its ASGIHandler runs every view in one
+    shared thread. For paths under ASYNC_API['PREFIX'] this handler reads and writes HTTP on the
+    event loop and runs the regular (synchronous) middleware and DRF views in a bounded pool of
+    ASYNC_API['WORKERS'] threads, streaming responses are iterated in a thread of their own.
+    Token issuing is served natively: queries go through the pool and password checks await the
+    hasher pool. Server-sent events of todo list changes are streamed natively, an open stream is a coroutine
+    waiting on its queue and holds no thread. Other paths (the admin) are served by Django's ASGIHandler
+    """
+    def __init__(self):
+        super().__init__()
+        self.executor = ThreadPoolExecutor(max_workers=settings.ASYNC_API['WORKERS'], thread_name_prefix='async-api')
+        self.native_views = {
+            settings.ASYNC_API['PREFIX'] + 'token/': self.token,
+        }
+        self.stream_views = {}
+        if settings.TODO_LIST_EVENTS['ENABLED']:
+            self.stream_views[settings.ASYNC_API['PREFIX'] + 'todo_lists/events/'] = self.todo_list_events
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not scope['path'].startswith(settings.ASYNC_API['PREFIX']):
+            return await super().__call__(scope, receive, send)
+
+        try:
+            body_file = await self.read_body(receive)
+        except RequestAborted:
+            return
+
+        set_script_prefix(self.get_script_prefix(scope))
+
+        request, error_response = self.create_request(scope, body_file)
+        if request is None:
+            await self.send_response(error_response, send)
+            return
+
+        stream_view = self.stream_views.get(scope['path'])
+        if stream_view is not None and request.method == 'GET':
+            await stream_view(request, receive, send)
+            return
+
+        native_view = self.native_views.get(scope['path'])
+        if native_view is not None and request.method == 'POST' and request.content_type in (
+            'application/json', 'application/x-www-form-urlencoded',
+        ):
+            response = await native_view(request)
+        else:
+            response = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self.get_response_in_thread, request,
+            )
+
+        await self.send_response(response, send)
+
+    async def run_sync(self, func, *args, **kwargs):
+        """
+        Run a blocking callable in the bounded thread pool without blocking the event loop,
+        database connections of the thread are checked before and after like around a request
+        """
+        loop = asyncio.get_running_loop()
+
+        call = functools.partial(self.call_with_connection, func, *args, **kwargs)
+
+        return await loop.run_in_executor(self.executor, call)
+
+    @staticmethod
+    def call_with_connection(func, *args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    def get_response_in_thread(self, request):
+        """
+        Handle the request like the WSGI handler does, the response is rendered and, unless it is streaming,
+        closed in the same thread, so request_finished closes the database connection of this thread
+        """
+        signals.request_started.send(sender=self.__class__, environ=request.META)
+
+        response = self.get_response(request)
+        response._handler_class = self.__class__
+
+        if not response.streaming:
+            response.close()
+
+        return response
+
+    async def send_response(self, response, send):
+        """
+        Send the response, streaming content is pulled from a thread of its own since it may query the database
+        """
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': self.get_response_headers(response),
+        })
+
+        if not response.streaming:
+            for chunk, last in self.chunk_bytes(response.content):
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': not last})
+            return
+
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='async-api-stream') as stream_executor:
+            chunks = iter(response)
+            try:
+                while True:
+                    part = await loop.run_in_executor(stream_executor, next, chunks, None)
+                    if part is None:
+                        break
+
+                    for chunk, _ in self.chunk_bytes(part):
+                        await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+
+                await send({'type': 'http.response.body'})
+            finally:
+                await loop.run_in_executor(stream_executor, response.close)
+
+    @staticmethod
+    def get_response_headers(response):
+        headers = [(header.encode('ascii'), value.encode('latin1')) for header, value in response.items()]
+        headers.extend(
+            (b'Set-Cookie', cookie.output(header='').encode('ascii').strip()) for cookie in response.cookies.values()
+        )
+
+        return headers
+
+    async def token(self, request):
+        """
+        Native variant of api.views.TokenView
+        """
+        if request.content_type == 'application/json':
+            try:
+                data = json.loads(request.body or b'{}')
+            except ValueError:
+                data = None
+        else:
+            data = QueryDict(request.body, encoding=request.encoding)
+
+        if not hasattr(data, 'get'):
+            return self.json_response({'detail': 'JSON parse error'}, status=400)
+
+        wait = take_attempt(PasswordAttemptThrottle().get_ident(request), data.get('email'), data.get('organization'))
+        if wait:
+            return self.exception_response(Throttled(wait))
+
+        try:
+            user = await CustomBackend().authenticate_async(
+                self.run_sync,
+                email=data.get('email'),
+                organization=data.get('organization'),
+                password=data.get('password'),
+            )
+        except HashingOverloaded:
+            return self.exception_response(ServiceOverloaded())
+
+        if user is None:
+            return self.json_response('Invalid login', status=400)
+
+        await self.run_sync(user_logged_in.send, sender=user.__class__, request=request, user=user)
+        token, expires = SignedTokenAuthentication.issue_token(user)
+
+        return self.json_response({'token': token, 'expires': expires})
+
+    async def todo_list_events(self, request, receive, send):
+        """
+        Server-sent events of the changes of the user's organization (see api.events), every event is a change feed
+        response with its token as the event id. Authenticated with a signed token in the Authorization header or,
+        since EventSource can not set headers, in ?token=. The stream ends when the client disconnects or does not
+        keep up with the events (a "reset" event)
+        """
+        token = request.GET.get('token')
+        if token:
+            request.META['HTTP_AUTHORIZATION'] = '%s %s' % (SignedTokenAuthentication.keyword, token)
+
+        try:
+            authenticated = SignedTokenAuthentication().authenticate(request)
+        except AuthenticationFailed as exc:
+            authenticated, detail = None, exc.detail
+        else:
+            detail = 'Authentication credentials were not provided.'
+
+        if authenticated is None:
+            await self.send_response(self.json_response({'detail': detail}, status=403), send)
+            return
+
+        broker = get_broker()
+        subscription = broker.subscribe(authenticated[0].organization_id_id)
+        if subscription is None:
+            await self.send_response(self.json_response({'detail': 'Too many event streams.'}, status=503), send)
+            return
+
+        disconnected = asyncio.ensure_future(self.wait_for_disconnect(receive))
+        try:
+            await send({
+                'type': 'http.response.start',
+                'status': 200,
+                'headers': [
+                    (b'Content-Type', b'text/event-stream'),
+                    (b'Cache-Control', b'no-cache'),
+                    (b'X-Accel-Buffering', b'no'),
+                ],
+            })
+            await send({'type': 'http.response.body', 'body': b': connected\n\n', 'more_body': True})
+
+            while True:
+                event = asyncio.ensure_future(subscription.get())
+                done, _ = await asyncio.wait(
+                    {event, disconnected},
+                    timeout=settings.TODO_LIST_EVENTS['KEEPALIVE'],
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+
+                if event not in done:
+                    event.cancel()
+                    if disconnected in done:
+                        return
+
+                    await send({'type': 'http.response.body', 'body': b': keep-alive\n\n', 'more_body': True})
+                elif event.result() is RESET:
+                    await send({'type': 'http.response.body', 'body': format_event({}, name='reset')})
+                    return
+                else:
+                    await send({'type': 'http.response.body', 'body': format_event(event.result()), 'more_body': True})
+        finally:
+            disconnected.cancel()
+            broker.unsubscribe(subscription)
+
+    @staticmethod
+    async def wait_for_disconnect(receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    @classmethod
+    def exception_response(cls, exc):
+        """
+        Response of a DRF exception telling the client to retry later, as DRF's exception handler makes it
+        """
+        response = cls.json_response({'detail': exc.detail}, status=exc.status_code)
+        response['Retry-After'] = '%d' % exc.wait
+
+        return response
+
+    @staticmethod
+    def json_response(data, status=200):
+        """
+        JSON response encoded the same way as the compact DRF JSONRenderer
+        """
+        content = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode()
+
+        response = HttpResponse(content, status=status, content_type='application/json')
+        response['Content-Length'] = len(content)
+
+        return response
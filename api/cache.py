@@ -0,0 +1,151 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+from todo_list_project.db.routers import read_from_replica
+
+
+class OrganizationResponseCache:
+    """
+    Cache of serialized API payloads keyed by organization and a per-organization version counter.
+
+    Any write to the organization's lines bumps the version (see api.receivers), so cached payloads
+    of older versions are never read again and expire on their own. The ETag of a resource is the version
+    with a digest of its URL
+    """
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[settings.TODO_LIST_CACHE['ALIAS']]
+
+    @staticmethod
+    def _version_key(organization_id):
+        return 'todo_lists:version:%s' % organization_id
+
+    def get_version(self, organization_id):
+        """
+        Return the current version of the organization's payloads
+        """
+        key = self._version_key(organization_id)
+        version = self.cache.get(key)
+
+        if version is None:
+            # A time based start, so a version evicted from the cache does not reuse older payloads
+            self.cache.add(key, time.time_ns(), timeout=None)
+            version = self.cache.get(key)
+
+        return version
+
+    def bump(self, organization_id):
+        """
+        Invalidate the organization's payloads now and, if called inside a transaction, once more
+        after it commits, so a payload read by a concurrent request before the commit is not kept
+        """
+        self._bump(organization_id)
+
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(lambda: self._bump(organization_id))
+
+    def _bump(self, organization_id):
+        try:
+            self.cache.incr(self._version_key(organization_id))
+        except ValueError:
+            self.cache.add(self._version_key(organization_id), time.time_ns(), timeout=None)
+
+    @staticmethod
+    def _payload_key(organization_id, version, url):
+        return 'todo_lists:payload:%s:%s:%s' % (organization_id, version, url_digest(url))
+
+    @staticmethod
+    def get_etag(organization_id, version, url):
+        return '"%s-%s-%s"' % (organization_id, version, url_digest(url)[:16])
+
+    def get(self, organization_id, version, url):
+        return self.cache.get(self._payload_key(organization_id, version, url))
+
+    def set(self, organization_id, version, url, data):
+        self.cache.set(self._payload_key(organization_id, version, url), data, settings.TODO_LIST_CACHE['TIMEOUT'])
+
+    def count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'not_modified': self.not_modified}
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = self.not_modified = 0
+
+
+def url_digest(url):
+    return hashlib.md5(url.encode()).hexdigest()
+
+
+response_cache = OrganizationResponseCache()
+
+
+class OrganizationCachedReadMixin:
+    """
+    Viewset mixin serving list and retrieve payloads from the organization response cache
+    with ETag/If-None-Match support. The organization is taken from request.user, with token
+    authentication a repeated read costs no SQL queries at all. Misses are read from the primary database
+    """
+    def list(self, request, *args, **kwargs):
+        return self.cached_read(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_read(super().retrieve, request, *args, **kwargs)
+
+    def cached_read(self, read, request, *args, **kwargs):
+        if not settings.TODO_LIST_CACHE['ENABLED']:
+            return read(request, *args, **kwargs)
+
+        organization_id = request.user.organization_id_id
+        version = response_cache.get_version(organization_id)
+        url = request.build_absolute_uri()
+        # Per resource: the ETag of the list does not match a line, nor a line that does not exist
+        etag = response_cache.get_etag(organization_id, version, url)
+
+        if etag in request.META.get('HTTP_IF_NONE_MATCH', '').replace(' ', '').split(','):
+            response_cache.count('not_modified')
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        data = response_cache.get(organization_id, version, url)
+
+        if data is None:
+            response_cache.count('misses')
+
+            # The payload is cached under the version read above, so it must include every write of that version:
+            # a lagging replica could return older rows, the miss is read from the primary (see api.routing)
+            replica_token = read_from_replica.set(False)
+            try:
+                response = read(request, *args, **kwargs)
+            finally:
+                read_from_replica.reset(replica_token)
+
+            if response.status_code != status.HTTP_200_OK:
+                return response
+
+            response_cache.set(organization_id, version, url, response.data)
+            response['X-Cache'] = 'MISS'
+        else:
+            response_cache.count('hits')
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+
+        response['ETag'] = etag
+
+        return response
@@ -0,0 +1,151 @@
+"""
+Push of todo list changes to the clients of an organization, served as server-sent events by api.asgi.AsyncAPIHandler.
+
+Committed changes (todo_list_changed, see api.receivers) are published to the broker of TODO_LIST_EVENTS['BROKER'].
+The default InProcessBroker fans them out to the subscriptions of this process only. A broker shared by several
+processes (Redis pub/sub, PostgreSQL LISTEN/NOTIFY) implements the same subscribe, unsubscribe, publish and stats
+methods and delivers the events it receives to the subscriptions of its own process with Subscription.put
+"""
+import asyncio
+import functools
+import json
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+# Put in place of the queued events of a subscription that did not keep up
+RESET = object()
+
+
+class Subscription:
+    """
+    Events of an organization waiting to be sent to one client, created on the event loop serving the client.
+
+    The queue is bounded by TODO_LIST_EVENTS['QUEUE_SIZE']. When it is full the client does not read fast enough:
+    the queued events are dropped for a single RESET, the stream is closed after it and the client catches up
+    with the change feed from the token of the last event it got
+    """
+    def __init__(self, organization_id, queue_size):
+        self.organization_id = organization_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+    def put(self, event):
+        """
+        Queue the event, must be called on the loop of the subscription
+        """
+        if self.overflowed:
+            return
+
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESET)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class InProcessBroker:
+    """
+    Broker fanning the events out to the subscriptions of this process.
+
+    publish may be called from any thread, events are handed to the loop of every subscription of the organization
+    with call_soon_threadsafe, so publishing never waits for a client
+    """
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+        self.published = 0
+        self.overflows = 0
+
+    def subscribe(self, organization_id):
+        """
+        Return a new subscription to the organization's events, None when TODO_LIST_EVENTS['MAX_SUBSCRIPTIONS']
+        clients are already subscribed
+        """
+        subscription = Subscription(organization_id, settings.TODO_LIST_EVENTS['QUEUE_SIZE'])
+
+        with self._lock:
+            if self.count() >= settings.TODO_LIST_EVENTS['MAX_SUBSCRIPTIONS']:
+                return None
+            self._subscriptions[organization_id].add(subscription)
+
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.organization_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.organization_id]
+
+            if subscription.overflowed:
+                self.overflows += 1
+
+    def publish(self, organization_id, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(organization_id, ()))
+            self.published += 1
+
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, event)
+            except RuntimeError:
+                # The loop of the subscription was closed, it is unsubscribed as its stream ends
+                pass
+
+    def count(self):
+        return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+    def stats(self):
+        with self._lock:
+            return {'subscriptions': self.count(), 'published': self.published, 'overflows': self.overflows}
+
+
+@functools.lru_cache()
+def load_broker(path):
+    return import_string(path)()
+
+
+def get_broker():
+    return load_broker(settings.TODO_LIST_EVENTS['BROKER'])
+
+
+def build_event(created, updated, deleted, sequence):
+    """
+    Return the event of a write in the shape of the change feed (see todo_lists.changes): the token to
+    continue the feed from, changed rows and deleted ids. Writes of more than TODO_LIST_EVENTS['MAX_CHANGES'] lines
+    are sent without the rows and with more = true, the client reads them from the change feed
+    """
+    changed = list(created) + list(updated)
+
+    if len(changed) + len(deleted) > settings.TODO_LIST_EVENTS['MAX_CHANGES']:
+        return {'token': sequence, 'more': True, 'changed': [], 'deleted': []}
+
+    return {
+        'token': sequence,
+        'more': False,
+        'changed': [{'id': obj.id, 'text': obj.text, 'is_finished': obj.is_finished} for obj in changed],
+        'deleted': list(deleted),
+    }
+
+
+def format_event(event, name='changes'):
+    """
+    Return the event in the text/event-stream format, the token is the event id
+    """
+    lines = ['event: %s' % name]
+    if event.get('token') is not None:
+        lines.insert(0, 'id: %s' % event['token'])
+    lines.append('data: %s' % json.dumps(event, ensure_ascii=False, separators=(',', ':')))
+
+    return ('\n'.join(lines) + '\n\n').encode()
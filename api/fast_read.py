@@ -0,0 +1,40 @@
+from django.conf import settings
+from rest_framework.generics import get_object_or_404
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+
+class ValuesReadMixin:
+    """
+    Viewset mixin serving JSON list and retrieve responses from .values() rows of the serializer's fields
+    instead of model instances run through the serializer. The payload is the same as long as every field
+    of the serializer is a plain model field, object permissions are checked against the row dict.
+    Other renderers (the browsable API) and TODO_LIST_FAST_READ = False use the serializer
+    """
+    def list(self, request, *args, **kwargs):
+        if not self.read_values(request):
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset()).values(*self.get_serializer_class().Meta.fields)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(page)
+
+        return Response(list(queryset))
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self.read_values(request):
+            return super().retrieve(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset()).values(*self.get_serializer_class().Meta.fields)
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+
+        row = get_object_or_404(queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        self.check_object_permissions(request, row)
+
+        return Response(row)
+
+    @staticmethod
+    def read_values(request):
+        return settings.TODO_LIST_FAST_READ and isinstance(request.accepted_renderer, JSONRenderer)
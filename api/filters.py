@@ -0,0 +1,50 @@
+from rest_framework import serializers
+from rest_framework.filters import BaseFilterBackend
+
+from todo_lists.search import search
+
+
+class IsFinishedFilter(BaseFilterBackend):
+    """
+    Filter of ToDoList lines by the ?is_finished= query parameter (true/false, 1/0),
+    served by the (organization_id, is_finished, id) index
+    """
+    query_param = 'is_finished'
+
+    def get_is_finished(self, request):
+        """
+        Return the value of the query parameter, None when it is not given
+        """
+        is_finished = request.query_params.get(self.query_param)
+
+        if is_finished is None:
+            return None
+
+        try:
+            return serializers.BooleanField().to_internal_value(is_finished)
+        except serializers.ValidationError as exc:
+            raise serializers.ValidationError({self.query_param: exc.detail})
+
+    def filter_queryset(self, request, queryset, view):
+        is_finished = self.get_is_finished(request)
+
+        if is_finished is None:
+            return queryset
+
+        return queryset.filter(is_finished=is_finished)
+
+
+class ToDoListSearchFilter(BaseFilterBackend):
+    """
+    Full-text search of the user's organization lines by the ?search= query parameter, served by the
+    full-text index (see todo_lists.search). Results are ordered by relevance, so it must run after OrderingFilter
+    """
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param)
+
+        if query is None:
+            return queryset
+
+        return search(queryset, query, request.user.organization_id_id)
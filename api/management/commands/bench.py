@@ -0,0 +1,38 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from benchmarks import api
+
+
+class Command(BaseCommand):
+    """
+    Command running the in-process API benchmark of benchmarks.api
+    """
+    help = 'Benchmarks login, list, create, toggle and delete requests against a throwaway test database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--organizations', type=int, default=10)
+        parser.add_argument('--users', type=int, default=10, help='users per organization')
+        parser.add_argument('--items', type=int, default=1000, help='todo list lines per organization')
+        parser.add_argument('--requests', type=int, default=500, help='requests per scenario')
+        parser.add_argument('--scenario', action='append', choices=api.SCENARIOS, help='defaults to all of them')
+        parser.add_argument('--json', help='write the results to this file')
+        parser.add_argument('--compare', help='results of an earlier run (--json) to compare with')
+
+    def handle(self, **options):
+        results = api.run(
+            options['organizations'],
+            options['users'],
+            options['items'],
+            options['requests'],
+            scenarios=options['scenario'] or api.SCENARIOS,
+            stdout=self.stdout,
+        )
+
+        baseline = api.load_results(options['compare']) if options['compare'] else None
+        self.stdout.write(api.format_results(results, baseline))
+
+        if options['json']:
+            with open(options['json'], 'w') as file:
+                json.dump(results, file, indent=2)
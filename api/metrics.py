@@ -0,0 +1,215 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+from api.cache import response_cache
+from api.events import get_broker
+from api.throttling import throttle_stats
+from users.hashers import hasher_pool
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class QueryBudgetExceeded(Exception):
+    """
+    A view made more SQL queries than its query budget allows
+    """
+
+
+class RequestMetrics:
+    """
+    SQL queries and timings of the current request, collected by api.middleware.InstrumentationMiddleware
+    """
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        """
+        Database execute wrapper counting the queries and their time
+        """
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.queries += 1
+
+    @property
+    def duration(self):
+        return time.perf_counter() - self.started
+
+
+# Metrics of the request handled in the current thread, None outside of instrumented requests
+current_request = ContextVar('current_request', default=None)
+
+
+@contextmanager
+def measure_serializer():
+    """
+    Add the time spent in the block to the serializer time of the current request
+    """
+    metrics = current_request.get()
+    if metrics is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serializer_time += time.perf_counter() - started
+
+
+class Histogram:
+    """
+    Cumulative histogram in the Prometheus sense: a count per upper bound plus a sum and a total count
+    """
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    Process-local per-view histograms of request latency, SQL query count, SQL time and serializer time
+    """
+    histograms = [
+        ('api_request_duration_seconds', 'Total request latency', LATENCY_BUCKETS),
+        ('api_request_queries', 'SQL queries per request', QUERY_BUCKETS),
+        ('api_request_sql_duration_seconds', 'Time spent in SQL queries per request', LATENCY_BUCKETS),
+        ('api_request_serializer_duration_seconds', 'Time spent in serializers per request', LATENCY_BUCKETS),
+    ]
+
+    def __init__(self):
+        self._views = {}
+        self._lock = threading.Lock()
+
+    def observe(self, view, method, metrics):
+        values = (metrics.duration, metrics.queries, metrics.sql_time, metrics.serializer_time)
+
+        with self._lock:
+            histograms = self._views.get((view, method))
+            if histograms is None:
+                histograms = self._views[(view, method)] = [
+                    Histogram(buckets) for _, _, buckets in self.histograms
+                ]
+
+            for histogram, value in zip(histograms, values):
+                histogram.observe(value)
+
+    def reset(self):
+        with self._lock:
+            self._views = {}
+
+    def render(self):
+        """
+        Return the metrics in the Prometheus text exposition format
+        """
+        lines = []
+
+        with self._lock:
+            for index, (name, description, buckets) in enumerate(self.histograms):
+                lines.append('# HELP %s %s' % (name, description))
+                lines.append('# TYPE %s histogram' % name)
+
+                for (view, method), histograms in sorted(self._views.items()):
+                    histogram = histograms[index]
+                    labels = 'view="%s",method="%s"' % (escape_label(view), escape_label(method))
+
+                    for bound, count in zip(buckets, histogram.counts):
+                        lines.append('%s_bucket{%s,le="%s"} %s' % (name, labels, bound, count))
+                    lines.append('%s_bucket{%s,le="+Inf"} %s' % (name, labels, histogram.count))
+                    lines.append('%s_sum{%s} %s' % (name, labels, histogram.sum))
+                    lines.append('%s_count{%s} %s' % (name, labels, histogram.count))
+
+        for counter, value in sorted(response_cache.stats().items()):
+            name = 'api_response_cache_%s_total' % counter
+            lines.append('# HELP %s Todo list response cache %s' % (name, counter.replace('_', ' ')))
+            lines.append('# TYPE %s counter' % name)
+            lines.append('%s %s' % (name, value))
+
+        lines.extend([
+            '# HELP api_auth_throttled_total Registration, login and token attempts refused with 429 per bucket scope',
+            '# TYPE api_auth_throttled_total counter',
+        ])
+        for scope, value in sorted(throttle_stats.stats().items()):
+            lines.append('api_auth_throttled_total{scope="%s"} %s' % (scope, value))
+
+        hashing = hasher_pool.stats()
+        lines.extend([
+            '# HELP api_password_hashes_in_flight Password hashes running or waiting in the hasher pool',
+            '# TYPE api_password_hashes_in_flight gauge',
+            'api_password_hashes_in_flight %s' % hashing['in_flight'],
+            '# HELP api_password_hashes_shed_total Password checks refused with 503 since the hasher pool was full',
+            '# TYPE api_password_hashes_shed_total counter',
+            'api_password_hashes_shed_total %s' % hashing['shed'],
+        ])
+
+        if settings.TODO_LIST_EVENTS['ENABLED']:
+            stats = get_broker().stats()
+            lines.extend([
+                '# HELP api_event_subscriptions Open todo list event streams of this process',
+                '# TYPE api_event_subscriptions gauge',
+                'api_event_subscriptions %s' % stats['subscriptions'],
+                '# HELP api_events_published_total Todo list change events published',
+                '# TYPE api_events_published_total counter',
+                'api_events_published_total %s' % stats['published'],
+                '# HELP api_event_overflows_total Todo list event streams closed since the client did not keep up',
+                '# TYPE api_event_overflows_total counter',
+                'api_event_overflows_total %s' % stats['overflows'],
+            ])
+
+        return '\n'.join(lines) + '\n'
+
+
+def escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
+
+
+def can_read_metrics(request):
+    """
+    Staff users and scrapers sending "Authorization: Bearer <API_METRICS['TOKEN']>" read the metrics
+    """
+    token = settings.API_METRICS['TOKEN']
+    if token and constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), 'Bearer ' + token):
+        return True
+
+    user = getattr(request, 'user', None)
+
+    return user is not None and user.is_active and user.is_staff
+
+
+def metrics_view(request):
+    """
+    Metrics of this process in the Prometheus text format, they show the traffic and latency of every view
+    so they are not public
+    """
+    if not settings.API_METRICS['ENABLED']:
+        raise Http404
+
+    if not can_read_metrics(request):
+        return HttpResponseForbidden()
+
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,77 @@
+import logging
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from api.metrics import QueryBudgetExceeded, RequestMetrics, current_request, registry
+
+
+logger = logging.getLogger(__name__)
+
+
+class InstrumentationMiddleware:
+    """
+    Middleware recording the SQL query count, SQL time, serializer time and total latency of every request.
+
+    Metrics are added to the per-view histograms of api.metrics (served at /api/metrics/) and, with
+    API_METRICS['SERVER_TIMING'], sent in a Server-Timing header. Requests making more queries than
+    the query budget (API_METRICS['QUERY_BUDGET'] or the query_budgets of the view class,
+    None for no budget) are logged or, with QUERY_BUDGET_ACTION = 'raise', fail with QueryBudgetExceeded.
+    Queries of streamed content run after the response is returned and are not counted
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.API_METRICS['ENABLED']:
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = current_request.set(metrics)
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(metrics.execute_wrapper))
+
+                response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+
+        match = request.resolver_match
+        view = match.view_name if match is not None else 'unresolved'
+        registry.observe(view, request.method, metrics)
+
+        if settings.API_METRICS['SERVER_TIMING']:
+            response['Server-Timing'] = ', '.join([
+                'db;dur=%.3f;desc="%s queries"' % (metrics.sql_time * 1000, metrics.queries),
+                'serializer;dur=%.3f' % (metrics.serializer_time * 1000),
+                'total;dur=%.3f' % (metrics.duration * 1000),
+            ])
+
+        budget = self.get_query_budget(request, match)
+        if budget is not None and metrics.queries > budget:
+            message = '%s %s (%s) made %s SQL queries, the query budget is %s' % (
+                request.method, request.path, view, metrics.queries, budget,
+            )
+            if settings.API_METRICS['QUERY_BUDGET_ACTION'] == 'raise':
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+        return response
+
+    @staticmethod
+    def get_query_budget(request, match):
+        """
+        Return the budget of the viewset action (or the handler method of other views) from the query_budgets
+        dict of the view class, the default budget otherwise
+        """
+        budget = settings.API_METRICS['QUERY_BUDGET']
+        view_class = getattr(match.func, 'cls', None) if match is not None else None
+        if view_class is None:
+            return budget
+
+        method = request.method.lower()
+        actions = getattr(match.func, 'actions', None) or {}
+
+        return getattr(view_class, 'query_budgets', {}).get(actions.get(method, method), budget)
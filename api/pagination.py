@@ -0,0 +1,107 @@
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, CursorPagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class ToDoListCursorPagination(CursorPagination):
+    """
+    Keyset pagination over ToDoList primary keys.
+
+    Every page is fetched with ``WHERE id > <position> ORDER BY id LIMIT <page_size + 1>``,
+    so the cost of a request does not depend on how deep into the list the client is
+    or on how large the organization's list is
+    """
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+
+    def __init__(self):
+        self.page_size = settings.TODO_LIST_PAGINATION['PAGE_SIZE']
+        self.max_page_size = settings.TODO_LIST_PAGINATION['MAX_PAGE_SIZE']
+
+    def decode_cursor(self, request):
+        """
+        Function rejects cursors whose position is not a primary key, a 64-bit integer, instead of failing
+        on the query
+        """
+        cursor = super(ToDoListCursorPagination, self).decode_cursor(request)
+
+        if cursor is not None and cursor.position is not None:
+            try:
+                position = int(cursor.position)
+            except ValueError:
+                raise NotFound(self.invalid_cursor_message)
+
+            if not -2 ** 63 <= position <= 2 ** 63 - 1:
+                raise NotFound(self.invalid_cursor_message)
+
+        return cursor
+
+
+class ToDoListSearchPagination(BasePagination):
+    """
+    Offset pagination of ranked search results, which have no unique ordering for a cursor.
+
+    Pages have the same next/previous/results shape as ToDoListCursorPagination, page_size + 1 rows are fetched
+    to know whether there is a next page, so no COUNT query is made. ?offset= is capped at MAX_SEARCH_OFFSET
+    since every deeper page ranks all the skipped matches again
+    """
+    page_size_query_param = 'page_size'
+    offset_query_param = 'offset'
+
+    def __init__(self):
+        self.page_size = settings.TODO_LIST_PAGINATION['PAGE_SIZE']
+        self.max_page_size = settings.TODO_LIST_PAGINATION['MAX_PAGE_SIZE']
+        self.max_offset = settings.TODO_LIST_PAGINATION['MAX_SEARCH_OFFSET']
+
+    def paginate_queryset(self, queryset, request, view=None):
+        try:
+            self.page_size = _positive_int(
+                request.query_params[self.page_size_query_param], strict=True, cutoff=self.max_page_size,
+            )
+        except (KeyError, ValueError):
+            pass
+
+        try:
+            self.offset = _positive_int(request.query_params[self.offset_query_param])
+        except KeyError:
+            self.offset = 0
+        except ValueError:
+            raise NotFound('Invalid offset.')
+
+        if self.offset > self.max_offset:
+            raise NotFound('Invalid offset.')
+
+        self.request = request
+        results = list(queryset[self.offset:self.offset + self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+
+        return results[:self.page_size]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.offset_query_param, self.offset + self.page_size,
+        )
+
+    def get_previous_link(self):
+        if self.offset <= 0:
+            return None
+
+        url = self.request.build_absolute_uri()
+        if self.offset <= self.page_size:
+            return remove_query_param(url, self.offset_query_param)
+
+        return replace_query_param(url, self.offset_query_param, self.offset - self.page_size)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from todo_lists.models import Organization
+from todo_lists.signals import todo_list_changed
+from .cache import response_cache
+from .events import build_event, get_broker
+
+
+@receiver(todo_list_changed)
+def invalidate_organization_responses(sender, organization_id, **kwargs):
+    response_cache.bump(organization_id)
+
+
+@receiver(todo_list_changed)
+def publish_todo_list_changes(sender, organization_id, created, updated, deleted, sequence=None, **kwargs):
+    """
+    The event is built now, while the instances hold the written values, and published once the write commits
+    """
+    if not settings.TODO_LIST_EVENTS['ENABLED']:
+        return
+
+    event = build_event(created, updated, deleted, sequence)
+    transaction.on_commit(lambda: get_broker().publish(organization_id, event))
+
+
+@receiver(post_save, sender=Organization)
+@receiver(post_delete, sender=Organization)
+def invalidate_organization_responses_on_organization_change(sender, instance, **kwargs):
+    """
+    A new organization may reuse the id of a deleted one and deleting cascades to its lines without signals
+    """
+    response_cache.bump(instance.pk)
@@ -0,0 +1,105 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import json
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+else:
+    # Dates and dataclasses are formatted differently by orjson, passing them through makes orjson fail on them
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+
+def encode_json(data):
+    """
+    Encode data to bytes the same way as the compact DRF JSONRenderer.
+
+    orjson, when installed, produces the same bytes for dicts, lists, strings, integers, booleans and None
+    once U+2028 and U+2029 are escaped, data it can not encode (Decimal, dates, lazy strings...)
+    falls back to the standard library encoder
+    """
+    if orjson is not None:
+        try:
+            content = orjson.dumps(data, option=ORJSON_OPTIONS)
+        except TypeError:
+            pass
+        else:
+            return content.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+    content = json.dumps(data, cls=JSONEncoder, ensure_ascii=False, allow_nan=False, separators=(',', ':'))
+
+    return content.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029').encode()
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer encoding with encode_json (orjson when installed), indented and ASCII only output
+    is left to JSONRenderer. Meant for payloads without floats, which orjson formats differently
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        if self.ensure_ascii or not self.compact or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        return encode_json(data)
+
+
+class StreamingJSONRenderer(FastJSONRenderer):
+    """
+    JSON renderer that can also encode an iterable of rows as one JSON array, chunk by chunk
+    """
+    def stream(self, rows, chunk_size):
+        """
+        Yield the JSON array of rows in pieces of up to chunk_size rows
+        """
+        yield b'['
+
+        separator = b''
+        chunk = []
+        for row in rows:
+            chunk.append(encode_json(row))
+
+            if len(chunk) == chunk_size:
+                yield separator + b','.join(chunk)
+                separator = b','
+                chunk = []
+
+        if chunk:
+            yield separator + b','.join(chunk)
+
+        yield b']'
+
+
+class NDJSONRenderer(StreamingJSONRenderer):
+    """
+    Newline delimited JSON renderer: one compact JSON document per row
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        if not isinstance(data, (list, tuple)):
+            data = [data]
+
+        return b''.join(self.stream(data, chunk_size=len(data) or 1))
+
+    def stream(self, rows, chunk_size):
+        """
+        Yield the rows as NDJSON in pieces of up to chunk_size rows
+        """
+        chunk = []
+        for row in rows:
+            chunk.append(encode_json(row))
+
+            if len(chunk) == chunk_size:
+                yield b'\n'.join(chunk) + b'\n'
+                chunk = []
+
+        if chunk:
+            yield b'\n'.join(chunk) + b'\n'
@@ -0,0 +1,25 @@
+from todo_list_project.db.routers import read_from_replica
+
+
+class ReplicaReadMixin:
+    """
+    Viewset mixin routing the queries of replica_actions to the read replicas.
+    The user is authenticated before the switch, so authentication reads stay on the primary.
+    With the response cache enabled only uncached reads use the replicas, see api.cache.OrganizationCachedReadMixin
+    """
+    replica_actions = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+
+        if self.action in self.replica_actions:
+            self.replica_token = read_from_replica.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        # Worker threads are reused by the following requests, so the flag is always reset
+        replica_token = getattr(self, 'replica_token', None)
+        if replica_token is not None:
+            read_from_replica.reset(replica_token)
+            self.replica_token = None
+
+        return super().finalize_response(request, response, *args, **kwargs)
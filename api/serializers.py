@@ -1,11 +1,34 @@
-from django.contrib.auth.hashers import make_password
+from django.conf import settings
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
 
-from todo_lists.models import Organization, ToDoList
+from api.metrics import measure_serializer
+from jobs.models import Job
+from todo_lists.cache import organization_ids
+from todo_lists.models import Organization, OrganizationPurge, OrganizationStats, ToDoList
+from users.hashers import make_password
 from users.models import CustomUser
 
 
-class UserSerializer(serializers.ModelSerializer):
+class TimedSerializerMixin:
+    """
+    Serializer mixin adding validation and representation time to the serializer time of the request metrics
+    """
+    def is_valid(self, raise_exception=False):
+        with measure_serializer():
+            return super().is_valid(raise_exception=raise_exception)
+
+    @property
+    def data(self):
+        with measure_serializer():
+            return super().data
+
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    pass
+
+
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = CustomUser
         fields = ['email', 'organization', 'password']
@@ -13,36 +36,158 @@ class UserSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         """
         Function validates organization_id field and adds it if necessary before saving, hashes password
+        and reports an already registered email as a validation error
         """
-        try:
-            organization_obj = Organization.objects.get(name=validated_data.get('organization'))
-        except Organization.DoesNotExist:
+        organization_id = organization_ids.get_id(validated_data.get('organization'))
+        if organization_id is None:
             raise serializers.ValidationError(
                 {'validation_error': 'You can not register a user if his organization does not exist'}
             )
 
-        validated_data['organization_id'] = organization_obj
+        validated_data['organization_id_id'] = organization_id
         validated_data['password'] = make_password(validated_data.get('password'))
 
-        return super(UserSerializer, self).create(validated_data)
+        # Uniqueness is left to the (organization_id, email) constraint instead of a validator query
+        try:
+            with transaction.atomic():
+                return super(UserSerializer, self).create(validated_data)
+        except IntegrityError:
+            raise serializers.ValidationError(
+                {'non_field_errors': ['The fields email, organization must make a unique set.']}
+            )
 
 
-class OrganizationSerializer(serializers.ModelSerializer):
+class OrganizationSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Organization
-        fields = '__all__'
+        fields = ['id', 'name']
+        list_serializer_class = TimedListSerializer
+
+
+class OrganizationStatsSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    open = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = OrganizationStats
+        fields = ['organization', 'total', 'finished', 'open', 'modified_at']
+
+
+class OrganizationPurgeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = OrganizationPurge
+        fields = [
+            'id', 'organization_id', 'organization_name', 'status', 'step', 'lines', 'tombstones', 'users', 'error',
+            'job_id', 'created_at', 'updated_at', 'finished_at',
+        ]
+        list_serializer_class = TimedListSerializer
+
+
+class JobSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    result = serializers.JSONField(source='result_data', read_only=True)
+
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'name', 'status', 'attempts', 'max_attempts', 'result', 'error', 'run_at', 'created_at',
+            'started_at', 'finished_at',
+        ]
+        list_serializer_class = TimedListSerializer
 
 
-class ToDoListSerializer(serializers.ModelSerializer):
+class ToDoListSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = ToDoList
         fields = ['id', 'text', 'is_finished']
         read_only_fields = ['id']
+        list_serializer_class = TimedListSerializer
 
     def create(self, validated_data):
         """
         Function sets organization field equal to the current user's organization and saves instance
         """
-        validated_data['organization'] = self.context.get('request').user.organization_id
+        validated_data['organization_id'] = self.context.get('request').user.organization_id_id
 
         return super(ToDoListSerializer, self).create(validated_data)
+
+
+class ToDoListBulkUpdateSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(min_value=1, max_value=2 ** 63 - 1)
+
+    class Meta:
+        model = ToDoList
+        fields = ['id', 'text', 'is_finished']
+        extra_kwargs = {'text': {'required': False}, 'is_finished': {'required': False}}
+
+    def validate(self, attrs):
+        """
+        Function rejects an item that changes nothing, it would be reported as updated
+        """
+        if attrs.keys() == {'id'}:
+            raise serializers.ValidationError('No fields to update.')
+
+        return attrs
+
+
+class ToDoListBulkSerializer(TimedSerializerMixin, serializers.Serializer):
+    """
+    Serializer for a batch of ToDoList creates, partial updates and deletes applied in one transaction
+    """
+    def get_fields(self):
+        """
+        Function declares the fields here because their names clash with serializer's create and update methods
+        """
+        return {
+            'create': ToDoListSerializer(many=True, required=False),
+            'update': ToDoListBulkUpdateSerializer(many=True, required=False),
+            'delete': serializers.ListField(
+                child=serializers.IntegerField(min_value=1, max_value=2 ** 63 - 1), required=False,
+            ),
+        }
+
+    def validate(self, attrs):
+        """
+        Function checks the batch size and that no line is both updated and deleted
+        """
+        items_count = sum(len(attrs.get(key, [])) for key in ('create', 'update', 'delete'))
+        if items_count > settings.TODO_LIST_BULK_MAX_ITEMS:
+            raise serializers.ValidationError(
+                'A batch can not contain more than %s items' % settings.TODO_LIST_BULK_MAX_ITEMS
+            )
+
+        updated_ids = {line['id'] for line in attrs.get('update', [])}
+        if updated_ids.intersection(attrs.get('delete', [])):
+            raise serializers.ValidationError('A line can not be updated and deleted in the same batch')
+
+        return attrs
+
+    def create(self, validated_data):
+        """
+        Function applies the batch to the current user's organization and returns per-item results
+        """
+        organization_id = self.context.get('request').user.organization_id_id
+        changes = {}
+        for line in validated_data.get('update', []):
+            changes.setdefault(line.pop('id'), {}).update(line)
+        deleted_request = list(dict.fromkeys(validated_data.get('delete', [])))
+
+        with transaction.atomic():
+            created = ToDoList.objects.bulk_create_lines(organization_id, validated_data.get('create', []))
+            updated = ToDoList.objects.bulk_update_lines(organization_id, changes)
+            deleted = ToDoList.objects.bulk_delete_lines(organization_id, deleted_request)
+
+        updated = {obj.id: obj for obj in updated}
+        deleted = set(deleted)
+
+        return {
+            'create': ToDoListSerializer(created, many=True).data,
+            'update': [
+                ToDoListSerializer(updated[line_id]).data if line_id in updated
+                else {'id': line_id, 'error': 'Not found.'}
+                for line_id in changes
+            ],
+            'delete': [
+                {'id': line_id, 'deleted': True} if line_id in deleted
+                else {'id': line_id, 'error': 'Not found.'}
+                for line_id in deleted_request
+            ],
+        }
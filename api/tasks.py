@@ -0,0 +1,66 @@
+import os
+
+from django.conf import settings
+
+from jobs.registry import task
+from todo_lists.models import ToDoList
+from .renderers import NDJSONRenderer, StreamingJSONRenderer
+
+
+EXPORT_RENDERERS = {'ndjson': NDJSONRenderer, 'json': StreamingJSONRenderer}
+EXPORT_FIELDS = ['id', 'text', 'is_finished']
+
+
+def export_path(job_id, file_format):
+    return os.path.join(settings.JOBS['FILES_DIR'], 'export-%s.%s' % (job_id, file_format))
+
+
+@task('api.export')
+def export_lines(job, organization_id, file_format='ndjson', is_finished=None, ordering='id'):
+    """
+    Write the organization's lines to a file of JOBS['FILES_DIR'] in the format of /api/todo_lists/export/,
+    served by /api/jobs/{id}/file/. The file is renamed into place once complete, so a retried job
+    never serves a partial file
+    """
+    queryset = ToDoList.objects.filter(organization_id=organization_id)
+    if is_finished is not None:
+        queryset = queryset.filter(is_finished=is_finished)
+
+    chunk_size = settings.TODO_LIST_EXPORT_CHUNK_SIZE
+    path = export_path(job.id, file_format)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    count = 0
+
+    def read_rows():
+        """
+        Rows are read in keyset chunks, unlike the export view's iterator no statement stays open,
+        so the job can be touched between the chunks (SQLite does not let a connection with an open
+        read statement write once another connection wrote)
+        """
+        nonlocal count
+        rows_queryset = queryset.order_by(ordering).values(*EXPORT_FIELDS)
+        last_id = None
+
+        while True:
+            chunk = rows_queryset
+            if last_id is not None:
+                chunk = chunk.filter(id__lt=last_id) if ordering == '-id' else chunk.filter(id__gt=last_id)
+            rows = list(chunk[:chunk_size])
+
+            yield from rows
+            count += len(rows)
+
+            if len(rows) < chunk_size:
+                break
+
+            last_id = rows[-1]['id']
+            job.touch()
+
+    with open(path + '.part', 'wb') as file:
+        for chunk in EXPORT_RENDERERS[file_format]().stream(read_rows(), chunk_size=chunk_size):
+            file.write(chunk)
+
+    os.replace(path + '.part', path)
+
+    return {'format': file_format, 'rows': count}
@@ -0,0 +1,176 @@
+"""
+Throttling and load shedding of the views checking passwords: registration, login and token issuing.
+
+Every attempt takes a token from two token buckets, one of the client IP and one of the (email, organization) pair,
+refilled at AUTH_THROTTLE['*_PER_MINUTE'] tokens per minute up to *_BURST tokens. An attempt finding a bucket empty
+is answered with 429 and Retry-After before any password is hashed. The buckets are kept by the store of
+AUTH_THROTTLE['STORE']: the default InMemoryBucketStore keeps them in this process. A store shared by several
+processes (Redis with a Lua script, a table updated in place) implements the same take and reset methods.
+
+Hashing itself is bounded by users.hashers.HasherPool: once all its slots are taken further password checks fail
+fast with HashingOverloaded, which exception_handler answers with 503 and Retry-After
+"""
+import functools
+import hashlib
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework import status, views
+from rest_framework.exceptions import APIException
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from users.hashers import HashingOverloaded
+
+
+class InMemoryBucketStore:
+    """
+    Token buckets of this process, at most AUTH_THROTTLE['MAX_KEYS'] of them, the least recently used bucket
+    is dropped first. Taking a token is atomic under a lock
+    """
+    def __init__(self):
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst):
+        """
+        Take a token from the bucket of key, refilled with rate tokens per second up to burst tokens.
+        Return 0 when a token was taken, otherwise the seconds until the next one
+        """
+        now = time.monotonic()
+
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0
+            else:
+                wait = (1 - tokens) / rate
+
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > settings.AUTH_THROTTLE['MAX_KEYS']:
+                self._buckets.popitem(last=False)
+
+        return wait
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+@functools.lru_cache()
+def load_store(path):
+    return import_string(path)()
+
+
+def get_store():
+    return load_store(settings.AUTH_THROTTLE['STORE'])
+
+
+@receiver(setting_changed)
+def reset_store(setting, **kwargs):
+    if setting == 'AUTH_THROTTLE':
+        load_store.cache_clear()
+
+
+class ThrottleStats:
+    """
+    Attempts refused per bucket scope, reported by api.metrics
+    """
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, counter):
+        with self._lock:
+            self._counts[counter] += 1
+
+    def stats(self):
+        with self._lock:
+            return {counter: self._counts[counter] for counter in ('ip', 'credentials')}
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+throttle_stats = ThrottleStats()
+
+
+def take_attempt(ip, email=None, organization=None):
+    """
+    Take a token from the bucket of the IP, then from the bucket of the credentials when both the email and
+    the organization are given. Return 0 when the attempt is allowed, otherwise the seconds to wait
+    """
+    config = settings.AUTH_THROTTLE
+    if not config['ENABLED']:
+        return 0
+
+    buckets = [('ip', ip)]
+    if email and organization:
+        # Hashed so that the size of a bucket key does not depend on the request
+        credentials = '%s\n%s' % (str(email).lower(), organization)
+        buckets.append(('credentials', hashlib.blake2b(credentials.encode(), digest_size=16).hexdigest()))
+
+    for scope, key in buckets:
+        wait = get_store().take(
+            '%s:%s' % (scope, key),
+            config['%s_PER_MINUTE' % scope.upper()] / 60,
+            config['%s_BURST' % scope.upper()],
+        )
+        if wait:
+            throttle_stats.add(scope)
+            return wait
+
+    return 0
+
+
+class PasswordAttemptThrottle(BaseThrottle):
+    """
+    DRF throttle of the views checking passwords, see take_attempt
+    """
+    def get_ident(self, request):
+        """
+        The client IP is REMOTE_ADDR: X-Forwarded-For is set by the client unless REST_FRAMEWORK['NUM_PROXIES']
+        trusted proxies are configured, then the address seen by the first of them is used
+        """
+        if api_settings.NUM_PROXIES is None:
+            return request.META.get('REMOTE_ADDR')
+
+        return super().get_ident(request)
+
+    def allow_request(self, request, view):
+        data = request.data if hasattr(request.data, 'get') else {}
+        self.wait_seconds = take_attempt(self.get_ident(request), data.get('email'), data.get('organization'))
+
+        return not self.wait_seconds
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class ServiceOverloaded(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many password checks in progress, try again later.'
+    default_code = 'overloaded'
+
+    def __init__(self):
+        super().__init__()
+        self.wait = settings.AUTH_THROTTLE['RETRY_AFTER']
+
+
+def exception_handler(exc, context):
+    """
+    DRF exception handler answering password checks shed by the hasher pool with 503
+    """
+    if isinstance(exc, HashingOverloaded):
+        exc = ServiceOverloaded()
+
+    return views.exception_handler(exc, context)
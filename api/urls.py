@@ -1,17 +1,31 @@
 from django.urls import path, include
 from rest_framework import routers
 
-from .views import RegisterView, LoginView, LogoutView, OrganizationViewSet, ToDoListViewSet
+from .metrics import metrics_view
+from .views import (
+    RegisterView,
+    LoginView,
+    TokenView,
+    LogoutView,
+    JobViewSet,
+    OrganizationViewSet,
+    OrganizationPurgeViewSet,
+    ToDoListViewSet,
+)
 
 
 router = routers.DefaultRouter()
 
 router.register(r'organizations', OrganizationViewSet)
+router.register(r'organization_purges', OrganizationPurgeViewSet, basename='organizationpurge')
+router.register(r'jobs', JobViewSet, basename='jobs')
 router.register(r'todo_lists', ToDoListViewSet, basename='todo_lists')
 
 urlpatterns = [
     path('', include(router.urls)),
     path('register/', RegisterView.as_view()),
     path('login/', LoginView.as_view()),
+    path('token/', TokenView.as_view()),
     path('logout/', LogoutView.as_view()),
+    path('metrics/', metrics_view),
 ]
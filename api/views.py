@@ -1,12 +1,42 @@
-from django.contrib.auth import authenticate, login, logout
+from django.conf import settings
+from django.contrib.auth import authenticate, login, logout, user_logged_in
+from django.db import router, transaction
+from django.db.models import Q
+from django.http import FileResponse, Http404, StreamingHttpResponse
 from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, UnsupportedMediaType, ValidationError
+from rest_framework.filters import OrderingFilter
 from rest_framework.generics import CreateAPIView
 from rest_framework.permissions import AllowAny
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 
-from api.serializers import UserSerializer, OrganizationSerializer, ToDoListSerializer
-from todo_lists.models import Organization, ToDoList
+from api.authentication import SignedTokenAuthentication
+from api.cache import OrganizationCachedReadMixin
+from api.fast_read import ValuesReadMixin
+from api.filters import IsFinishedFilter, ToDoListSearchFilter
+from api.pagination import ToDoListCursorPagination, ToDoListSearchPagination
+from api.renderers import FastJSONRenderer, NDJSONRenderer, StreamingJSONRenderer
+from api.routing import ReplicaReadMixin
+from api.serializers import (
+    UserSerializer,
+    JobSerializer,
+    OrganizationSerializer,
+    OrganizationPurgeSerializer,
+    OrganizationStatsSerializer,
+    ToDoListSerializer,
+    ToDoListBulkSerializer,
+)
+from api.tasks import EXPORT_RENDERERS, export_path
+from api.throttling import PasswordAttemptThrottle
+from jobs.models import Job
+from todo_lists.changes import read_changes
+from todo_lists.imports import import_lines
+from todo_lists.models import Organization, OrganizationPurge, OrganizationStats, ToDoList
+from todo_lists.purge import start_purge
 from users.models import CustomUser
 
 
@@ -16,6 +46,7 @@ class RegisterView(CreateAPIView):
     """
     model = CustomUser
     permission_classes = [AllowAny]
+    throttle_classes = [PasswordAttemptThrottle]
 
     serializer_class = UserSerializer
 
@@ -25,6 +56,7 @@ class LoginView(APIView):
     View for user authorization with the given email, organization and password
     """
     permission_classes = [AllowAny]
+    throttle_classes = [PasswordAttemptThrottle]
 
     def post(self, request):
         email = request.data.get('email')
@@ -41,6 +73,29 @@ class LoginView(APIView):
             return Response(data='Invalid login', status=status.HTTP_400_BAD_REQUEST)
 
 
+class TokenView(APIView):
+    """
+    View for issuing a signed authentication token with the given email, organization and password
+    """
+    permission_classes = [AllowAny]
+    throttle_classes = [PasswordAttemptThrottle]
+
+    def post(self, request):
+        email = request.data.get('email')
+        organization = request.data.get('organization')
+        password = request.data.get('password')
+
+        # Authenticate uses custom backend
+        user = authenticate(email=email, organization=organization, password=password)
+
+        if user:
+            user_logged_in.send(sender=user.__class__, request=request, user=user)
+            token, expires = SignedTokenAuthentication.issue_token(user)
+            return Response(data={'token': token, 'expires': expires}, status=status.HTTP_200_OK)
+        else:
+            return Response(data='Invalid login', status=status.HTTP_400_BAD_REQUEST)
+
+
 class LogoutView(APIView):
     """
     User logout view
@@ -50,7 +105,7 @@ class LogoutView(APIView):
         return Response(data='User logged out', status=status.HTTP_200_OK)
 
 
-class OrganizationViewSet(viewsets.ModelViewSet):
+class OrganizationViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """
     retrieve:
     Return the given Organization details.
@@ -69,18 +124,114 @@ class OrganizationViewSet(viewsets.ModelViewSet):
 
     delete:
     Deletes an Organization instance.
+
+    purge:
+    Queues the deletion of the Organization with its lines and users in batches and returns the purge
+    (202 Accepted), its progress is read at /api/organization_purges/{id}/ and its job at /api/jobs/{job_id}/.
+
+    stats:
+    Return the total, finished and open line counts of the Organization and the time of its last line change,
+    read from counters kept up to date by every write instead of counting the lines.
     """
     queryset = Organization.objects.all()
     serializer_class = OrganizationSerializer
+    replica_actions = ('list', 'retrieve', 'stats')
+    # A purge run within the request (TODO_LIST_PURGE['BACKGROUND'] off) makes a few queries per batch
+    query_budgets = {'purge': None}
+
+    @action(detail=True, methods=['post'], serializer_class=OrganizationPurgeSerializer)
+    def purge(self, request, pk=None):
+        purge = start_purge(self.get_object(), owner_id=request.user.organization_id_id)
 
+        return Response(
+            data=self.get_serializer(purge).data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': '/api/organization_purges/%s/' % purge.id},
+        )
 
-class ToDoListViewSet(viewsets.ModelViewSet):
+    @action(detail=True, serializer_class=OrganizationStatsSerializer)
+    def stats(self, request, pk=None):
+        organization = self.get_object()
+
+        stats = OrganizationStats.objects.filter(organization=organization).first()
+        if stats is None:
+            # Organizations created without signals get their stats on the first read
+            using = router.db_for_write(OrganizationStats)
+            with transaction.atomic(using=using):
+                OrganizationStats.objects.db_manager(using).reconcile([organization.id])
+            stats = OrganizationStats.objects.using(using).get(organization=organization)
+
+        return Response(data=self.get_serializer(stats).data, status=status.HTTP_200_OK)
+
+
+class OrganizationPurgeViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    retrieve:
+    Return the status and the progress of the given purge: the step being run and the numbers of deleted lines,
+    tombstones and users.
+
+    list:
+    Return a list of the purges of the user's organization and of those it requested, the latest first.
+    """
+    serializer_class = OrganizationPurgeSerializer
+
+    def get_queryset(self):
+        organization_id = self.request.user.organization_id_id
+
+        return OrganizationPurge.objects.filter(
+            Q(organization_id=organization_id) | Q(owner_id=organization_id)
+        ).order_by('-id')
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
     """
     retrieve:
-    Return the given ToDoList details.
+    Return the status, attempts and result of the given job of the user's organization.
 
     list:
-    Return a list of existing ToDoList instances.
+    Return a list of the jobs of the user's organization, the latest first.
+
+    file:
+    Download the file made by the job, e.g. the lines of an export job.
+    """
+    serializer_class = JobSerializer
+
+    def get_queryset(self):
+        return Job.objects.filter(organization_id=self.request.user.organization_id_id).order_by('-id')
+
+    @action(detail=True)
+    def file(self, request, pk=None):
+        job = self.get_object()
+        result = job.result_data
+
+        if job.status != Job.SUCCEEDED or not isinstance(result, dict) or result.get('format') not in EXPORT_RENDERERS:
+            raise Http404('The job has no file')
+
+        try:
+            file = open(export_path(job.id, result['format']), 'rb')
+        except FileNotFoundError:
+            raise Http404('The file of the job was removed')
+
+        return FileResponse(
+            file,
+            as_attachment=True,
+            filename='todo_list.%s' % result['format'],
+            content_type=EXPORT_RENDERERS[result['format']].media_type,
+        )
+
+
+class ToDoListViewSet(OrganizationCachedReadMixin, ReplicaReadMixin, ValuesReadMixin, viewsets.ModelViewSet):
+    """
+    retrieve:
+    Return the given ToDoList details, served from the organization's response cache with ETag support.
+
+    list:
+    Return a page of existing ToDoList instances, use the next/previous links to move between pages.
+    Pages are served from the organization's response cache with ETag support.
+    Lines can be filtered with ?is_finished=true|false and ordered with ?ordering=id|-id.
+    ?search=<words> returns the lines containing every word, the most relevant first, in pages moved through
+    with ?offset= (the next/previous links).
+    JSON pages are read as plain rows and encoded without the serializer.
 
     create:
     Create a new ToDoList instance.
@@ -93,8 +244,175 @@ class ToDoListViewSet(viewsets.ModelViewSet):
 
     delete:
     Deletes ToDoList instance.
+
+    bulk:
+    Creates, partially updates and deletes ToDoList instances in one transaction,
+    accepts {"create": [...], "update": [{"id": ..., ...}], "delete": [ids]} and returns per-item results.
+
+    changes:
+    Returns the lines created, updated ({"changed": [...]}) and deleted ({"deleted": [ids]}) since the token
+    of an earlier response (?since=<token>, 0 or none for the whole list) with the token of this one,
+    at most ?page_size changes per response, "more" is true when there are more to fetch.
+    Served from the organization's response cache with ETag support.
+
+    export:
+    Streams all ToDoList instances as NDJSON (default) or as a JSON array with ?format=json,
+    accepts the same filters and ordering as list.
+
+    export_job:
+    Queues an export with the same filters and ordering as export, {"format": "ndjson"|"json"} in the body,
+    and returns its job (202 Accepted),
+    the file is downloaded from /api/jobs/{id}/file/ once the job succeeded.
+
+    import_lines:
+    Imports ToDoList instances from an NDJSON (application/x-ndjson) or CSV (text/csv) request body,
+    or from a multipart "file" upload, and returns the number of created lines and per-row errors.
     """
     serializer_class = ToDoListSerializer
+    # The browsable API only where the settings profile has it, see SETTINGS_PROFILE
+    renderer_classes = [FastJSONRenderer] + [
+        renderer for renderer in api_settings.DEFAULT_RENDERER_CLASSES if issubclass(renderer, BrowsableAPIRenderer)
+    ]
+    pagination_class = ToDoListCursorPagination
+    filter_backends = [IsFinishedFilter, OrderingFilter, ToDoListSearchFilter]
+    ordering_fields = ['id']
+    ordering = ['id']
+    replica_actions = ('list', 'retrieve', 'changes')
+    # Imports make a few queries per batch of lines
+    query_budgets = {'import_lines': None}
 
     def get_queryset(self):
-        return ToDoList.objects.filter(organization=self.request.user.organization_id)
+        return ToDoList.objects.filter(organization_id=self.request.user.organization_id_id)
+
+    def handle_exception(self, exc):
+        # Signed tokens are not checked against the database, a token of a deleted organization
+        # gets as far as ToDoListManager.allocate_sequence on writes
+        if isinstance(exc, Organization.DoesNotExist):
+            exc = NotFound('Organization not found.')
+
+        return super().handle_exception(exc)
+
+    @property
+    def paginator(self):
+        """
+        Ranked search results are paginated by offset, the list otherwise by its keyset. Other actions ignore ?search=
+        """
+        if (
+            not hasattr(self, '_paginator') and self.action == 'list'
+            and ToDoListSearchFilter.search_param in self.request.query_params
+        ):
+            self._paginator = ToDoListSearchPagination()
+
+        return super().paginator
+
+    @action(detail=False, methods=['post'], serializer_class=ToDoListBulkSerializer)
+    def bulk(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        return Response(data=serializer.save(), status=status.HTTP_200_OK)
+
+    import_media_types = {
+        'application/x-ndjson': 'ndjson',
+        'application/jsonl': 'ndjson',
+        'text/csv': 'csv',
+    }
+    import_extensions = {
+        'ndjson': 'ndjson',
+        'jsonl': 'ndjson',
+        'csv': 'csv',
+    }
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_lines(self, request):
+        """
+        The body is read line by line and rows are inserted in batches of TODO_LIST_IMPORT['BATCH_SIZE'],
+        each batch in a transaction of its own, so large files are neither buffered nor parsed with a serializer per row
+        """
+        media_type = request.content_type.split(';')[0].strip().lower()
+
+        if media_type == 'multipart/form-data':
+            upload = request.FILES.get('file')
+            if upload is None:
+                raise ValidationError({'file': ['No file was submitted.']})
+
+            file_format = self.import_extensions.get(upload.name.rpartition('.')[2].lower())
+            file_format = file_format or self.import_media_types.get(upload.content_type)
+            lines = upload
+        else:
+            file_format = self.import_media_types.get(media_type)
+            lines = request.stream or ()
+
+        if file_format is None:
+            raise UnsupportedMediaType(media_type)
+
+        result = import_lines(
+            request.user.organization_id_id,
+            lines,
+            file_format,
+            batch_size=settings.TODO_LIST_IMPORT['BATCH_SIZE'],
+            max_errors=settings.TODO_LIST_IMPORT['MAX_ERRORS'],
+        )
+
+        return Response(data=result.as_dict(), status=status.HTTP_200_OK)
+
+    @action(detail=False)
+    def changes(self, request):
+        return self.cached_read(self.read_changes, request)
+
+    def read_changes(self, request):
+        try:
+            since = int(request.query_params.get('since') or 0)
+        except ValueError:
+            since = -1
+
+        # Tokens are sequence numbers of a 64-bit integer column, larger values overflow the query parameter
+        if not 0 <= since <= 2 ** 63 - 1:
+            raise ValidationError({'since': ['A valid token is required.']})
+
+        data = read_changes(request.user.organization_id_id, since, self.paginator.get_page_size(request))
+
+        return Response(data=data, status=status.HTTP_200_OK)
+
+    @action(detail=False, renderer_classes=[NDJSONRenderer, StreamingJSONRenderer])
+    def export(self, request):
+        """
+        Rows are read with a chunked .values() iterator (a server-side cursor on PostgreSQL) and encoded
+        as they are streamed, so memory does not grow with the size of the organization's list
+        """
+        queryset = self.filter_queryset(self.get_queryset()).values(*self.serializer_class.Meta.fields)
+        rows = queryset.iterator(chunk_size=settings.TODO_LIST_EXPORT_CHUNK_SIZE)
+        renderer = request.accepted_renderer
+
+        response = StreamingHttpResponse(
+            renderer.stream(rows, chunk_size=settings.TODO_LIST_EXPORT_CHUNK_SIZE),
+            content_type=renderer.media_type,
+        )
+        response['Content-Disposition'] = 'attachment; filename="todo_list.%s"' % renderer.format
+
+        return response
+
+    @action(detail=False, methods=['post'], url_path='export/job')
+    def export_job(self, request):
+        """
+        The format is read from the body ({"format": "json"}), ?format= picks the renderer of the response
+        """
+        file_format = request.data.get('format', 'ndjson')
+        if file_format not in EXPORT_RENDERERS:
+            raise ValidationError({'format': ['Expected one of: %s.' % ', '.join(EXPORT_RENDERERS)]})
+
+        is_finished = IsFinishedFilter().get_is_finished(request)
+        ordering = OrderingFilter().get_ordering(request, self.get_queryset(), self)[0]
+
+        job = Job.objects.enqueue('api.export', {
+            'organization_id': request.user.organization_id_id,
+            'file_format': file_format,
+            'is_finished': is_finished,
+            'ordering': ordering,
+        }, organization_id=request.user.organization_id_id)
+
+        return Response(
+            data=JobSerializer(job).data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': '/api/jobs/%s/' % job.id},
+        )
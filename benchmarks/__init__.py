@@ -0,0 +1,14 @@
+"""
+Benchmarks of the project hot paths, every module is runnable with python -m benchmarks.<module> --help
+"""
+import os
+
+
+def setup_django():
+    """
+    Configure Django with the project settings for a standalone benchmark run
+    """
+    import django
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'todo_list_project.settings')
+    django.setup()
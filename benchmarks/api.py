@@ -0,0 +1,206 @@
+"""
+In-process benchmark of the API hot paths: login, list, create, toggle is_finished and delete
+
+    python manage.py bench [--organizations 10] [--users 10] [--items 1000] [--requests 500] [--json results.json]
+    python -m benchmarks.api ...
+
+The data (--organizations x --users x --items) is generated in a throwaway test database, every scenario
+sends --requests requests through the whole middleware stack with the Django test client, users are
+authenticated with signed tokens. Throughput, p50/p95/p99 latency, SQL queries per request and the
+peak RSS of the process are reported per scenario, --compare prints the change against an earlier --json file
+"""
+import itertools
+import json
+import resource
+import sys
+import time
+from contextlib import ExitStack
+
+from benchmarks.data import PASSWORD, generate
+
+
+SCENARIOS = ['login', 'list', 'list_uncached', 'create', 'toggle', 'delete']
+
+
+class Scenarios:
+    """
+    Request functions of the scenarios, each one sends a single request
+    """
+    def __init__(self, dataset):
+        from rest_framework.test import APIClient
+
+        from api.authentication import SignedTokenAuthentication
+        from users.models import CustomUser
+
+        self.client = APIClient()
+        self.dataset = dataset
+        self.users = itertools.cycle([
+            (organization, email) for organization in dataset for email in organization['emails']
+        ])
+
+        self.tokens = {}
+        for organization in dataset:
+            user = CustomUser.objects.get(organization_id=organization['id'], email=organization['emails'][0])
+            self.tokens[organization['id']] = 'Bearer ' + SignedTokenAuthentication.issue_token(user)[0]
+
+        self.organizations = itertools.cycle(dataset)
+        self.toggled = {}
+
+    def request(self, method, path, organization, data=None):
+        response = getattr(self.client, method)(
+            path, data, format='json', HTTP_AUTHORIZATION=self.tokens[organization['id']],
+        )
+        assert response.status_code < 400, (method, path, response.status_code)
+
+        return response
+
+    def login(self, number):
+        organization, email = next(self.users)
+        response = self.client.post(
+            '/api/login/', {'email': email, 'organization': organization['name'], 'password': PASSWORD},
+        )
+        assert response.status_code == 200, response.status_code
+
+    def list(self, number):
+        self.request('get', '/api/todo_lists/', next(self.organizations))
+
+    def list_uncached(self, number):
+        from django.conf import settings
+        from django.test import override_settings
+
+        with override_settings(TODO_LIST_CACHE=dict(settings.TODO_LIST_CACHE, ENABLED=False)):
+            self.request('get', '/api/todo_lists/', next(self.organizations))
+
+    def create(self, number):
+        organization = next(self.organizations)
+        response = self.request('post', '/api/todo_lists/', organization, {'text': 'Created line %s' % number})
+        organization['line_ids'].append(response.data['id'])
+
+    def toggle(self, number):
+        organization = next(self.organizations)
+        line_id = organization['line_ids'][number % len(organization['line_ids'])]
+        is_finished = self.toggled[line_id] = not self.toggled.get(line_id, False)
+
+        self.request('patch', '/api/todo_lists/%s/' % line_id, organization, {'is_finished': is_finished})
+
+    def delete(self, number):
+        organization = next(self.organizations)
+        self.request('delete', '/api/todo_lists/%s/' % organization['line_ids'].pop(), organization)
+
+
+def measure(name, func, requests):
+    """
+    Call func(number) requests times and return the throughput, latency percentiles, queries per request and peak RSS
+    """
+    from django.db import connections
+
+    queries = 0
+
+    def count(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    latencies = []
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(count))
+
+        started = time.perf_counter()
+        for number in range(requests):
+            request_started = time.perf_counter()
+            func(number)
+            latencies.append(time.perf_counter() - request_started)
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+
+    def percentile(fraction):
+        return round(latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] * 1000, 3)
+
+    return {
+        'scenario': name,
+        'requests': requests,
+        'requests_per_sec': round(requests / elapsed, 1),
+        'p50_ms': percentile(0.5),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+        'queries_per_request': round(queries / requests, 2),
+        # ru_maxrss is in kilobytes on Linux
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def run(organizations, users, items, requests, scenarios=SCENARIOS, stdout=sys.stdout):
+    """
+    Generate the data in a throwaway test database and run the scenarios in order
+    """
+    from django.conf import settings
+    from django.test import override_settings
+    from django.test.utils import setup_databases, teardown_databases
+
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        started = time.perf_counter()
+        dataset = generate(organizations, users, items)
+        stdout.write('Generated %s organizations x %s users x %s lines in %.1fs\n' % (
+            organizations, users, items, time.perf_counter() - started,
+        ))
+
+        functions = Scenarios(dataset)
+        results = []
+        # All the logins come from one client, the throttles of api.throttling would refuse most of them
+        with override_settings(AUTH_THROTTLE=dict(settings.AUTH_THROTTLE, ENABLED=False)):
+            for name in scenarios:
+                # Login hashes a password per request, a tenth of the requests is enough
+                count = max(1, requests // 10) if name == 'login' else requests
+                results.append(measure(name, getattr(functions, name), count))
+                stdout.write('%s done\n' % name)
+
+        return results
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+
+def format_results(results, baseline=None):
+    """
+    Return the results as a table, with the relative change of throughput and p50 against the baseline results
+    """
+    baseline = {result['scenario']: result for result in baseline or []}
+    lines = ['%-14s %9s %12s %10s %10s %10s %10s %10s' % (
+        'scenario', 'requests', 'requests/s', 'p50 ms', 'p95 ms', 'p99 ms', 'queries', 'rss MB',
+    )]
+
+    for result in results:
+        line = '%-14s %9s %12s %10s %10s %10s %10s %10s' % (
+            result['scenario'], result['requests'], result['requests_per_sec'], result['p50_ms'],
+            result['p95_ms'], result['p99_ms'], result['queries_per_request'], result['peak_rss_mb'],
+        )
+
+        previous = baseline.get(result['scenario'])
+        if previous:
+            line += '   requests/s %+.1f%%, p50 %+.1f%%' % (
+                (result['requests_per_sec'] / previous['requests_per_sec'] - 1) * 100,
+                (result['p50_ms'] / previous['p50_ms'] - 1) * 100 if previous['p50_ms'] else 0,
+            )
+        lines.append(line)
+
+    return '\n'.join(lines)
+
+
+def load_results(path):
+    with open(path) as file:
+        return json.load(file)
+
+
+def main():
+    from django.core.management import execute_from_command_line
+
+    from benchmarks import setup_django
+
+    setup_django()
+    execute_from_command_line([sys.argv[0], 'bench'] + sys.argv[1:])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+"""
+WSGI vs ASGI load test of GET /api/todo_lists/ against the local dev database
+
+    python -m benchmarks.asgi_load [--connections 1000] [--duration 20] [--json results.json]
+
+Every server is started in turn (gunicorn with gthread workers for WSGI, uvicorn for ASGI,
+--wsgi-command/--asgi-command replace them), then --connections keep-alive HTTP/1.1 connections
+request the todo list with a signed token for --duration seconds. Throughput, p50/p99 latency
+and errors are reported per server.
+
+The dev database is migrated and gets a "Benchmark" organization, user and --items lines
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import shlex
+import socket
+import subprocess
+import sys
+import time
+
+from benchmarks import setup_django
+
+
+WSGI_COMMAND = (
+    '{python} -m gunicorn todo_list_project.wsgi:application --bind 127.0.0.1:{port} '
+    '--workers {workers} --worker-class gthread --threads 32 --backlog 2048'
+)
+ASGI_COMMAND = (
+    '{python} -m uvicorn todo_list_project.asgi:application --host 127.0.0.1 --port {port} '
+    '--workers {workers} --backlog 2048 --log-level warning'
+)
+
+CREDENTIALS = {'email': 'benchmark@example.com', 'organization': 'Benchmark', 'password': 'benchmark password'}
+
+
+def prepare_database(items):
+    from django.core.management import call_command
+
+    from todo_lists.models import Organization, ToDoList
+    from users.models import CustomUser
+
+    call_command('migrate', verbosity=0)
+
+    organization, _ = Organization.objects.get_or_create(name=CREDENTIALS['organization'])
+    if not CustomUser.objects.filter(organization_id=organization, email=CREDENTIALS['email']).exists():
+        CustomUser.objects.create_user(**CREDENTIALS)
+
+    missing = items - ToDoList.objects.filter(organization=organization).count()
+    if missing > 0:
+        ToDoList.objects.bulk_create(
+            (ToDoList(organization=organization, text='Benchmark line %s' % i) for i in range(missing)),
+            batch_size=500,
+        )
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+
+    raise RuntimeError('Server did not start listening on port %s' % port)
+
+
+async def http_request(reader, writer, method, path, body=b'', headers=()):
+    """
+    Send one HTTP/1.1 request over a keep-alive connection and return the status and body
+    """
+    lines = ['%s %s HTTP/1.1' % (method, path), 'Host: 127.0.0.1', 'Content-Length: %s' % len(body)]
+    lines.extend('%s: %s' % header for header in headers)
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode() + body)
+    await writer.drain()
+
+    head = await reader.readuntil(b'\r\n\r\n')
+    status = int(head.split(b' ', 2)[1])
+    length = 0
+    for line in head.split(b'\r\n')[1:]:
+        name, _, value = line.partition(b':')
+        if name.strip().lower() == b'content-length':
+            length = int(value)
+
+    return status, await reader.readexactly(length)
+
+
+async def get_token(port):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        status, body = await http_request(
+            reader, writer, 'POST', '/api/token/', json.dumps(CREDENTIALS).encode(),
+            [('Content-Type', 'application/json')],
+        )
+    finally:
+        writer.close()
+
+    if status != 200:
+        raise RuntimeError('Could not get a token: %s %s' % (status, body[:200]))
+
+    return json.loads(body)['token']
+
+
+async def load(port, connections, duration, path):
+    token = await get_token(port)
+    headers = [('Authorization', 'Bearer ' + token)]
+    latencies = []
+    errors = 0
+    connecting = asyncio.Semaphore(100)
+    deadline = time.monotonic() + duration
+
+    async def client():
+        nonlocal errors
+        reader = writer = None
+
+        while time.monotonic() < deadline:
+            try:
+                if writer is None:
+                    async with connecting:
+                        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+
+                started = time.perf_counter()
+                status, _ = await http_request(reader, writer, 'GET', path, headers=headers)
+
+                if status == 200:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+            except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                errors += 1
+                writer = None
+                await asyncio.sleep(0.05)
+
+        if writer is not None:
+            writer.close()
+
+    started = time.monotonic()
+    await asyncio.gather(*(client() for _ in range(connections)))
+    elapsed = time.monotonic() - started
+
+    latencies.sort()
+
+    def percentile(fraction):
+        return round(latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] * 1000, 2) if latencies else None
+
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'requests_per_sec': round(len(latencies) / elapsed, 1),
+        'p50_ms': percentile(0.5),
+        'p99_ms': percentile(0.99),
+    }
+
+
+def run_server(name, command, args):
+    command = command.format(python=sys.executable, port=args.port, workers=args.workers)
+    server = subprocess.Popen(shlex.split(command), env=dict(os.environ, PYTHONUNBUFFERED='1'))
+
+    try:
+        wait_for_port(args.port)
+        result = asyncio.run(load(args.port, args.connections, args.duration, args.path))
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    return dict(result, server=name, command=command, connections=args.connections)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--connections', type=int, default=1000)
+    parser.add_argument('--duration', type=float, default=20, help='seconds of load per server')
+    parser.add_argument('--items', type=int, default=100, help='todo list lines of the benchmark organization')
+    parser.add_argument('--path', default='/api/todo_lists/')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='server processes')
+    parser.add_argument('--wsgi-command', default=WSGI_COMMAND)
+    parser.add_argument('--asgi-command', default=ASGI_COMMAND)
+    parser.add_argument('--only', choices=['wsgi', 'asgi'])
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    # Every connection needs a file descriptor on both sides
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, max(soft, args.connections * 2 + 100)), hard))
+
+    setup_django()
+    prepare_database(args.items)
+
+    results = []
+    for name, command in (('wsgi', args.wsgi_command), ('asgi', args.asgi_command)):
+        if args.only in (None, name):
+            results.append(run_server(name, command, args))
+
+    print('%-6s %12s %10s %14s %10s %10s' % ('server', 'connections', 'requests', 'requests/s', 'p50 ms', 'p99 ms'))
+    for result in results:
+        print('%-6s %12s %10s %14s %10s %10s   errors: %s' % (
+            result['server'], result['connections'], result['requests'], result['requests_per_sec'],
+            result['p50_ms'], result['p99_ms'], result['errors'],
+        ))
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+Benchmark data generator: organizations x users x todo list lines
+"""
+PASSWORD = 'benchmark password'
+
+
+def generate(organizations, users, items):
+    """
+    Create the given number of organizations with users users and items todo list lines each
+    and return a list of {'id', 'name', 'emails', 'line_ids'} dicts, one per organization.
+
+    Every user gets the same password (PASSWORD), it is hashed once
+    """
+    from todo_lists.models import Organization, ToDoList
+    from users.hashers import make_password
+    from users.models import CustomUser
+
+    password = make_password(PASSWORD)
+    offset = Organization.objects.count()
+
+    Organization.objects.bulk_create(
+        Organization(name='Benchmark organization %s' % number) for number in range(offset, offset + organizations)
+    )
+    created = list(Organization.objects.order_by('-id').values_list('id', 'name')[:organizations])
+
+    dataset = []
+    for organization_id, name in reversed(created):
+        emails = ['user%s@example.com' % number for number in range(users)]
+
+        CustomUser.objects.bulk_create(
+            CustomUser(email=email, organization=name, organization_id_id=organization_id, password=password)
+            for email in emails
+        )
+        ToDoList.objects.bulk_create(
+            ToDoList(organization_id=organization_id, text='Benchmark line %s' % number, is_finished=number % 2 == 0)
+            for number in range(items)
+        )
+
+        dataset.append({
+            'id': organization_id,
+            'name': name,
+            'emails': emails,
+            'line_ids': list(ToDoList.objects.filter(organization_id=organization_id).values_list('id', flat=True)),
+        })
+
+    return dataset
@@ -0,0 +1,115 @@
+"""
+Password hashing benchmark: logins/sec per core and for all cores for each hashing setting
+
+    python -m benchmarks.password_hashing [--seconds 2] [--json results.json]
+
+Settings whose library (argon2-cffi, bcrypt) is not installed are skipped
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from importlib.util import find_spec
+
+from benchmarks import setup_django
+
+
+SETTINGS = [
+    ('pbkdf2_sha256', {'PBKDF2_ITERATIONS': 180000}),
+    ('pbkdf2_sha256', {'PBKDF2_ITERATIONS': 100000}),
+    ('pbkdf2_sha256', {'PBKDF2_ITERATIONS': 50000}),
+    ('argon2', {'ARGON2_TIME_COST': 2, 'ARGON2_MEMORY_COST': 512, 'ARGON2_PARALLELISM': 2}),
+    ('argon2', {'ARGON2_TIME_COST': 2, 'ARGON2_MEMORY_COST': 102400, 'ARGON2_PARALLELISM': 8}),
+    ('bcrypt_sha256', {'BCRYPT_ROUNDS': 12}),
+    ('bcrypt_sha256', {'BCRYPT_ROUNDS': 10}),
+]
+
+HASHERS = {
+    'pbkdf2_sha256': ('users.hashers.PBKDF2PasswordHasher', 'hashlib'),
+    'argon2': ('users.hashers.Argon2PasswordHasher', 'argon2'),
+    'bcrypt_sha256': ('users.hashers.BCryptSHA256PasswordHasher', 'bcrypt'),
+}
+
+
+def measure(check, seconds, threads):
+    """
+    Call check() from the given number of threads for the given time and return calls per second
+    """
+    counts = [0] * threads
+    deadline = time.perf_counter() + seconds
+
+    def worker(index):
+        while time.perf_counter() < deadline:
+            check()
+            counts[index] += 1
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    return sum(counts) / (time.perf_counter() - started)
+
+
+def run(seconds):
+    from django.conf import settings
+    from django.test import override_settings
+
+    from users import hashers
+
+    cores = os.cpu_count() or 1
+    results = []
+
+    for algorithm, cost in SETTINGS:
+        hasher, library = HASHERS[algorithm]
+        if find_spec(library) is None:
+            continue
+
+        hashing = {**settings.PASSWORD_HASHING, **cost, 'ALGORITHM': algorithm, 'WORKERS': cores}
+
+        with override_settings(PASSWORD_HASHING=hashing, PASSWORD_HASHERS=[hasher]):
+            encoded = hashers.make_password('benchmark password')
+            assert hashers.check_password('benchmark password', encoded)
+
+            per_core = measure(lambda: hashers._check_password('benchmark password', encoded), seconds, threads=1)
+            all_cores = measure(lambda: hashers.check_password('benchmark password', encoded), seconds, threads=cores * 2)
+
+        results.append({
+            'algorithm': algorithm,
+            'cost': cost,
+            'logins_per_sec_per_core': round(per_core, 1),
+            'logins_per_sec': round(all_cores, 1),
+            'cores': cores,
+        })
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=2, help='measuring time of every setting and mode')
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    setup_django()
+    results = run(args.seconds)
+
+    print('%-15s %-80s %14s %14s' % ('algorithm', 'cost', 'logins/s/core', 'logins/s'))
+    for result in results:
+        print('%-15s %-80s %14s %14s' % (
+            result['algorithm'],
+            json.dumps(result['cost']),
+            result['logins_per_sec_per_core'],
+            result['logins_per_sec'],
+        ))
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
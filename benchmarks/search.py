@@ -0,0 +1,142 @@
+"""
+Full-text search benchmark of GET /api/todo_lists/?search= against an unindexed icontains filter
+
+    python -m benchmarks.search [--items 1000000] [--organizations 10] [--requests 50] [--json results.json]
+
+--items lines of six words from a vocabulary of --words random words are spread over --organizations
+organizations in a throwaway test database. Every request searches one organization for one or two words
+of the vocabulary. A page of search results is compared with a page of an icontains filter,
+the search is also sent through the API with the response cache disabled
+"""
+import argparse
+import json
+import random
+import string
+import time
+
+from benchmarks import setup_django
+
+
+MODES = ['search', 'icontains', 'api search']
+PAGE_SIZE = 100
+
+
+def generate(organizations, items, words):
+    from todo_lists.models import Organization, ToDoList
+
+    vocabulary = [''.join(random.choices(string.ascii_lowercase, k=random.randint(3, 10))) for _ in range(words)]
+
+    Organization.objects.bulk_create(
+        Organization(name='Search organization %s' % number) for number in range(organizations)
+    )
+    organization_ids = list(Organization.objects.values_list('id', flat=True))
+
+    batch = []
+    for number in range(items):
+        text = ' '.join(random.choices(vocabulary, k=6))
+        batch.append(ToDoList(organization_id=organization_ids[number % organizations], text=text))
+        if len(batch) == 10000:
+            ToDoList.objects.bulk_create(batch)
+            batch = []
+    ToDoList.objects.bulk_create(batch)
+
+    return organization_ids, vocabulary
+
+
+def run(organizations, items, words, requests):
+    from django.conf import settings
+    from django.test import override_settings
+    from django.test.utils import setup_databases, teardown_databases
+    from rest_framework.test import APIClient
+
+    from api.authentication import SignedTokenAuthentication, TokenUser
+    from todo_lists.models import ToDoList
+    from todo_lists.search import search
+
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        started = time.perf_counter()
+        organization_ids, vocabulary = generate(organizations, items, words)
+        print('Generated %s lines in %.1fs' % (items, time.perf_counter() - started))
+
+        client = APIClient()
+        tokens = {
+            organization_id: 'Bearer ' + SignedTokenAuthentication.issue_token(TokenUser(None, organization_id))[0]
+            for organization_id in organization_ids
+        }
+        queries = [
+            (random.choice(organization_ids), ' '.join(random.sample(vocabulary, random.randint(1, 2))))
+            for _ in range(requests)
+        ]
+
+        def search_page(organization_id, query):
+            return list(search(ToDoList.objects.all(), query, organization_id).values('id', 'text')[:PAGE_SIZE])
+
+        def icontains_page(organization_id, query):
+            queryset = ToDoList.objects.filter(organization_id=organization_id)
+            for word in query.split():
+                queryset = queryset.filter(text__icontains=word)
+            return list(queryset.order_by('id').values('id', 'text')[:PAGE_SIZE])
+
+        def api_page(organization_id, query):
+            response = client.get(
+                '/api/todo_lists/', {'search': query, 'page_size': PAGE_SIZE},
+                HTTP_AUTHORIZATION=tokens[organization_id],
+            )
+            assert response.status_code == 200, response.status_code
+            return response.data['results']
+
+        functions = {'search': search_page, 'icontains': icontains_page, 'api search': api_page}
+
+        results = []
+        with override_settings(
+            TODO_LIST_CACHE=dict(settings.TODO_LIST_CACHE, ENABLED=False),
+            API_METRICS=dict(settings.API_METRICS, QUERY_BUDGET_ACTION='log'),
+        ):
+            for mode in MODES:
+                latencies = []
+                matches = 0
+                for organization_id, query in queries:
+                    request_started = time.perf_counter()
+                    matches += len(functions[mode](organization_id, query))
+                    latencies.append(time.perf_counter() - request_started)
+
+                latencies.sort()
+                results.append({
+                    'mode': mode,
+                    'items': items,
+                    'p50_ms': round(latencies[len(latencies) // 2] * 1000, 2),
+                    'p99_ms': round(latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))] * 1000, 2),
+                    'matches_per_request': round(matches / len(queries), 1),
+                })
+
+        return results
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=1000000, help='todo list lines of all organizations')
+    parser.add_argument('--organizations', type=int, default=10)
+    parser.add_argument('--words', type=int, default=20000, help='size of the vocabulary of the lines')
+    parser.add_argument('--requests', type=int, default=50, help='search requests per mode')
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    setup_django()
+    results = run(args.organizations, args.items, args.words, args.requests)
+
+    print('%-10s %10s %10s %10s %10s' % ('mode', 'items', 'p50 ms', 'p99 ms', 'matches'))
+    for result in results:
+        print('%-10s %10s %10s %10s %10s' % (
+            result['mode'], result['items'], result['p50_ms'], result['p99_ms'], result['matches_per_request'],
+        ))
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Serialization benchmark of GET /api/todo_lists/ returning a whole list in one page
+
+    python -m benchmarks.serialization [--items 10000] [--requests 20] [--json results.json]
+
+Compares the serializer path with the .values() fast path (api.fast_read.ValuesReadMixin), each
+with the standard library JSON encoder and with orjson when installed. The list is generated in
+a throwaway test database, the response cache is disabled and all modes must return the same bytes
+"""
+import argparse
+import json
+import time
+from unittest import mock
+
+from benchmarks import setup_django
+
+
+MODES = [
+    ('serializer + json', False, False),
+    ('serializer + orjson', False, True),
+    ('values + json', True, False),
+    ('values + orjson', True, True),
+]
+
+
+def run(items, requests):
+    from django.conf import settings
+    from django.test import override_settings
+    from django.test.utils import setup_databases, teardown_databases
+    from rest_framework.test import APIClient
+
+    from api import renderers
+    from api.authentication import SignedTokenAuthentication
+    from benchmarks.data import generate
+    from users.models import CustomUser
+
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        organization = generate(1, 1, items)[0]
+        user = CustomUser.objects.get(organization_id=organization['id'])
+        client = APIClient(HTTP_AUTHORIZATION='Bearer ' + SignedTokenAuthentication.issue_token(user)[0])
+
+        overrides = override_settings(
+            TODO_LIST_CACHE=dict(settings.TODO_LIST_CACHE, ENABLED=False),
+            TODO_LIST_PAGINATION=dict(settings.TODO_LIST_PAGINATION, MAX_PAGE_SIZE=items),
+            API_METRICS=dict(settings.API_METRICS, QUERY_BUDGET_ACTION='log'),
+        )
+        path = '/api/todo_lists/?page_size=%s' % items
+
+        results = []
+        contents = set()
+        with overrides:
+            for name, fast_read, use_orjson in MODES:
+                if use_orjson and renderers.orjson is None:
+                    continue
+
+                orjson = renderers.orjson if use_orjson else None
+                with override_settings(TODO_LIST_FAST_READ=fast_read), mock.patch.object(renderers, 'orjson', orjson):
+                    latencies = []
+                    for _ in range(requests + 1):
+                        started = time.perf_counter()
+                        response = client.get(path)
+                        latencies.append(time.perf_counter() - started)
+
+                assert response.status_code == 200, response.status_code
+                contents.add(response.content)
+
+                # The first request warms up the connection and the code paths
+                latencies = sorted(latencies[1:])
+                results.append({
+                    'mode': name,
+                    'items': items,
+                    'p50_ms': round(latencies[len(latencies) // 2] * 1000, 2),
+                    'requests_per_sec': round(len(latencies) / sum(latencies), 1),
+                    'bytes': len(response.content),
+                })
+
+        assert len(contents) == 1, 'The modes returned different content'
+
+        baseline = results[0]['p50_ms']
+        for result in results:
+            result['speedup'] = round(baseline / result['p50_ms'], 2)
+
+        return results
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=10000, help='todo list lines in the page')
+    parser.add_argument('--requests', type=int, default=20, help='requests per mode')
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    setup_django()
+    results = run(args.items, args.requests)
+
+    print('%-22s %8s %10s %12s %10s %8s' % ('mode', 'items', 'p50 ms', 'requests/s', 'bytes', 'speedup'))
+    for result in results:
+        print('%-22s %8s %10s %12s %10s %8s' % (
+            result['mode'], result['items'], result['p50_ms'], result['requests_per_sec'],
+            result['bytes'], result['speedup'],
+        ))
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
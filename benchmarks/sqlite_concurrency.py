@@ -0,0 +1,149 @@
+"""
+SQLite concurrency benchmark: reads/sec and writes/sec of concurrent processes with the default
+SQLite settings and with SQLITE_TUNING (WAL, synchronous=NORMAL, mmap, cache_size, busy_timeout)
+
+    python -m benchmarks.sqlite_concurrency [--readers 4] [--writers 4] [--duration 10] [--json results.json]
+
+Every mode runs against a fresh database file in a temporary directory with --items todo list lines.
+Readers fetch the first page of the list, writers insert a line and cross out another one,
+"database is locked" failures are counted as errors
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+
+MODES = [
+    ('default', {'SQLITE_TUNING': '0'}),
+    ('tuned', {'SQLITE_TUNING': '1'}),
+]
+
+
+def setup(database, environ):
+    os.environ.update(environ, DATABASE_PROFILE='sqlite', DATABASE_NAME=database)
+
+    from benchmarks import setup_django
+
+    setup_django()
+
+
+def prepare(database, environ, items):
+    setup(database, environ)
+
+    from django.core.management import call_command
+
+    from todo_lists.models import Organization, ToDoList
+
+    call_command('migrate', verbosity=0)
+
+    organization = Organization.objects.create(name='Benchmark')
+    ToDoList.objects.bulk_create(
+        (ToDoList(organization=organization, text='Benchmark line %s' % i) for i in range(items)),
+        batch_size=300,
+    )
+
+
+def work(role, database, environ, start_at, duration, results):
+    setup(database, environ)
+
+    from django.db import OperationalError, connection
+
+    from todo_lists.models import ToDoList
+
+    organization_id = ToDoList.objects.values_list('organization_id', flat=True).first()
+    line_ids = list(ToDoList.objects.values_list('id', flat=True)[:1000])
+    connection.close()
+
+    operations = errors = 0
+    time.sleep(max(0, start_at - time.time()))
+    deadline = start_at + duration
+
+    while time.time() < deadline:
+        try:
+            if role == 'reader':
+                list(ToDoList.objects.filter(organization_id=organization_id).order_by('id')[:100].values_list(
+                    'id', 'text', 'is_finished',
+                ))
+            else:
+                ToDoList.objects.create(organization_id=organization_id, text='Written line')
+                ToDoList.objects.filter(id=line_ids[operations % len(line_ids)]).update(is_finished=True)
+            operations += 1
+        except OperationalError:
+            errors += 1
+
+    results.put((role, operations, errors))
+
+
+def run(mode, environ, args):
+    directory = tempfile.mkdtemp(prefix='sqlite-benchmark-')
+    database = os.path.join(directory, 'db.sqlite3')
+    context = multiprocessing.get_context('spawn')
+
+    try:
+        process = context.Process(target=prepare, args=(database, environ, args.items))
+        process.start()
+        process.join()
+
+        results = context.Queue()
+        start_at = time.time() + 3
+        roles = ['reader'] * args.readers + ['writer'] * args.writers
+        processes = [
+            context.Process(target=work, args=(role, database, environ, start_at, args.duration, results))
+            for role in roles
+        ]
+        for process in processes:
+            process.start()
+
+        totals = {'reader': [0, 0], 'writer': [0, 0]}
+        for _ in processes:
+            role, operations, errors = results.get()
+            totals[role][0] += operations
+            totals[role][1] += errors
+
+        for process in processes:
+            process.join()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return {
+        'mode': mode,
+        'readers': args.readers,
+        'writers': args.writers,
+        'reads_per_sec': round(totals['reader'][0] / args.duration, 1),
+        'writes_per_sec': round(totals['writer'][0] / args.duration, 1),
+        'read_errors': totals['reader'][1],
+        'write_errors': totals['writer'][1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--readers', type=int, default=4, help='reading processes')
+    parser.add_argument('--writers', type=int, default=4, help='writing processes')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per mode')
+    parser.add_argument('--items', type=int, default=10000, help='todo list lines in the database')
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    results = [run(mode, environ, args) for mode, environ in MODES]
+
+    print('%-8s %8s %8s %12s %12s %12s %12s' % (
+        'mode', 'readers', 'writers', 'reads/s', 'writes/s', 'read errors', 'write errors',
+    ))
+    for result in results:
+        print('%-8s %8s %8s %12s %12s %12s %12s' % (
+            result['mode'], result['readers'], result['writers'], result['reads_per_sec'],
+            result['writes_per_sec'], result['read_errors'], result['write_errors'],
+        ))
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
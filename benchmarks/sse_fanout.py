@@ -0,0 +1,157 @@
+"""
+Idle connections and fan-out of the todo list event stream (/api/todo_lists/events/) on one ASGI worker
+
+    python -m benchmarks.sse_fanout [--connections 5000] [--writes 20] [--json results.json]
+
+A single uvicorn process is started on a throwaway SQLite database, --connections clients of one organization
+open the event stream and stay idle, then --writes lines are created through the API one at a time and the time
+until every client got the event is measured. The RSS and the thread count of the server are read from /proc
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import setup_django
+from benchmarks.asgi_load import get_token, http_request, prepare_database, wait_for_port
+
+
+ASGI_COMMAND = (
+    '{python} -m uvicorn todo_list_project.asgi:application --host 127.0.0.1 --port {port} '
+    '--workers 1 --backlog 4096 --log-level warning'
+)
+
+
+def process_status(pid):
+    """
+    Return the RSS in MB and the thread count of the process
+    """
+    fields = {}
+    with open('/proc/%s/status' % pid) as file:
+        for line in file:
+            name, _, value = line.partition(':')
+            fields[name] = value.strip()
+
+    return round(int(fields['VmRSS'].split()[0]) / 1024, 1), int(fields['Threads'])
+
+
+async def open_stream(port, token):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write((
+        'GET /api/todo_lists/events/ HTTP/1.1\r\nHost: 127.0.0.1\r\nAuthorization: Bearer %s\r\n\r\n' % token
+    ).encode())
+    await writer.drain()
+
+    head = await reader.readuntil(b'\r\n\r\n')
+    if int(head.split(b' ', 2)[1]) != 200:
+        raise RuntimeError('Could not open the event stream: %s' % head[:200])
+
+    return reader, writer
+
+
+async def fan_out(port, connections, writes, server_pid):
+    token = await get_token(port)
+    connecting = asyncio.Semaphore(200)
+
+    async def connect():
+        async with connecting:
+            return await open_stream(port, token)
+
+    started = time.perf_counter()
+    streams = await asyncio.gather(*(connect() for _ in range(connections)))
+    connect_seconds = time.perf_counter() - started
+
+    # Let the server settle with every stream idle
+    await asyncio.sleep(1)
+    rss_mb, threads = process_status(server_pid)
+
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    headers = [('Authorization', 'Bearer ' + token), ('Content-Type', 'application/json')]
+    latencies = []
+
+    async def wait_for_event(stream_reader):
+        while b'event: changes' not in await stream_reader.readuntil(b'\n\n'):
+            pass
+        return time.perf_counter()
+
+    try:
+        for number in range(writes):
+            waiting = [asyncio.ensure_future(wait_for_event(stream_reader)) for stream_reader, _ in streams]
+
+            started = time.perf_counter()
+            status, _ = await http_request(
+                reader, writer, 'POST', '/api/todo_lists/', json.dumps({'text': 'Event %s' % number}).encode(), headers,
+            )
+            if status != 201:
+                raise RuntimeError('Could not create a line: %s' % status)
+
+            received = await asyncio.gather(*waiting)
+            latencies.append(max(received) - started)
+    finally:
+        writer.close()
+        for _, stream_writer in streams:
+            stream_writer.close()
+
+    latencies.sort()
+
+    return {
+        'connections': connections,
+        'connect_seconds': round(connect_seconds, 2),
+        'idle_rss_mb': rss_mb,
+        'idle_threads': threads,
+        'writes': writes,
+        'fan_out_p50_ms': round(latencies[len(latencies) // 2] * 1000, 2),
+        'fan_out_max_ms': round(latencies[-1] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--connections', type=int, default=5000)
+    parser.add_argument('--writes', type=int, default=20, help='lines created while the streams are open')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--command', default=ASGI_COMMAND)
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    # Every connection needs a file descriptor on both sides
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, max(soft, args.connections * 2 + 100)), hard))
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ['DATABASE_NAME'] = os.path.join(directory, 'db.sqlite3')
+        os.environ['TODO_LIST_EVENTS_MAX_SUBSCRIPTIONS'] = str(max(args.connections, 10000))
+
+        setup_django()
+        prepare_database(0)
+
+        command = args.command.format(python=sys.executable, port=args.port)
+        server = subprocess.Popen(shlex.split(command), env=dict(os.environ, PYTHONUNBUFFERED='1'))
+        try:
+            wait_for_port(args.port)
+            result = asyncio.run(fan_out(args.port, args.connections, args.writes, server.pid))
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    print('%12s %12s %10s %10s %16s %16s' % (
+        'connections', 'connect s', 'rss MB', 'threads', 'fan-out p50 ms', 'fan-out max ms',
+    ))
+    print('%12s %12s %10s %10s %16s %16s' % (
+        result['connections'], result['connect_seconds'], result['idle_rss_mb'], result['idle_threads'],
+        result['fan_out_p50_ms'], result['fan_out_max_ms'],
+    ))
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(result, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
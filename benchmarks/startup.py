@@ -0,0 +1,164 @@
+"""
+Cold start of a WSGI worker: import of todo_list_project.wsgi and the first response of its application
+
+    python -m benchmarks.startup [--runs 10] [--budget-ms 400] [--json results.json]
+
+Every run is a fresh interpreter importing todo_list_project.wsgi and calling application once with
+GET /api/todo_lists/ and a signed token, against a throwaway SQLite database. Modes are the full settings
+profile, SETTINGS_PROFILE=api and the api profile with SETUPTOOLS_USE_DISTUTILS=stdlib: Django 3.0 imports
+distutils, which setuptools >= 60 serves through a shim importing all of setuptools and pkg_resources unless
+the variable opts out of it (an environment setting of the deployment, the project does not change it).
+One more run per mode with python -X importtime gives the packages that take the most import time.
+With --budget-ms the exit status is 1 when the median start of the last mode is over the budget
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from benchmarks import setup_django
+from benchmarks.asgi_load import CREDENTIALS, prepare_database
+
+
+MODES = {
+    # local is the default of setuptools, set so the caller's environment does not change the comparison
+    'full': {'SETTINGS_PROFILE': 'full', 'SETUPTOOLS_USE_DISTUTILS': 'local'},
+    'api': {'SETTINGS_PROFILE': 'api', 'SETUPTOOLS_USE_DISTUTILS': 'local'},
+    'api, stdlib distutils': {'SETTINGS_PROFILE': 'api', 'SETUPTOOLS_USE_DISTUTILS': 'stdlib'},
+}
+
+CHILD = '''
+import io, json, os, resource, time
+
+started = time.perf_counter()
+import todo_list_project.wsgi
+imported = time.perf_counter()
+
+statuses = []
+environ = {
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': '/api/todo_lists/', 'QUERY_STRING': '', 'SERVER_NAME': 'localhost',
+    'SERVER_PORT': '80', 'HTTP_HOST': 'localhost', 'wsgi.input': io.BytesIO(), 'wsgi.url_scheme': 'http',
+    'HTTP_AUTHORIZATION': 'Bearer ' + os.environ['BENCHMARK_TOKEN'],
+}
+body = b''.join(todo_list_project.wsgi.application(environ, lambda status, headers, exc_info=None: statuses.append(status)))
+responded = time.perf_counter()
+
+print(json.dumps({
+    'status': statuses[0],
+    'import_ms': (imported - started) * 1000,
+    'first_response_ms': (responded - imported) * 1000,
+    'maxrss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+'''
+
+
+def run_child(env, importtime=False):
+    """
+    Return the measurements of one cold start, its wall time and the stderr of the interpreter
+    """
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', CHILD]
+
+    started = time.perf_counter()
+    process = subprocess.run(command, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    wall_ms = (time.perf_counter() - started) * 1000
+
+    result = json.loads(process.stdout.decode().strip().splitlines()[-1])
+    if not result['status'].startswith('200'):
+        raise RuntimeError('The first response failed: %s' % result['status'])
+
+    result['total_ms'] = wall_ms
+
+    return result, process.stderr.decode()
+
+
+def import_summary(stderr, top):
+    """
+    Return the number of imported modules and the top packages by the sum of their modules' own import time (ms)
+    """
+    packages = Counter()
+    modules = 0
+
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+
+        self_us, _, name = line[len('import time:'):].split('|')
+        packages[name.strip().split('.')[0]] += int(self_us)
+        modules += 1
+
+    return modules, [(package, round(us / 1000, 1)) for package, us in packages.most_common(top)]
+
+
+def run(runs, top):
+    from api.authentication import SignedTokenAuthentication
+    from users.models import CustomUser
+
+    prepare_database(0)
+    user = CustomUser.objects.get(email=CREDENTIALS['email'])
+    token = SignedTokenAuthentication.issue_token(user)[0]
+
+    results = []
+    for mode, overrides in MODES.items():
+        env = dict(os.environ, **overrides, BENCHMARK_TOKEN=token)
+
+        samples = [run_child(env)[0] for _ in range(runs)]
+        _, stderr = run_child(env, importtime=True)
+        modules, packages = import_summary(stderr, top)
+
+        results.append({
+            'mode': mode,
+            'runs': runs,
+            'total_ms': round(statistics.median(sample['total_ms'] for sample in samples), 1),
+            'import_ms': round(statistics.median(sample['import_ms'] for sample in samples), 1),
+            'first_response_ms': round(statistics.median(sample['first_response_ms'] for sample in samples), 1),
+            'maxrss_mb': round(statistics.median(sample['maxrss_mb'] for sample in samples), 1),
+            'modules': modules,
+            'top_packages_ms': packages,
+        })
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10, help='cold starts per mode')
+    parser.add_argument('--top', type=int, default=8, help='packages listed by import time')
+    parser.add_argument('--budget-ms', type=float, help='fail when the median start of the last mode is slower')
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ['DATABASE_NAME'] = os.path.join(directory, 'db.sqlite3')
+
+        setup_django()
+        results = run(args.runs, args.top)
+
+    print('%-22s %10s %10s %18s %10s %8s' % ('mode', 'total ms', 'import ms', 'first response ms', 'rss MB', 'modules'))
+    for result in results:
+        print('%-22s %10s %10s %18s %10s %8s' % (
+            result['mode'], result['total_ms'], result['import_ms'], result['first_response_ms'],
+            result['maxrss_mb'], result['modules'],
+        ))
+
+    for result in results:
+        print('\n%s, import time by package (ms, python -X importtime):' % result['mode'])
+        print('  ' + ', '.join('%s %s' % package for package in result['top_packages_ms']))
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if args.budget_ms is not None:
+        last = results[-1]
+        if last['total_ms'] > args.budget_ms:
+            print('\n%s starts in %s ms, over the budget of %s ms' % (last['mode'], last['total_ms'], args.budget_ms))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
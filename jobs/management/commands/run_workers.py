@@ -0,0 +1,99 @@
+import os
+import signal
+import sys
+import traceback
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs.worker import Worker
+
+
+class Command(BaseCommand):
+    """
+    Command running the job queue: a pool of forked worker processes, each running one job at a time.
+    A worker that dies is replaced, its job is taken again once its visibility timeout is over.
+    SIGTERM and SIGINT stop the workers after their current jobs
+    """
+    help = 'Runs queued jobs in a pool of worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=settings.JOBS['CONCURRENCY'], help='worker processes',
+        )
+        parser.add_argument('--burst', action='store_true', help='exit once no job is due')
+
+    def handle(self, **options):
+        concurrency, burst = max(options['concurrency'], 1), options['burst']
+
+        if concurrency == 1:
+            worker = Worker()
+            handlers = self.stop_on_signals(worker.stop)
+            try:
+                worker.run(burst=burst)
+            finally:
+                for signum, handler in handlers.items():
+                    signal.signal(signum, handler)
+            self.stdout.write(self.style.SUCCESS('Worker stopped after %s jobs' % worker.processed))
+            return
+
+        # Forked workers must not share the connections of this process
+        connections.close_all()
+
+        children = set()
+        stopping = False
+
+        def stop():
+            nonlocal stopping
+            stopping = True
+            for pid in children:
+                os.kill(pid, signal.SIGTERM)
+
+        self.stop_on_signals(stop)
+
+        for _ in range(concurrency):
+            children.add(self.fork_worker(burst))
+        self.stdout.write('Started %s workers' % concurrency)
+
+        while children:
+            pid, status = os.wait()
+            children.discard(pid)
+
+            if not stopping and not burst:
+                self.stderr.write('Worker %s exited with status %s, starting another one' % (pid, status))
+                children.add(self.fork_worker(burst))
+
+        self.stdout.write(self.style.SUCCESS('Workers stopped'))
+
+    def fork_worker(self, burst):
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+        pid = os.fork()
+        if pid:
+            return pid
+
+        code = 0
+        try:
+            worker = Worker()
+            self.stop_on_signals(worker.stop)
+            worker.run(burst=burst)
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        finally:
+            connections.close_all()
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+
+    @staticmethod
+    def stop_on_signals(stop):
+        """
+        Call stop on SIGTERM and SIGINT, return the replaced handlers
+        """
+        return {
+            signum: signal.signal(signum, lambda signum, frame: stop())
+            for signum in (signal.SIGTERM, signal.SIGINT)
+        }
@@ -0,0 +1,143 @@
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models
+from django.db.models import F, Q
+from django.utils import timezone
+
+
+class JobManager(models.Manager):
+    def enqueue(self, name, payload=None, organization_id=None, max_attempts=None, delay=0):
+        """
+        Queue a run of the job function registered under name (see jobs.registry) with the payload
+        as keyword arguments, organization_id is the organization allowed to read the job through the API
+        """
+        from .registry import get_task
+
+        task = get_task(name)
+        if task is None:
+            raise ValueError('Job "%s" is not registered' % name)
+
+        return self.create(
+            name=name,
+            payload=json.dumps(payload or {}),
+            organization_id=organization_id,
+            max_attempts=max_attempts or task.max_attempts or settings.JOBS['MAX_ATTEMPTS'],
+            run_at=timezone.now() + timedelta(seconds=delay),
+        )
+
+    def claimable(self, now):
+        """
+        Return the filter of the jobs a worker may take: queued ones that are due and running ones
+        whose worker did not finish or extend them within the visibility timeout, as it died
+        """
+        return Q(status=Job.QUEUED, run_at__lte=now) | Q(status=Job.RUNNING, locked_until__lt=now)
+
+    def claim(self, worker, timeout, candidates=10):
+        """
+        Take the next due job for the worker for timeout seconds and return it, None when no job is due.
+
+        The due jobs are read without a lock and taken with an UPDATE repeating the condition, so of the
+        workers racing for a job exactly one updates it, and the others try the next candidate
+        """
+        now = timezone.now()
+        job_ids = list(
+            self.filter(self.claimable(now)).order_by('run_at', 'id').values_list('id', flat=True)[:candidates]
+        )
+
+        for job_id in job_ids:
+            claimed = self.filter(self.claimable(now), id=job_id).update(
+                status=Job.RUNNING,
+                attempts=F('attempts') + 1,
+                worker=worker,
+                locked_until=now + timedelta(seconds=timeout),
+                started_at=now,
+            )
+            if claimed:
+                return self.get(id=job_id)
+
+        return None
+
+
+class Job(models.Model):
+    """
+    A table representing runs of job functions outside of requests, taken by manage.py run_workers
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUSES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (SUCCEEDED, 'Succeeded'), (FAILED, 'Failed')]
+
+    name = models.CharField(max_length=100)
+    # Not a foreign key: jobs of an organization, like its purge, outlive it
+    organization_id = models.IntegerField(null=True)
+    payload = models.TextField(default='{}')
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=1)
+    # A queued job is not taken before run_at, a running one is taken again after locked_until
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True)
+    worker = models.CharField(max_length=100, blank=True)
+    result = models.TextField(blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True)
+    finished_at = models.DateTimeField(null=True)
+
+    objects = JobManager()
+
+    class Meta:
+        indexes = [
+            # Serves the due jobs of the workers without reading finished ones
+            models.Index(fields=['status', 'run_at'], name='jobs_job_status_run_at_idx'),
+            models.Index(fields=['organization_id', 'id'], name='jobs_job_organization_idx'),
+        ]
+
+    def __str__(self):
+        return '%s %s' % (self.name, self.id)
+
+    @property
+    def payload_data(self):
+        return json.loads(self.payload)
+
+    @property
+    def result_data(self):
+        return json.loads(self.result) if self.result else None
+
+    def owned(self):
+        """
+        Return the queryset of this job as long as the worker that claimed it still holds it
+        """
+        return Job.objects.filter(id=self.id, status=Job.RUNNING, worker=self.worker, attempts=self.attempts)
+
+    def touch(self, timeout=None):
+        """
+        Extend the visibility timeout of a long job, return False when the job was taken by another worker
+        """
+        timeout = timeout or settings.JOBS['VISIBILITY_TIMEOUT']
+        self.locked_until = timezone.now() + timedelta(seconds=timeout)
+
+        return bool(self.owned().update(locked_until=self.locked_until))
+
+    def succeed(self, result=None):
+        self.owned().update(
+            status=Job.SUCCEEDED, result=json.dumps(result), error='', locked_until=None, finished_at=timezone.now(),
+        )
+
+    def fail(self, error, retry=True):
+        """
+        Queue the job again after an exponential delay of JOBS['RETRY_DELAY'] seconds while it has attempts left,
+        mark it failed otherwise
+        """
+        now = timezone.now()
+
+        if retry and self.attempts < self.max_attempts:
+            delay = settings.JOBS['RETRY_DELAY'] * 2 ** (self.attempts - 1)
+            self.owned().update(
+                status=Job.QUEUED, error=error, locked_until=None, run_at=now + timedelta(seconds=delay),
+            )
+        else:
+            self.owned().update(status=Job.FAILED, error=error, locked_until=None, finished_at=now)
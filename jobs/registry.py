@@ -0,0 +1,29 @@
+"""
+Job functions by name. The tasks module of every installed app is imported when the apps are ready
+and registers its functions with the task decorator:
+
+    @task('todo_lists.purge')
+    def purge(job, purge_id):
+        ...
+
+A job function gets the Job and the payload of Job.objects.enqueue as keyword arguments and returns
+a JSON serializable result. It is run again after an exception while the job has attempts left,
+so it must be safe to repeat. Long jobs call job.touch() now and then to keep their visibility timeout
+"""
+tasks = {}
+
+
+def task(name, max_attempts=None):
+    """
+    Register the decorated function under name, max_attempts defaults to JOBS['MAX_ATTEMPTS']
+    """
+    def register(function):
+        function.max_attempts = max_attempts
+        tasks[name] = function
+        return function
+
+    return register
+
+
+def get_task(name):
+    return tasks.get(name)
@@ -0,0 +1,73 @@
+import logging
+import os
+import socket
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .models import Job
+from .registry import get_task
+
+
+logger = logging.getLogger(__name__)
+
+
+class Worker:
+    """
+    Loop taking due jobs one at a time and running their functions in this process
+    """
+    def __init__(self, name=None, timeout=None, poll_interval=None):
+        self.name = name or '%s:%s' % (socket.gethostname(), os.getpid())
+        self.timeout = timeout or settings.JOBS['VISIBILITY_TIMEOUT']
+        self.poll_interval = settings.JOBS['POLL_INTERVAL'] if poll_interval is None else poll_interval
+        self.stopping = False
+        self.processed = 0
+
+    def stop(self):
+        """
+        Stop once the current job is done
+        """
+        self.stopping = True
+
+    def run(self, burst=False):
+        """
+        Run jobs until stopped, with burst until no job is due
+        """
+        while not self.stopping:
+            close_old_connections()
+
+            if self.run_one():
+                continue
+
+            if burst:
+                break
+
+            time.sleep(self.poll_interval)
+
+    def run_one(self):
+        """
+        Take and run the next due job, return False when there is none
+        """
+        job = Job.objects.claim(self.name, self.timeout)
+        if job is None:
+            return False
+
+        self.processed += 1
+        task = get_task(job.name)
+
+        if task is None:
+            job.fail('Job "%s" is not registered' % job.name, retry=False)
+        elif job.attempts > job.max_attempts:
+            # Taken again after its visibility timeout, the workers running it died every time
+            job.fail('Not finished within %s attempts' % job.max_attempts, retry=False)
+        else:
+            try:
+                result = task(job, **job.payload_data)
+            except Exception as error:
+                logger.exception('Job %s failed', job)
+                job.fail(repr(error)[:1000])
+            else:
+                job.succeed(result)
+
+        return True
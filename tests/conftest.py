@@ -0,0 +1,13 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def reset_auth_throttle():
+    """
+    Every test starts with full login buckets, the suite logs in from one client far more often than AUTH_THROTTLE
+    allows
+    """
+    from api.throttling import get_store, throttle_stats
+
+    get_store().reset()
+    throttle_stats.reset()
@@ -0,0 +1,305 @@
+import asyncio
+import json
+import time
+from unittest import mock
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.test import TransactionTestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from api.asgi import AsyncAPIHandler
+from api.events import RESET, InProcessBroker, get_broker
+from todo_lists.models import Organization, ToDoList
+
+
+class AsyncAPIHandlerTestCase(TransactionTestCase):
+    """
+    Class for testing that the ASGI handler serves the API like the WSGI one
+    """
+    def setUp(self):
+        self.organization = Organization.objects.create(name='Test Company')
+        self.todo_list_line = ToDoList.objects.create(organization=self.organization, text='1) Wake up')
+
+        self.data = {
+            "email": "simple@email.com",
+            "organization": "Test Company",
+            "password": "foo"
+        }
+
+        self.wsgi_client = APIClient()
+        self.wsgi_client.post('/api/register/', self.data)
+
+        self.application = AsyncAPIHandler()
+
+    @async_to_sync
+    async def request(self, method, path, body=b'', headers=()):
+        path, _, query_string = path.partition('?')
+        headers = list(headers) + [('Content-Length', str(len(body)))]
+        scope = {
+            'type': 'http',
+            'http_version': '1.1',
+            'method': method,
+            'scheme': 'http',
+            'path': path,
+            'root_path': '',
+            'query_string': query_string.encode(),
+            'headers': [(name.lower().encode(), value.encode()) for name, value in headers],
+            'client': ('127.0.0.1', 50000),
+            'server': ('testserver', 80),
+        }
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        sent = []
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            await asyncio.Event().wait()
+
+        async def send(message):
+            sent.append(message)
+
+        await self.application(scope, receive, send)
+
+        return sent[0]['status'], b''.join(message.get('body', b'') for message in sent[1:])
+
+    def get_token(self):
+        status_code, content = self.request(
+            'POST', '/api/token/', json.dumps(self.data).encode(), [('Content-Type', 'application/json')],
+        )
+
+        self.assertEqual(status_code, status.HTTP_200_OK)
+
+        return json.loads(content)['token']
+
+    def test_token(self):
+        self.get_token()
+
+        status_code, content = self.request(
+            'POST', '/api/token/', b'email=simple@email.com&organization=Test+Company&password=bar',
+            [('Content-Type', 'application/x-www-form-urlencoded')],
+        )
+
+        self.assertEqual(status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(content, b'"Invalid login"')
+
+    def test_token_throttled(self):
+        with override_settings(AUTH_THROTTLE=dict(settings.AUTH_THROTTLE, CREDENTIALS_BURST=1)):
+            self.get_token()
+
+            status_code, content = self.request(
+                'POST', '/api/token/', json.dumps(self.data).encode(), [('Content-Type', 'application/json')],
+            )
+
+        self.assertEqual(status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn(b'Request was throttled', content)
+
+        with override_settings(PASSWORD_HASHING=dict(settings.PASSWORD_HASHING, WORKERS=1, QUEUE_SIZE=0)):
+            with mock.patch('users.hashers.hasher_pool.in_flight', 1):
+                status_code, _ = self.request(
+                    'POST', '/api/token/', json.dumps(self.data).encode(), [('Content-Type', 'application/json')],
+                )
+
+        self.assertEqual(status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    def test_todo_lists(self):
+        headers = [('Authorization', 'Bearer ' + self.get_token())]
+        self.wsgi_client.credentials(HTTP_AUTHORIZATION=headers[0][1])
+
+        status_code1, content1 = self.request('GET', '/api/todo_lists/', headers=headers)
+        status_code2, content2 = self.request(
+            'POST', '/api/todo_lists/', b'{"text": "2) Do yoga"}', headers + [('Content-Type', 'application/json')],
+        )
+        status_code3, content3 = self.request('GET', '/api/todo_lists/?is_finished=false', headers=headers)
+
+        self.assertEqual(status_code1, status.HTTP_200_OK)
+        self.assertEqual(status_code2, status.HTTP_201_CREATED)
+        self.assertEqual(status_code3, status.HTTP_200_OK)
+        self.assertEqual(content3, self.wsgi_client.get('/api/todo_lists/?is_finished=false').content)
+        self.assertEqual(len(json.loads(content3)['results']), 2)
+
+    def test_organizations(self):
+        headers = [('Authorization', 'Bearer ' + self.get_token())]
+
+        status_code, content = self.request('GET', '/api/organizations/' + str(self.organization.id) + '/', headers=headers)
+
+        self.assertEqual(status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(content), {'id': self.organization.id, 'name': 'Test Company'})
+
+    def test_streaming_export(self):
+        headers = [('Authorization', 'Bearer ' + self.get_token())]
+
+        status_code, content = self.request('GET', '/api/todo_lists/export/', headers=headers)
+
+        self.assertEqual(status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(content), {'id': self.todo_list_line.id, 'text': '1) Wake up', 'is_finished': False})
+
+    def test_not_authenticated(self):
+        status_code, _ = self.request('GET', '/api/todo_lists/')
+
+        self.assertEqual(status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ToDoListEventsTestCase(TransactionTestCase):
+    """
+    Class for testing server-sent events of todo list changes
+    """
+    def setUp(self):
+        self.organization = Organization.objects.create(name='Test Company')
+        self.other_organization = Organization.objects.create(name='Another Company')
+        self.todo_list_line = ToDoList.objects.create(organization=self.organization, text='1) Wake up')
+
+        data = {
+            "email": "simple@email.com",
+            "organization": "Test Company",
+            "password": "foo"
+        }
+
+        self.client = APIClient()
+        self.client.post('/api/register/', data)
+        self.token = self.client.post('/api/token/', data).data['token']
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.token)
+
+        self.application = AsyncAPIHandler()
+
+    @async_to_sync
+    async def stream(self, path, headers=(), write=None, events=1):
+        """
+        Open the event stream, run write in a thread once it is open and return the status, the headers
+        and the content sent until the given number of events arrived or the stream ended
+        """
+        path, _, query_string = path.partition('?')
+        scope = {
+            'type': 'http',
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'root_path': '',
+            'query_string': query_string.encode(),
+            'headers': [(name.lower().encode(), value.encode()) for name, value in headers],
+            'client': ('127.0.0.1', 50000),
+            'server': ('testserver', 80),
+        }
+        disconnect = asyncio.Event()
+        messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+        opened = asyncio.Event()
+        received = asyncio.Event()
+        sent = []
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+            if message['type'] == 'http.response.body':
+                opened.set()
+                if b''.join(message.get('body', b'') for message in sent[1:]).count(b'event: ') >= events:
+                    received.set()
+
+        task = asyncio.ensure_future(self.application(scope, receive, send))
+        await asyncio.wait_for(opened.wait(), 5)
+
+        if write is not None:
+            await sync_to_async(write)()
+            await asyncio.wait({asyncio.ensure_future(received.wait()), task}, timeout=5, return_when=asyncio.FIRST_COMPLETED)
+
+        disconnect.set()
+        await asyncio.wait_for(task, 5)
+
+        headers = {name.decode().lower(): value.decode() for name, value in sent[0].get('headers', [])}
+
+        return sent[0]['status'], headers, b''.join(message.get('body', b'') for message in sent[1:])
+
+    def parse_events(self, content):
+        events = []
+        for block in content.decode().split('\n\n'):
+            fields = dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith(':'))
+            if 'event' in fields:
+                events.append((fields['event'], fields.get('id'), json.loads(fields['data'])))
+
+        return events
+
+    def test_events(self):
+        def write():
+            ToDoList.objects.create(organization=self.other_organization, text='Do nothing')
+            self.client.patch('/api/todo_lists/%s/' % self.todo_list_line.id, {'is_finished': True})
+            self.client.delete('/api/todo_lists/%s/' % self.todo_list_line.id)
+
+        status_code, headers, content = self.stream(
+            '/api/todo_lists/events/', [('Authorization', 'Bearer ' + self.token)], write, events=2,
+        )
+
+        self.assertEqual(status_code, status.HTTP_200_OK)
+        self.assertEqual(headers['content-type'], 'text/event-stream')
+
+        events = self.parse_events(content)
+        self.assertEqual([(name, data['changed'], data['deleted']) for name, _, data in events], [
+            ('changes', [{'id': self.todo_list_line.id, 'text': '1) Wake up', 'is_finished': True}], []),
+            ('changes', [], [self.todo_list_line.id]),
+        ])
+
+        # The event id is a change feed token
+        feed = self.client.get('/api/todo_lists/changes/', {'since': events[0][1]}).json()
+        self.assertEqual(feed['deleted'], [self.todo_list_line.id])
+        self.assertEqual(str(feed['token']), events[1][1])
+
+    def test_token_in_query_string(self):
+        def write():
+            self.client.post('/api/todo_lists/', {'text': '2) Do yoga'})
+
+        status_code, _, content = self.stream('/api/todo_lists/events/?token=' + self.token, write=write)
+
+        self.assertEqual(status_code, status.HTTP_200_OK)
+        self.assertEqual(self.parse_events(content)[0][2]['changed'][0]['text'], '2) Do yoga')
+        self.assertEqual(get_broker().stats()['subscriptions'], 0)
+
+    def test_large_write(self):
+        def write():
+            self.client.post('/api/todo_lists/bulk/', {
+                'create': [{'text': 'Line %s' % i} for i in range(settings.TODO_LIST_EVENTS['MAX_CHANGES'] + 1)],
+            }, format='json')
+
+        _, _, content = self.stream('/api/todo_lists/events/?token=' + self.token, write=write)
+
+        self.assertEqual(self.parse_events(content)[0][2]['more'], True)
+
+    def test_keepalive(self):
+        with override_settings(TODO_LIST_EVENTS=dict(settings.TODO_LIST_EVENTS, KEEPALIVE=0.01)):
+            _, _, content = self.stream('/api/todo_lists/events/?token=' + self.token, write=lambda: time.sleep(0.1), events=0)
+
+        self.assertIn(b': keep-alive\n\n', content)
+
+    def test_not_authenticated(self):
+        for path in ['/api/todo_lists/events/', '/api/todo_lists/events/?token=foo']:
+            status_code, _, _ = self.stream(path)
+            self.assertEqual(status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_too_many_streams(self):
+        with override_settings(TODO_LIST_EVENTS=dict(settings.TODO_LIST_EVENTS, MAX_SUBSCRIPTIONS=0)):
+            status_code, _, _ = self.stream('/api/todo_lists/events/?token=' + self.token)
+
+        self.assertEqual(status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    @async_to_sync
+    async def test_overflow(self):
+        broker = InProcessBroker()
+
+        with override_settings(TODO_LIST_EVENTS=dict(settings.TODO_LIST_EVENTS, QUEUE_SIZE=2)):
+            subscription = broker.subscribe(self.organization.id)
+            other_subscription = broker.subscribe(self.other_organization.id)
+
+        for token in range(3):
+            broker.publish(self.organization.id, {'token': token})
+        await asyncio.sleep(0)
+
+        self.assertIs(await subscription.get(), RESET)
+        self.assertTrue(other_subscription.queue.empty())
+
+        broker.unsubscribe(subscription)
+        broker.unsubscribe(other_subscription)
+        self.assertEqual(broker.stats(), {'subscriptions': 0, 'published': 3, 'overflows': 1})
@@ -0,0 +1,142 @@
+from unittest import skipUnless
+
+from django.conf import settings
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from todo_list_project.db.routers import PrimaryReplicaRouter, read_from_replica
+from todo_list_project.db.sqlite import apply_sqlite_pragmas
+from todo_lists.models import Organization, ToDoList
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+class PrimaryReplicaRouterTests(SimpleTestCase):
+    """
+    Class for testing that reads go to the replicas only while read_from_replica is set
+    """
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+
+    def test_reads(self):
+        self.assertIsNone(self.router.db_for_read(ToDoList))
+
+        token = read_from_replica.set(True)
+        try:
+            self.assertIn(self.router.db_for_read(ToDoList), ['replica1', 'replica2'])
+        finally:
+            read_from_replica.reset(token)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_reads_without_replicas(self):
+        token = read_from_replica.set(True)
+        try:
+            self.assertIsNone(self.router.db_for_read(ToDoList))
+        finally:
+            read_from_replica.reset(token)
+
+    def test_writes_and_migrations(self):
+        token = read_from_replica.set(True)
+        try:
+            self.assertEqual(self.router.db_for_write(ToDoList), 'default')
+        finally:
+            read_from_replica.reset(token)
+
+        self.assertIsNone(self.router.allow_migrate('default', 'todo_lists'))
+        self.assertFalse(self.router.allow_migrate('replica1', 'todo_lists'))
+
+
+class ReplicaReadViewTestCase(APITestCase):
+    """
+    Class for testing that only list and retrieve queries are routed to the replicas
+    """
+    def setUp(self):
+        organization = Organization.objects.create(name='Test Company')
+        self.todo_list_line = ToDoList.objects.create(organization=organization, text='1) Wake up')
+
+        data = {
+            "email": "simple@email.com",
+            "organization": "Test Company",
+            "password": "foo"
+        }
+
+        self.client.post('/api/register/', data)
+        self.client.post('/api/login/', data)
+
+    def request(self, method, path, data=None):
+        """
+        Return the response and (replica flag, SQL) of every query made for the request
+        """
+        queries = []
+
+        def capture(execute, sql, params, many, context):
+            queries.append((read_from_replica.get(), sql))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(capture):
+            response = getattr(self.client, method)(path, data)
+
+        self.assertFalse(read_from_replica.get())
+
+        return response, queries
+
+    @override_settings(TODO_LIST_CACHE=dict(settings.TODO_LIST_CACHE, ENABLED=False))
+    def test_list_and_retrieve_read_from_replicas(self):
+        for path in ['/api/todo_lists/', '/api/todo_lists/%s/' % self.todo_list_line.id, '/api/organizations/']:
+            response, queries = self.request('get', path)
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(any(replica for replica, sql in queries if 'FROM "todo_lists_' in sql))
+            self.assertFalse(any(replica for replica, sql in queries if 'users_customuser' in sql))
+
+    def test_cached_reads_use_primary(self):
+        # A payload read from a lagging replica would be cached under the version of a newer write
+        for path in ['/api/todo_lists/', '/api/todo_lists/%s/' % self.todo_list_line.id, '/api/todo_lists/changes/']:
+            response, queries = self.request('get', path)
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response['X-Cache'], 'MISS')
+            self.assertFalse(any(replica for replica, sql in queries))
+
+    def test_writes_use_primary(self):
+        response, queries = self.request('post', '/api/todo_lists/', {'text': '2) Do yoga'})
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(any(replica for replica, sql in queries))
+
+
+@skipUnless(connection.vendor == 'sqlite', 'SQLite tuning applies to SQLite connections only')
+class SQLiteTuningTests(SimpleTestCase):
+    """
+    Class for testing that the SQLite PRAGMAs are applied to new connections only when the tuning is enabled
+    """
+    # synchronous can not be changed inside the transaction of a TestCase
+    databases = {'default'}
+
+    pragmas = {'synchronous': 'NORMAL', 'cache_size': -32000, 'temp_store': 'MEMORY', 'busy_timeout': 1234}
+
+    def get_pragmas(self):
+        with connection.cursor() as cursor:
+            return [cursor.execute('PRAGMA %s' % name).fetchone()[0] for name in self.pragmas]
+
+    def test_tuning_disabled(self):
+        before = self.get_pragmas()
+
+        with override_settings(SQLITE_TUNING={'ENABLED': False, 'PRAGMAS': self.pragmas}):
+            apply_sqlite_pragmas(sender=connection.__class__, connection=connection)
+
+        self.assertEqual(self.get_pragmas(), before)
+
+    def test_tuning_enabled(self):
+        before = self.get_pragmas()
+
+        with override_settings(SQLITE_TUNING={'ENABLED': True, 'PRAGMAS': self.pragmas}):
+            apply_sqlite_pragmas(sender=connection.__class__, connection=connection)
+
+        try:
+            self.assertEqual(self.get_pragmas(), [1, -32000, 2, 1234])
+        finally:
+            with connection.cursor() as cursor:
+                for name, value in zip(self.pragmas, before):
+                    cursor.execute('PRAGMA %s = %s' % (name, value))
@@ -0,0 +1,191 @@
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from jobs.models import Job
+from jobs.registry import task
+from jobs.worker import Worker
+from todo_lists.models import Organization, OrganizationPurge, ToDoList
+
+
+calls = []
+
+
+@task('tests.record', max_attempts=2)
+def record(job, fail=False):
+    calls.append(job.attempts)
+    if fail:
+        raise ValueError('Failed on attempt %s' % job.attempts)
+
+    return {'attempt': job.attempts}
+
+
+@override_settings(JOBS=dict(settings.JOBS, RETRY_DELAY=0))
+class JobQueueTests(TestCase):
+    """
+    Class that tests queueing, taking, retrying and timing out jobs
+    """
+    def setUp(self):
+        calls.clear()
+
+    def test_run_job(self):
+        job = Job.objects.enqueue('tests.record', organization_id=1)
+        self.assertEqual((job.status, job.max_attempts), (Job.QUEUED, 2))
+
+        stdout = StringIO()
+        call_command('run_workers', '--concurrency=1', '--burst', stdout=stdout)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.result_data), (Job.SUCCEEDED, 1, {'attempt': 1}))
+        self.assertIsNotNone(job.finished_at)
+        self.assertIn('Worker stopped after 1 jobs', stdout.getvalue())
+
+        with self.assertRaisesMessage(ValueError, 'Job "tests.unknown" is not registered'):
+            Job.objects.enqueue('tests.unknown')
+
+    def test_retries(self):
+        job = Job.objects.enqueue('tests.record', {'fail': True})
+        Worker().run(burst=True)
+
+        job.refresh_from_db()
+        self.assertEqual(calls, [1, 2])
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertEqual(job.error, "ValueError('Failed on attempt 2')")
+
+    @override_settings(JOBS=dict(settings.JOBS, RETRY_DELAY=60))
+    def test_retry_delay(self):
+        job = Job.objects.enqueue('tests.record', {'fail': True})
+        Worker().run(burst=True)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=50))
+
+    def test_visibility_timeout(self):
+        job = Job.objects.enqueue('tests.record')
+
+        # Taken by a worker that dies while running it
+        lost = Job.objects.claim('lost', timeout=60)
+        self.assertEqual(lost.id, job.id)
+        self.assertIsNone(Job.objects.claim('other', timeout=60))
+
+        Job.objects.filter(id=job.id).update(locked_until=timezone.now() - timedelta(seconds=1))
+        Worker(name='other').run(burst=True)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.worker), (Job.SUCCEEDED, 2, 'other'))
+
+        # The dead worker can no longer change the job
+        self.assertFalse(lost.touch())
+        lost.fail('Lost')
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+
+    def test_attempts_exhausted_by_timeouts(self):
+        job = Job.objects.enqueue('tests.record')
+        Job.objects.filter(id=job.id).update(
+            status=Job.RUNNING, attempts=2, locked_until=timezone.now() - timedelta(seconds=1),
+        )
+        Worker().run(burst=True)
+
+        job.refresh_from_db()
+        self.assertEqual(calls, [])
+        self.assertEqual((job.status, job.error), (Job.FAILED, 'Not finished within 2 attempts'))
+
+
+class JobViewTestCase(APITestCase):
+    """
+    Class for testing jobs through the API: organization scoping, export and purge jobs
+    """
+    def setUp(self):
+        self.files_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.files_dir)
+
+        self.organization1 = Organization.objects.create(name='Test Company 1')
+        self.organization2 = Organization.objects.create(name='Test Company 2')
+
+        ToDoList.objects.create(organization=self.organization1, text='1) Wake up')
+        ToDoList.objects.create(organization=self.organization1, text='2) Do yoga', is_finished=True)
+        ToDoList.objects.create(organization=self.organization2, text='Do nothing')
+
+        data = {
+            "email": "simple@email.com",
+            "organization": "Test Company 1",
+            "password": "foo"
+        }
+
+        self.client.post('/api/register/', data)
+        self.client.post('/api/login/', data)
+
+    def run_jobs(self):
+        with override_settings(JOBS=dict(settings.JOBS, FILES_DIR=self.files_dir)):
+            Worker().run(burst=True)
+
+    def download(self, job_id):
+        with override_settings(JOBS=dict(settings.JOBS, FILES_DIR=self.files_dir)):
+            response = self.client.get('/api/jobs/%s/file/' % job_id)
+            return response, b''.join(response.streaming_content) if response.status_code == 200 else b''
+
+    def test_export_job(self):
+        response = self.client.post('/api/todo_lists/export/job/?ordering=-id', {'format': 'json'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], Job.QUEUED)
+        self.assertEqual(response['Location'], '/api/jobs/%s/' % response.data['id'])
+        self.assertEqual(self.download(response.data['id'])[0].status_code, status.HTTP_404_NOT_FOUND)
+
+        self.run_jobs()
+
+        job = self.client.get(response['Location']).data
+        self.assertEqual((job['status'], job['result']), (Job.SUCCEEDED, {'format': 'json', 'rows': 2}))
+
+        download, content = self.download(job['id'])
+        self.assertEqual(download['Content-Type'], 'application/json')
+        self.assertEqual([line['text'] for line in json.loads(content)], ['2) Do yoga', '1) Wake up'])
+
+        response = self.client.post('/api/todo_lists/export/job/?is_finished=false')
+        self.run_jobs()
+
+        content = self.download(response.data['id'])[1]
+        self.assertEqual([json.loads(line)['text'] for line in content.splitlines()], ['1) Wake up'])
+
+        response = self.client.post('/api/todo_lists/export/job/', {'format': 'xml'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_jobs_of_organization(self):
+        job = Job.objects.enqueue('tests.record', organization_id=self.organization1.id)
+        other = Job.objects.enqueue('tests.record', organization_id=self.organization2.id)
+
+        self.assertEqual(self.client.get('/api/jobs/%s/' % job.id).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get('/api/jobs/%s/' % other.id).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual([job['id'] for job in self.client.get('/api/jobs/').data], [job.id])
+        self.assertEqual(self.download(other.id)[0].status_code, status.HTTP_404_NOT_FOUND)
+
+        self.client.get('/api/logout/')
+        self.assertEqual(self.client.get('/api/jobs/%s/' % job.id).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_purge_job(self):
+        response = self.client.post('/api/organizations/%s/purge/' % self.organization2.id)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        job_id = response.data['job_id']
+        self.assertEqual(self.client.get('/api/jobs/%s/' % job_id).data['name'], 'todo_lists.purge')
+
+        # The purge is queued once
+        response = self.client.post('/api/organizations/%s/purge/' % self.organization2.id)
+        self.assertEqual(response.data['job_id'], job_id)
+
+        self.run_jobs()
+
+        self.assertEqual(self.client.get('/api/jobs/%s/' % job_id).data['status'], Job.SUCCEEDED)
+        self.assertEqual(OrganizationPurge.objects.get(id=response.data['id']).status, OrganizationPurge.FINISHED)
+        self.assertFalse(Organization.objects.filter(id=self.organization2.id).exists())
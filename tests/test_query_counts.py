@@ -0,0 +1,233 @@
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from todo_lists.cache import organization_ids
+from todo_lists.models import Organization, ToDoList
+
+
+# Loading the session and the user of session authenticated requests
+SESSION_QUERIES = 2
+
+
+class QueryCountTestCase(APITestCase):
+    """
+    Class for testing the exact number of SQL queries of every API endpoint,
+    list endpoints are checked with 1, 100 and 10 000 rows to keep their query count constant
+    """
+    data = {
+        "email": "simple@email.com",
+        "organization": "Test Company",
+        "password": "foo"
+    }
+
+    def setUp(self):
+        organization_ids.clear()
+
+        self.organization = Organization.objects.create(name='Test Company')
+        self.todo_list_line = ToDoList.objects.create(organization=self.organization, text='1) Wake up')
+
+        self.client.post('/api/register/', self.data)
+        self.client.post('/api/login/', self.data)
+
+    def add_lines(self, rows):
+        """
+        Add lines up to the given number of rows, the manager sends todo_list_changed like the API does
+        """
+        count = ToDoList.objects.count()
+        ToDoList.objects.bulk_create_lines(
+            self.organization.id, [{'text': 'Line %s' % i, 'is_finished': False} for i in range(count, rows)],
+        )
+
+    def test_register(self):
+        self.client.logout()
+        data = dict(self.data, email='another@email.com')
+
+        # Organization id, then the user insert in a savepoint
+        with self.assertNumQueries(4):
+            response = self.client.post('/api/register/', data)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_register_duplicate(self):
+        self.client.logout()
+
+        # The insert fails on the unique constraint and the savepoint is rolled back
+        with self.assertNumQueries(5):
+            response = self.client.post('/api/register/', self.data)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_login(self):
+        self.client.logout()
+
+        # The user joined with the organization, the new session, last_login and the cycled session key
+        with self.assertNumQueries(9):
+            response = self.client.post('/api/login/', self.data)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_login_invalid(self):
+        self.client.logout()
+
+        with self.assertNumQueries(1):
+            response = self.client.post('/api/login/', dict(self.data, password='bar'))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_token(self):
+        self.client.logout()
+
+        # The user joined with the organization and last_login
+        with self.assertNumQueries(2):
+            response = self.client.post('/api/token/', self.data)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_logout(self):
+        with self.assertNumQueries(SESSION_QUERIES + 2):
+            response = self.client.get('/api/logout/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_todo_lists(self):
+        for rows in [1, 100, 10000]:
+            self.add_lines(rows)
+
+            with self.subTest(rows=rows):
+                with self.assertNumQueries(SESSION_QUERIES + 1):
+                    response = self.client.get('/api/todo_lists/?page_size=1000')
+
+                self.assertEqual(len(response.data['results']), min(rows, 1000))
+
+                with self.assertNumQueries(SESSION_QUERIES + 1):
+                    response = self.client.get('/api/todo_lists/?is_finished=false&ordering=-id')
+
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+                with self.assertNumQueries(SESSION_QUERIES + 1):
+                    response = self.client.get('/api/todo_lists/?search=line 1&page_size=1000')
+
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+                with self.assertNumQueries(SESSION_QUERIES + 1):
+                    response = self.client.get('/api/todo_lists/export/')
+                    content = b''.join(response.streaming_content)
+
+                self.assertEqual(content.count(b'\n'), rows)
+
+    def test_todo_list_changes(self):
+        for rows in [1, 100, 10000]:
+            token = self.client.get('/api/todo_lists/changes/').data['token']
+            added = rows - ToDoList.objects.count()
+            self.add_lines(rows)
+
+            with self.subTest(rows=rows):
+                # Lines and tombstones since the token
+                with self.assertNumQueries(SESSION_QUERIES + 2):
+                    response = self.client.get('/api/todo_lists/changes/?page_size=1000&since=%s' % token)
+
+                self.assertEqual(len(response.data['changed']), min(added, 1000))
+
+    def test_list_todo_lists_with_token(self):
+        token = self.client.post('/api/token/', self.data).data['token']
+        self.client.logout()
+
+        for rows in [1, 100, 10000]:
+            self.add_lines(rows)
+
+            with self.subTest(rows=rows):
+                # The first read of a new version of the list, the second one is served from the response cache
+                with self.assertNumQueries(1):
+                    self.client.get('/api/todo_lists/', HTTP_AUTHORIZATION='Bearer ' + token)
+
+                with self.assertNumQueries(0):
+                    self.client.get('/api/todo_lists/', HTTP_AUTHORIZATION='Bearer ' + token)
+
+    def test_todo_list_line(self):
+        path = '/api/todo_lists/%s/' % self.todo_list_line.id
+
+        with self.assertNumQueries(SESSION_QUERIES + 1):
+            self.assertEqual(self.client.get(path).status_code, status.HTTP_200_OK)
+
+        # Every write takes the next change sequence number of the organization first and updates its stats
+        with self.assertNumQueries(SESSION_QUERIES + 3):
+            response = self.client.post('/api/todo_lists/', {'text': '2) Do yoga'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        with self.assertNumQueries(SESSION_QUERIES + 4):
+            response = self.client.put(path, {'text': '1) Wake up early', 'is_finished': True})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(SESSION_QUERIES + 4):
+            response = self.client.patch(path, {'is_finished': False})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # The sequence number, the stats, the delete and the tombstone
+        with self.assertNumQueries(SESSION_QUERIES + 5):
+            response = self.client.delete(path)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_bulk_and_import(self):
+        data = {
+            'create': [{'text': '2) Do yoga'}, {'text': '3) Make breakfast'}],
+            'update': [{'id': self.todo_list_line.id, 'is_finished': True}],
+            'delete': [self.todo_list_line.id + 100],
+        }
+
+        # Savepoint, sequence numbers, stats, insert, ids of the inserted lines, lock, lines to update,
+        # sequence numbers, stats, update, lock, lines to delete, release
+        with self.assertNumQueries(SESSION_QUERIES + 13):
+            response = self.client.post('/api/todo_lists/bulk/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Savepoint, sequence numbers, stats, insert, ids of the inserted lines and release per batch
+        with self.assertNumQueries(SESSION_QUERIES + 6):
+            response = self.client.post(
+                '/api/todo_lists/import/', b'{"text": "4) Go to work"}\n', content_type='application/x-ndjson',
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_organizations(self):
+        for rows in [1, 100, 10000]:
+            Organization.objects.bulk_create(
+                Organization(name='Company %s' % i) for i in range(Organization.objects.count(), rows)
+            )
+
+            with self.subTest(rows=rows):
+                with self.assertNumQueries(SESSION_QUERIES + 1):
+                    response = self.client.get('/api/organizations/')
+
+                self.assertEqual(len(response.data), rows)
+
+    def test_organization(self):
+        path = '/api/organizations/%s/' % self.organization.id
+
+        with self.assertNumQueries(SESSION_QUERIES + 1):
+            self.assertEqual(self.client.get(path).status_code, status.HTTP_200_OK)
+
+        # The unique name validator, the insert and the stats
+        with self.assertNumQueries(SESSION_QUERIES + 3):
+            response = self.client.post('/api/organizations/', {'name': 'Another Company'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        with self.assertNumQueries(SESSION_QUERIES + 3):
+            response = self.client.put(path, {'name': 'Renamed Company'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(SESSION_QUERIES + 3):
+            response = self.client.patch(path, {'name': 'Test Company'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # The organization and its stats
+        with self.assertNumQueries(SESSION_QUERIES + 2):
+            response = self.client.get(path + 'stats/')
+        self.assertEqual(response.data['total'], 1)
+
+        organization = Organization.objects.get(name='Another Company')
+        ToDoList.objects.create(organization=organization, text='Do nothing')
+
+        # The users of the organization are collected for the cascade, its lines, tombstones and stats are deleted
+        # without a select
+        with self.assertNumQueries(SESSION_QUERIES + 6):
+            response = self.client.delete('/api/organizations/%s/' % organization.id)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
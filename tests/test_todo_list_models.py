@@ -1,8 +1,20 @@
+import os
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock, skipIf
+
+from django.conf import settings
+from django.contrib.auth import authenticate
 from django.core.exceptions import ValidationError
-from django.db import IntegrityError
-from django.test import TestCase
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
-from todo_lists.models import Organization, ToDoList
+from todo_lists.cache import organization_ids
+from todo_lists.models import Organization, OrganizationPurge, OrganizationStats, ToDoList, ToDoListTombstone
+from todo_lists.purge import delete_batch
+from users.models import CustomUser
 
 
 class ToDoListTests(TestCase):
@@ -32,3 +44,259 @@ class ToDoListTests(TestCase):
 
         with self.assertRaises(ValueError):
             ToDoList.objects.create(organization='not an object', text='1) Wake up', is_finished=True)
+
+    def test_bulk_writes_lock_organization_first(self):
+        organization = Organization.objects.create(name='some company')
+        line = ToDoList.objects.create(organization=organization, text='1) Wake up')
+
+        # A read before the first write of a transaction fails to take the SQLite write lock under concurrent writers
+        for write in [
+            lambda: ToDoList.objects.bulk_update_lines(organization.id, {line.id: {'is_finished': True}}),
+            lambda: ToDoList.objects.bulk_delete_lines(organization.id, [line.id]),
+        ]:
+            with CaptureQueriesContext(connection) as queries:
+                write()
+
+            self.assertTrue(queries[0]['sql'].startswith('UPDATE "todo_lists_organization"'))
+
+
+class OrganizationIdCacheTests(TransactionTestCase):
+    """
+    Class that tests the process-local organization name to id cache and its invalidation
+    """
+    def setUp(self):
+        organization_ids.clear()
+
+    def test_get_id(self):
+        organization = Organization.objects.create(name='some company')
+
+        with self.assertNumQueries(1):
+            self.assertEqual(organization_ids.get_id('some company'), organization.id)
+            self.assertEqual(organization_ids.get_id('some company'), organization.id)
+
+        with self.assertNumQueries(1):
+            self.assertIsNone(organization_ids.get_id('not existing company'))
+
+    def test_invalidation(self):
+        organization = Organization.objects.create(name='some company')
+        organization_ids.get_id('some company')
+
+        organization.name = 'new name'
+        organization.save()
+
+        self.assertIsNone(organization_ids.get_id('some company'))
+        self.assertEqual(organization_ids.get_id('new name'), organization.id)
+
+        organization.delete()
+
+        self.assertIsNone(organization_ids.get_id('new name'))
+
+    def test_rolled_back_organization_is_not_cached(self):
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                Organization.objects.create(name='some company')
+                self.assertIsNotNone(organization_ids.get_id('some company'))
+                Organization.objects.create(name='some company')
+
+        self.assertIsNone(organization_ids.get_id('some company'))
+
+
+class ImportTodosCommandTests(TestCase):
+    """
+    Class that tests importing todo list lines with manage.py import_todos
+    """
+    def setUp(self):
+        self.organization = Organization.objects.create(name='some company')
+
+    def call_command(self, content, suffix, *args):
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as file:
+            file.write(content)
+        self.addCleanup(os.remove, file.name)
+
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_todos', 'some company', file.name, *args, stdout=stdout, stderr=stderr)
+
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_import_csv(self):
+        stdout, stderr = self.call_command(b'text,is_finished\nfirst,1\nsecond,no\n,\nthird,\n', '.csv', '--batch-size=2')
+
+        self.assertEqual(
+            list(ToDoList.objects.order_by('id').values_list('organization', 'text', 'is_finished')),
+            [(self.organization.id, 'first', True), (self.organization.id, 'second', False),
+             (self.organization.id, 'third', False)],
+        )
+        self.assertIn('Imported 2 of 2 rows', stdout)
+        self.assertIn('Created 3 lines from 4 rows, 1 rows with errors', stdout)
+        self.assertIn('Row 3:', stderr)
+
+    def test_import_ndjson(self):
+        self.call_command(b'{"text": "first"}\n{"text": "second", "is_finished": true}\n', '.txt', '--format=ndjson')
+
+        self.assertEqual(
+            list(ToDoList.objects.order_by('id').values_list('text', 'is_finished')),
+            [('first', False), ('second', True)],
+        )
+
+    def test_import_stdin(self):
+        stdin = mock.Mock(buffer=BytesIO(b'{"text": "first"}\n'))
+
+        with mock.patch('sys.stdin', stdin):
+            call_command('import_todos', 'some company', '-', stdout=StringIO())
+
+        self.assertEqual(list(ToDoList.objects.values_list('text', flat=True)), ['first'])
+        self.assertFalse(stdin.buffer.closed)
+
+    def test_import_to_missing_organization(self):
+        with self.assertRaises(CommandError):
+            call_command('import_todos', 'missing company', '-')
+
+
+class ReconcileStatsCommandTests(TestCase):
+    """
+    Class that tests rebuilding organization stats with manage.py reconcile_stats
+    """
+    def setUp(self):
+        # Without signals, so the organizations have no stats yet
+        Organization.objects.bulk_create(Organization(name='company %s' % number) for number in range(5))
+        self.organizations = list(Organization.objects.order_by('id'))
+        for number, organization in enumerate(self.organizations):
+            ToDoList.objects.bulk_create(
+                ToDoList(organization=organization, text='line %s' % i, is_finished=i < number)
+                for i in range(number + 2)
+            )
+
+    def stats(self):
+        return list(OrganizationStats.objects.order_by('organization').values_list('organization', 'total', 'finished'))
+
+    def test_reconcile(self):
+        stdout = StringIO()
+        call_command('reconcile_stats', '--chunk-size=2', stdout=stdout)
+
+        self.assertEqual(self.stats(), [
+            (organization.id, number + 2, number) for number, organization in enumerate(self.organizations)
+        ])
+        self.assertIn('Reconciled 5 organizations, fixed the stats of 5', stdout.getvalue())
+
+        OrganizationStats.objects.filter(organization=self.organizations[0]).update(total=100)
+        stdout = StringIO()
+        call_command('reconcile_stats', stdout=stdout)
+
+        self.assertEqual(self.stats()[0], (self.organizations[0].id, 2, 0))
+        self.assertIn('Reconciled 5 organizations, fixed the stats of 1', stdout.getvalue())
+
+    def test_reconcile_organizations(self):
+        call_command('reconcile_stats', 'company 1', 'company 3', stdout=StringIO())
+
+        self.assertEqual(self.stats(), [(self.organizations[1].id, 3, 1), (self.organizations[3].id, 5, 3)])
+
+        with self.assertRaisesMessage(CommandError, 'Organizations do not exist: company 9'):
+            call_command('reconcile_stats', 'company 1', 'company 9')
+
+
+@skipIf(settings.API_ONLY, 'The admin is left out by SETTINGS_PROFILE=api')
+class ToDoListAdminTests(TestCase):
+    """
+    Class that tests deleting lines with the "Delete selected" action of the admin
+    """
+    # The admin logs every deleted object, its requests are not held to the query budget of the API
+    @override_settings(API_METRICS=dict(settings.API_METRICS, QUERY_BUDGET=None))
+    def test_delete_selected(self):
+        organization1 = Organization.objects.create(name='company 1')
+        organization2 = Organization.objects.create(name='company 2')
+        lines = ToDoList.objects.bulk_create_lines(organization1.id, [{'text': 'line 1'}, {'text': 'line 2'}])
+        lines += ToDoList.objects.bulk_create_lines(organization2.id, [{'text': 'line 1', 'is_finished': True}])
+
+        self.client.force_login(CustomUser.objects.create_superuser('admin@email.com', 'company 1', 'foo'))
+        response = self.client.post('/admin/todo_lists/todolist/', {
+            'action': 'delete_selected', '_selected_action': [lines[0].id, lines[2].id], 'post': 'yes',
+        })
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(list(ToDoList.objects.values_list('id', flat=True)), [lines[1].id])
+        self.assertEqual(
+            sorted(ToDoListTombstone.objects.values_list('organization_id', 'line_id')),
+            [(organization1.id, lines[0].id), (organization2.id, lines[2].id)],
+        )
+        self.assertEqual(
+            list(OrganizationStats.objects.order_by('organization').values_list('total', 'finished')),
+            [(1, 0), (0, 0)],
+        )
+
+
+class PurgeOrganizationCommandTests(TestCase):
+    """
+    Class that tests deleting organizations in batches with manage.py purge_organization
+    """
+    def setUp(self):
+        self.organization1 = Organization.objects.create(name='company 1')
+        self.organization2 = Organization.objects.create(name='company 2')
+
+        for organization in (self.organization1, self.organization2):
+            ToDoList.objects.bulk_create_lines(organization.id, [{'text': 'line %s' % i} for i in range(25)])
+            ToDoList.objects.bulk_delete_lines(
+                organization.id, ToDoList.objects.filter(organization=organization).values_list('id', flat=True)[:5],
+            )
+            for number in range(3):
+                CustomUser.objects.create_user('user%s@email.com' % number, organization.name, 'foo')
+
+    def assertPurged(self, purge):
+        self.assertEqual(purge.status, OrganizationPurge.FINISHED)
+        self.assertEqual((purge.lines, purge.tombstones, purge.users), (20, 5, 3))
+        self.assertFalse(Organization.objects.filter(id=self.organization1.id).exists())
+        self.assertFalse(OrganizationStats.objects.filter(organization_id=self.organization1.id).exists())
+
+        # The other organization is left alone
+        self.assertEqual(ToDoList.objects.filter(organization=self.organization2).count(), 20)
+        self.assertEqual(ToDoListTombstone.objects.filter(organization=self.organization2).count(), 5)
+        self.assertEqual(CustomUser.objects.filter(organization_id=self.organization2).count(), 3)
+
+    def test_purge(self):
+        stdout = StringIO()
+        call_command('purge_organization', 'company 1', '--batch-size=7', verbosity=2, stdout=stdout)
+
+        self.assertPurged(OrganizationPurge.objects.get(organization_id=self.organization1.id))
+        self.assertIn('company 1: lines, deleted 14 lines', stdout.getvalue())
+        self.assertIn('Purged company 1: 20 lines, 5 tombstones, 3 users', stdout.getvalue())
+
+        with self.assertRaisesMessage(CommandError, 'Organizations do not exist: company 1'):
+            call_command('purge_organization', 'company 1')
+
+    def test_resume(self):
+        calls = []
+
+        def interrupted_delete_batch(*args):
+            calls.append(args)
+            if len(calls) == 2:
+                raise RuntimeError('Interrupted')
+            return delete_batch(*args)
+
+        with mock.patch('todo_lists.purge.delete_batch', interrupted_delete_batch):
+            with self.assertRaisesMessage(RuntimeError, 'Interrupted'):
+                call_command('purge_organization', 'company 1', '--batch-size=7', stdout=StringIO())
+
+        purge = OrganizationPurge.objects.get(organization_id=self.organization1.id)
+        self.assertEqual((purge.status, purge.step, purge.lines), (OrganizationPurge.FAILED, 'lines', 7))
+        self.assertIn('Interrupted', purge.error)
+        self.assertFalse(CustomUser.objects.filter(organization_id=self.organization1, is_active=True).exists())
+
+        stdout = StringIO()
+        call_command('purge_organization', '--resume', stdout=stdout)
+
+        purge.refresh_from_db()
+        self.assertPurged(purge)
+        self.assertEqual(purge.error, '')
+        self.assertIn('Purged 1 organizations', stdout.getvalue())
+
+    @override_settings(AUTH_USER_CACHE={'MAX_SIZE': 10, 'TTL': 60})
+    def test_deactivated_users_dropped_from_credentials_cache(self):
+        credentials = {'email': 'user0@email.com', 'organization': 'company 1', 'password': 'foo'}
+        organization_ids.set_id('company 1', self.organization1.id)
+        self.addCleanup(organization_ids.clear)
+        self.assertIsNotNone(authenticate(**credentials))
+
+        with mock.patch('todo_lists.purge.delete_batch', side_effect=RuntimeError('Interrupted')):
+            with self.assertRaisesMessage(RuntimeError, 'Interrupted'):
+                call_command('purge_organization', 'company 1', stdout=StringIO())
+
+        self.assertIsNone(authenticate(**credentials))
@@ -1,8 +1,14 @@
-from django.contrib.auth import get_user_model
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import authenticate, get_user_model
 from django.db import IntegrityError
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, override_settings
 
+from todo_lists.cache import organization_ids
 from todo_lists.models import Organization
+from users.backends import CustomBackend
+from users.cache import users_by_credentials
 
 
 class UsersManagersTests(TestCase):
@@ -31,6 +37,16 @@ class UsersManagersTests(TestCase):
         with self.assertRaises(IntegrityError):
             user_model.objects.create_user(email='normal@user.com', organization='some company', password='foo1')
 
+    def test_save_without_organization_lookup(self):
+        user_model = get_user_model()
+
+        Organization.objects.create(name='some company')
+        user = user_model.objects.create_user(email='normal@user.com', organization='some company', password='foo')
+
+        # Only the UPDATE, organization_id is already set
+        with self.assertNumQueries(1):
+            user.save(update_fields=['last_login'])
+
     def test_create_superuser(self):
         user_model = get_user_model()
 
@@ -44,3 +60,99 @@ class UsersManagersTests(TestCase):
         
         with self.assertRaises(ValueError):
             user_model.objects.create_superuser(email='super@user.com', organization='', password='foo')
+
+
+class CustomBackendTests(TransactionTestCase):
+    """
+    Class that tests authentication through the (organization_id, email) index and the credentials cache
+    """
+    def setUp(self):
+        organization_ids.clear()
+        users_by_credentials.clear()
+
+        Organization.objects.create(name='some company')
+        self.user = get_user_model().objects.create_user(
+            email='normal@user.com', organization='some company', password='foo',
+        )
+
+    def test_authenticate(self):
+        self.assertEqual(authenticate(email='normal@user.com', organization='some company', password='foo'), self.user)
+        self.assertIsNone(authenticate(email='normal@user.com', organization='some company', password='bar'))
+        self.assertIsNone(authenticate(email='other@user.com', organization='some company', password='foo'))
+        self.assertIsNone(authenticate(email='normal@user.com', organization='other company', password='foo'))
+
+    def test_authenticate_single_query(self):
+        organization_ids.clear()
+
+        # Organization name is not cached yet, the user is joined by it
+        with self.assertNumQueries(1):
+            authenticate(email='normal@user.com', organization='some company', password='foo')
+
+        with self.assertNumQueries(1):
+            authenticate(email='normal@user.com', organization='some company', password='foo')
+
+    def test_unknown_user_checks_dummy_password(self):
+        with mock.patch('users.backends.check_password') as check_password:
+            with self.assertNumQueries(1):
+                authenticate(email='other@user.com', organization='some company', password='foo')
+
+        check_password.assert_called_once_with('foo', CustomBackend._dummy_password)
+
+    def test_inactive_user(self):
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertIsNone(authenticate(email='normal@user.com', organization='some company', password='foo'))
+
+    @override_settings(AUTH_USER_CACHE={'MAX_SIZE': 10, 'TTL': 60})
+    def test_users_by_credentials_cache(self):
+        authenticate(email='normal@user.com', organization='some company', password='foo')
+
+        with self.assertNumQueries(0):
+            user = authenticate(email='normal@user.com', organization='some company', password='foo')
+
+        self.assertEqual(user, self.user)
+        self.assertIsNot(user, authenticate(email='normal@user.com', organization='some company', password='foo'))
+
+        self.user.set_password('bar')
+        self.user.save()
+
+        self.assertIsNone(authenticate(email='normal@user.com', organization='some company', password='foo'))
+        self.assertEqual(authenticate(email='normal@user.com', organization='some company', password='bar'), self.user)
+
+    @override_settings(AUTH_USER_CACHE={'MAX_SIZE': 10, 'TTL': -1})
+    def test_users_by_credentials_cache_expiration(self):
+        authenticate(email='normal@user.com', organization='some company', password='foo')
+
+        with self.assertNumQueries(1):
+            authenticate(email='normal@user.com', organization='some company', password='foo')
+
+    # PBKDF2 is pinned as the preferred hasher whatever PASSWORD_HASHING_ALGORITHM is
+    @override_settings(PASSWORD_HASHERS=[
+        'users.hashers.PBKDF2PasswordHasher', 'users.hashers.Argon2PasswordHasher',
+        'users.hashers.BCryptSHA256PasswordHasher',
+    ])
+    def test_outdated_hash_upgraded_on_login(self):
+        with override_settings(PASSWORD_HASHING={**settings.PASSWORD_HASHING, 'PBKDF2_ITERATIONS': 1000}):
+            self.user.set_password('foo')
+            self.user.save()
+
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+
+        self.assertIsNone(authenticate(email='normal@user.com', organization='some company', password='bar'))
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+
+        self.assertEqual(authenticate(email='normal@user.com', organization='some company', password='foo'), self.user)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith(
+            'pbkdf2_sha256$%s$' % settings.PASSWORD_HASHING['PBKDF2_ITERATIONS']
+        ))
+        self.assertTrue(self.user.check_password('foo'))
+
+    def test_inline_hashing(self):
+        with override_settings(PASSWORD_HASHING={**settings.PASSWORD_HASHING, 'WORKERS': 0}):
+            self.assertEqual(
+                authenticate(email='normal@user.com', organization='some company', password='foo'),
+                self.user,
+            )
@@ -1,8 +1,22 @@
+import base64
+import json
+import time
+from unittest import mock, skipIf, skipUnless
+
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APIClient, APITestCase, APITransactionTestCase
 
-from todo_lists.models import Organization, ToDoList
+from api.cache import response_cache
+from api.metrics import QueryBudgetExceeded, registry
+from todo_lists.models import Organization, OrganizationPurge, OrganizationStats, ToDoList
+from todo_lists.search import search
+from users.models import CustomUser
 
 
 class RegistrationTestCase(APITestCase):
@@ -54,6 +68,19 @@ class RegistrationTestCase(APITestCase):
         self.assertEqual(response2.status_code, status.HTTP_201_CREATED)
         self.assertEqual(response3.status_code, status.HTTP_201_CREATED)
 
+    def test_register_existing_user(self):
+        data = {
+            "email": "simple@email.com",
+            "organization": "Test Company",
+            "password": "foo"
+        }
+
+        response1 = self.client.post('/api/register/', data)
+        response2 = self.client.post('/api/register/', data)
+
+        self.assertEqual(response1.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response2.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_register_non_existing_organization(self):
         data = {
             "email": "simple@email.com",
@@ -97,6 +124,299 @@ class AuthenticationTestCase(APITestCase):
         self.assertEqual(response4.status_code, status.HTTP_403_FORBIDDEN)
 
 
+class SessionAuthenticationTestCase(APITestCase):
+    """
+    Class for testing writes of session clients with CSRF checks enforced, in both settings profiles
+    """
+    def setUp(self):
+        Organization.objects.create(name='Test Company')
+        CustomUser.objects.create_user('simple@email.com', 'Test Company', 'foo')
+
+        self.client = APIClient(enforce_csrf_checks=True)
+
+    def test_write_with_csrf_token(self):
+        data = {'email': 'simple@email.com', 'organization': 'Test Company', 'password': 'foo'}
+        self.client.post('/api/login/', data)
+
+        self.assertIn('csrftoken', self.client.cookies)
+
+        response1 = self.client.post('/api/todo_lists/', {'text': '1) Wake up'})
+        response2 = self.client.post(
+            '/api/todo_lists/', {'text': '1) Wake up'}, HTTP_X_CSRFTOKEN=self.client.cookies['csrftoken'].value,
+        )
+
+        self.assertEqual(response1.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response2.status_code, status.HTTP_201_CREATED)
+
+
+class TokenAuthenticationTestCase(APITestCase):
+    """
+    Class for testing signed token issuing and authentication
+    """
+    def setUp(self):
+        self.organization1 = Organization.objects.create(name='Test Company 1')
+        self.organization2 = Organization.objects.create(name='Test Company 2')
+
+        self.todo_list_line1 = ToDoList.objects.create(organization=self.organization1, text='1) Wake up')
+        self.todo_list_line2 = ToDoList.objects.create(organization=self.organization2, text='Do nothing')
+
+        self.data = {
+            "email": "simple@email.com",
+            "organization": "Test Company 1",
+            "password": "foo"
+        }
+
+        self.client.post('/api/register/', self.data)
+
+    def test_token(self):
+        response = self.client.post('/api/token/', self.data)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreater(response.json()['expires'], time.time())
+
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + response.json()['token'])
+
+        # Neither the session nor the user is loaded
+        with self.assertNumQueries(1):
+            response1 = self.client.get('/api/todo_lists/')
+        response2 = self.client.post('/api/todo_lists/', {'text': '2) Do yoga'})
+        response3 = self.client.get('/api/todo_lists/' + str(self.todo_list_line2.id) + '/')
+
+        self.assertEqual(response1.status_code, status.HTTP_200_OK)
+        self.assertEqual([line['id'] for line in response1.json()['results']], [self.todo_list_line1.id])
+        self.assertEqual(response2.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(ToDoList.objects.get(text='2) Do yoga').organization, self.organization1)
+        self.assertEqual(response3.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_credentials(self):
+        response = self.client.post('/api/token/', {**self.data, 'password': 'bar'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_token(self):
+        token = self.client.post('/api/token/', self.data).json()['token']
+
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + token[:-1])
+        response1 = self.client.get('/api/todo_lists/')
+
+        with mock.patch('api.authentication.time.time', return_value=time.time() + 3600 * 24):
+            self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + token)
+            response2 = self.client.get('/api/todo_lists/')
+
+        self.assertEqual(response1.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response2.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class DeletedOrganizationTokenTestCase(APITransactionTestCase):
+    """
+    Class for testing writes with a signed token of a deleted organization, with real transactions since the
+    failed write rolls back the transaction it runs in
+    """
+    def setUp(self):
+        organization = Organization.objects.create(name='Test Company 1')
+
+        data = {
+            "email": "simple@email.com",
+            "organization": "Test Company 1",
+            "password": "foo"
+        }
+
+        self.client.post('/api/register/', data)
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.client.post('/api/token/', data).json()['token'])
+
+        organization.delete()
+
+    def test_create(self):
+        response1 = self.client.post('/api/todo_lists/', {'text': '2) Do yoga'})
+        response2 = self.client.post('/api/todo_lists/bulk/', {'create': [{'text': '2) Do yoga'}]}, format='json')
+        response3 = self.client.get('/api/todo_lists/')
+
+        self.assertEqual(response1.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response1.data['detail'], 'Organization not found.')
+        self.assertEqual(response2.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response3.status_code, status.HTTP_200_OK)
+        self.assertFalse(ToDoList.objects.exists())
+
+    def test_import(self):
+        response = self.client.post(
+            '/api/todo_lists/import/', b'{"text": "2) Do yoga"}\n', content_type='application/x-ndjson',
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(API_METRICS=dict(settings.API_METRICS, TOKEN='secret'))
+class AuthThrottleTestCase(APITestCase):
+    """
+    Class for testing the throttles of registration, login and token issuing and the shedding of password checks
+    """
+    def setUp(self):
+        Organization.objects.create(name='Test Company')
+
+        self.data = {
+            "email": "simple@email.com",
+            "organization": "Test Company",
+            "password": "foo"
+        }
+
+        self.client.post('/api/register/', self.data)
+
+    @override_settings(AUTH_THROTTLE=dict(settings.AUTH_THROTTLE, CREDENTIALS_BURST=2))
+    def test_credentials_throttle(self):
+        response1 = self.client.post('/api/login/', {**self.data, 'password': 'bar'})
+        response2 = self.client.post('/api/token/', {**self.data, 'email': 'SIMPLE@email.com', 'password': 'bar'})
+        response3 = self.client.post('/api/login/', self.data)
+        response4 = self.client.post('/api/login/', {**self.data, 'email': 'other@email.com'})
+
+        self.assertEqual(response1.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response2.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response3.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response3['Retry-After'], '12')
+        self.assertEqual(response4.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # The bucket refills at CREDENTIALS_PER_MINUTE
+        with mock.patch('api.throttling.time.monotonic', return_value=time.monotonic() + 12):
+            self.assertEqual(self.client.post('/api/login/', self.data).status_code, status.HTTP_200_OK)
+
+        metrics = self.client.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer secret').content.decode()
+        self.assertIn('api_auth_throttled_total{scope="credentials"} 1', metrics)
+
+    @override_settings(AUTH_THROTTLE=dict(settings.AUTH_THROTTLE, IP_BURST=2))
+    def test_ip_throttle(self):
+        responses = [
+            self.client.post('/api/register/', {**self.data, 'email': email}, REMOTE_ADDR='10.0.0.1')
+            for email in ('user1@email.com', 'user2@email.com', 'user3@email.com')
+        ]
+
+        self.assertEqual(
+            [response.status_code for response in responses],
+            [status.HTTP_201_CREATED, status.HTTP_201_CREATED, status.HTTP_429_TOO_MANY_REQUESTS],
+        )
+        self.assertEqual(self.client.post('/api/login/', self.data).status_code, status.HTTP_200_OK)
+
+        with override_settings(AUTH_THROTTLE=dict(settings.AUTH_THROTTLE, ENABLED=False)):
+            response = self.client.post('/api/login/', self.data, REMOTE_ADDR='10.0.0.1')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(AUTH_THROTTLE=dict(settings.AUTH_THROTTLE, IP_BURST=2))
+    def test_ip_throttle_spoofed_forwarded_for(self):
+        statuses = [
+            self.client.post('/api/login/', self.data, HTTP_X_FORWARDED_FOR='10.0.0.%s' % number).status_code
+            for number in range(3)
+        ]
+
+        self.assertEqual(statuses, [status.HTTP_200_OK, status.HTTP_200_OK, status.HTTP_429_TOO_MANY_REQUESTS])
+
+        # Behind a trusted proxy its X-Forwarded-For is the client address
+        with override_settings(REST_FRAMEWORK=dict(settings.REST_FRAMEWORK, NUM_PROXIES=1)):
+            response = self.client.post('/api/login/', self.data, HTTP_X_FORWARDED_FOR='10.0.0.3')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(PASSWORD_HASHING=dict(settings.PASSWORD_HASHING, WORKERS=1, QUEUE_SIZE=0))
+    def test_password_checks_shed(self):
+        token = self.client.post('/api/token/', self.data).json()['token']
+
+        # Another request is hashing in the only slot of the pool
+        with mock.patch('users.hashers.hasher_pool.in_flight', 1):
+            response1 = self.client.post('/api/login/', self.data)
+            response2 = self.client.get('/api/todo_lists/', HTTP_AUTHORIZATION='Bearer ' + token)
+            metrics = self.client.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer secret').content.decode()
+
+        self.assertEqual(response1.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response1['Retry-After'], '1')
+        self.assertEqual(response2.status_code, status.HTTP_200_OK)
+        self.assertIn('api_password_hashes_in_flight 1', metrics)
+        self.assertRegex(metrics, r'api_password_hashes_shed_total [1-9]')
+
+        self.assertEqual(self.client.post('/api/login/', self.data).status_code, status.HTTP_200_OK)
+
+
+class ToDoListCacheTestCase(APITestCase):
+    """
+    Class for testing the per-organization response cache of ToDoList reads and its invalidation
+    """
+    def setUp(self):
+        self.organization1 = Organization.objects.create(name='Test Company 1')
+        self.organization2 = Organization.objects.create(name='Test Company 2')
+
+        self.todo_list_line1 = ToDoList.objects.create(organization=self.organization1, text='1) Wake up')
+        self.todo_list_line2 = ToDoList.objects.create(organization=self.organization2, text='Do nothing')
+
+        data = {
+            "email": "simple@email.com",
+            "organization": "Test Company 1",
+            "password": "foo"
+        }
+
+        self.client.post('/api/register/', data)
+        token = self.client.post('/api/token/', data).json()['token']
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + token)
+
+        response_cache.reset_stats()
+
+    def test_repeated_read(self):
+        response1 = self.client.get('/api/todo_lists/')
+
+        with self.assertNumQueries(0):
+            response2 = self.client.get('/api/todo_lists/')
+            response3 = self.client.get('/api/todo_lists/', HTTP_IF_NONE_MATCH=response1['ETag'])
+
+        self.assertEqual(response1['X-Cache'], 'MISS')
+        self.assertEqual(response2['X-Cache'], 'HIT')
+        self.assertEqual(response2.json(), response1.json())
+        self.assertEqual(response3.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response_cache.stats(), {'hits': 1, 'misses': 1, 'not_modified': 1})
+
+    def test_repeated_detail_read(self):
+        url = '/api/todo_lists/' + str(self.todo_list_line1.id) + '/'
+        self.client.get(url)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+
+        self.assertEqual(response.json(), {'id': self.todo_list_line1.id, 'text': '1) Wake up', 'is_finished': False})
+
+    def test_etag_of_resource(self):
+        etag = self.client.get('/api/todo_lists/')['ETag']
+
+        response1 = self.client.get('/api/todo_lists/%s/' % self.todo_list_line1.id, HTTP_IF_NONE_MATCH=etag)
+        response2 = self.client.get('/api/todo_lists/0/', HTTP_IF_NONE_MATCH=etag)
+        response3 = self.client.get('/api/todo_lists/?is_finished=true', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response1.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response1['ETag'], etag)
+        self.assertEqual(response2.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response3.status_code, status.HTTP_200_OK)
+
+    def test_writes_invalidate_reads(self):
+        etag = self.client.get('/api/todo_lists/')['ETag']
+
+        writes = [
+            lambda: self.client.post('/api/todo_lists/', {'text': '2) Do yoga'}),
+            lambda: self.client.patch('/api/todo_lists/' + str(self.todo_list_line1.id) + '/', {'is_finished': True}),
+            lambda: self.client.post('/api/todo_lists/bulk/', {'create': [{'text': '3) Run'}]}, format='json'),
+            lambda: self.client.delete('/api/todo_lists/' + str(self.todo_list_line1.id) + '/'),
+        ]
+        for write in writes:
+            write()
+            response = self.client.get('/api/todo_lists/', HTTP_IF_NONE_MATCH=etag)
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response['X-Cache'], 'MISS')
+            self.assertEqual(
+                [line['id'] for line in response.json()['results']],
+                list(ToDoList.objects.filter(organization=self.organization1).order_by('id').values_list('id', flat=True)),
+            )
+            etag = response['ETag']
+
+    def test_other_organization_writes(self):
+        self.client.get('/api/todo_lists/')
+
+        ToDoList.objects.create(organization=self.organization2, text='Do something')
+
+        self.assertEqual(self.client.get('/api/todo_lists/')['X-Cache'], 'HIT')
+
+
 class OrganizationViewTestCase(APITestCase):
     """
     Class for testing Organization CRUD
@@ -152,6 +472,88 @@ class OrganizationViewTestCase(APITestCase):
             Organization.objects.get(id=self.organization1.id)
 
 
+class OrganizationPurgeTestCase(APITestCase):
+    """
+    Class for testing the purge of an organization through the API
+    """
+    def setUp(self):
+        self.organization1 = Organization.objects.create(name='Test Company 1')
+        self.organization2 = Organization.objects.create(name='Test Company 2')
+
+        ToDoList.objects.create(organization=self.organization1, text='1) Wake up')
+        ToDoList.objects.bulk_create_lines(self.organization2.id, [{'text': 'Line %s' % i} for i in range(5)])
+
+        data = {
+            "email": "simple@email.com",
+            "organization": "Test Company 1",
+            "password": "foo"
+        }
+
+        self.client.post('/api/register/', data)
+        self.client.post('/api/register/', dict(data, organization='Test Company 2'))
+        self.client.post('/api/login/', data)
+
+    @override_settings(TODO_LIST_PURGE=dict(settings.TODO_LIST_PURGE, BACKGROUND=False, BATCH_SIZE=2))
+    def test_purge_organization(self):
+        response = self.client.post('/api/organizations/%s/purge/' % self.organization2.id)
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response['Location'], '/api/organization_purges/%s/' % response.data['id'])
+        self.assertEqual(
+            {key: response.data[key] for key in ('organization_id', 'status', 'step', 'lines', 'tombstones', 'users')},
+            {'organization_id': self.organization2.id, 'status': 'finished', 'step': 'organization',
+             'lines': 5, 'tombstones': 0, 'users': 1},
+        )
+
+        response = self.client.get(response['Location'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'finished')
+        self.assertIsNotNone(response.data['finished_at'])
+
+        self.assertFalse(Organization.objects.filter(id=self.organization2.id).exists())
+        self.assertFalse(ToDoList.objects.filter(organization_id=self.organization2.id).exists())
+        self.assertEqual(ToDoList.objects.filter(organization=self.organization1).count(), 1)
+
+        response = self.client.post('/api/organizations/%s/purge/' % self.organization2.id)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_purge_in_background(self):
+        # The purge is queued as a job, see tests.test_jobs
+        response = self.client.post('/api/organizations/%s/purge/' % self.organization2.id)
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], 'pending')
+
+        # A purge already started is returned again
+        again = self.client.post('/api/organizations/%s/purge/' % self.organization2.id)
+        self.assertEqual(again.data['id'], response.data['id'])
+        self.assertEqual(self.client.get('/api/organization_purges/').data[0]['id'], response.data['id'])
+
+    def test_purges_of_other_organizations(self):
+        organization3 = Organization.objects.create(name='Test Company 3')
+        CustomUser.objects.create_user('other@email.com', organization3.name, 'foo')
+
+        requested = self.client.post('/api/organizations/%s/purge/' % self.organization2.id).data
+        other = OrganizationPurge.objects.start(organization3)
+
+        response = self.client.get('/api/organization_purges/')
+        self.assertEqual([purge['id'] for purge in response.data], [requested['id']])
+        self.assertEqual(
+            self.client.get('/api/organization_purges/%s/' % other.id).status_code, status.HTTP_404_NOT_FOUND,
+        )
+
+        # The purged organization reads its purge, other organizations read nothing
+        data = {'email': 'other@email.com', 'organization': organization3.name, 'password': 'foo'}
+        self.client.post('/api/login/', data)
+
+        response = self.client.get('/api/organization_purges/')
+        self.assertEqual([purge['id'] for purge in response.data], [other.id])
+        self.assertEqual(
+            self.client.get('/api/organization_purges/%s/' % requested['id']).status_code,
+            status.HTTP_404_NOT_FOUND,
+        )
+
+
 class ToDoListViewTestCase(APITestCase):
     """
     Class for testing ToDoList CRUD and
@@ -193,7 +595,54 @@ class ToDoListViewTestCase(APITestCase):
         response = self.client.get('/api/todo_lists/')
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.json(), json_benchmark)
+        self.assertEqual(response.json()['results'], json_benchmark)
+        self.assertIsNone(response.json()['next'])
+        self.assertIsNone(response.json()['previous'])
+
+    def test_get_todo_lists_pages(self):
+        lines = ToDoList.objects.bulk_create(
+            ToDoList(organization=self.organization1, text='Line %s' % i) for i in range(5)
+        )
+        expected_ids = list(
+            ToDoList.objects.filter(organization=self.organization1).order_by('id').values_list('id', flat=True)
+        )
+        self.assertEqual(len(expected_ids), len(lines) + 2)
+
+        received_ids = []
+        url = '/api/todo_lists/?page_size=3'
+        while url:
+            response = self.client.get(url)
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.json()['results']), 3)
+
+            received_ids.extend(line['id'] for line in response.json()['results'])
+            url = response.json()['next']
+
+        self.assertEqual(received_ids, expected_ids)
+
+    def test_get_todo_lists_invalid_cursor(self):
+        response1 = self.client.get('/api/todo_lists/?cursor=not-a-cursor')
+        response2 = self.client.get('/api/todo_lists/?cursor=cD1hYmM%3D')  # p=abc
+        response3 = self.client.get('/api/todo_lists/', {'cursor': base64.b64encode(b'p=' + b'9' * 25).decode()})
+
+        self.assertEqual(response1.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response2.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response3.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_get_todo_lists_filtered_and_ordered(self):
+        response1 = self.client.get('/api/todo_lists/?is_finished=false')
+        response2 = self.client.get('/api/todo_lists/?is_finished=true')
+        response3 = self.client.get('/api/todo_lists/?ordering=-id')
+        response4 = self.client.get('/api/todo_lists/?is_finished=maybe')
+
+        self.assertEqual([line['id'] for line in response1.json()['results']], [self.todo_list_line2.id])
+        self.assertEqual([line['id'] for line in response2.json()['results']], [self.todo_list_line1.id])
+        self.assertEqual(
+            [line['id'] for line in response3.json()['results']],
+            [self.todo_list_line2.id, self.todo_list_line1.id],
+        )
+        self.assertEqual(response4.status_code, status.HTTP_400_BAD_REQUEST)
 
     def test_get_todo_list(self):
         json_benchmark = {'id': self.todo_list_line1.id, 'text': '1) Wake up', 'is_finished': True}
@@ -250,3 +699,805 @@ class ToDoListViewTestCase(APITestCase):
         response = self.client.delete('/api/todo_lists/' + str(self.todo_list_line3.id) + '/')
 
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(TODO_LIST_EXPORT_CHUNK_SIZE=2)
+class ToDoListExportTestCase(APITestCase):
+    """
+    Class for testing streamed NDJSON and JSON exports of an organization's todo list
+    """
+    def setUp(self):
+        self.organization1 = Organization.objects.create(name='Test Company 1')
+        self.organization2 = Organization.objects.create(name='Test Company 2')
+
+        ToDoList.objects.create(organization=self.organization2, text='Do nothing')
+        self.lines = [
+            ToDoList.objects.create(organization=self.organization1, text='Line %s \u2028 "ё"' % i, is_finished=i == 1)
+            for i in range(5)
+        ]
+
+        data = {
+            "email": "simple@email.com",
+            "organization": "Test Company 1",
+            "password": "foo"
+        }
+
+        self.client.post('/api/register/', data)
+        self.client.post('/api/login/', data)
+
+    def expected(self, lines):
+        return [{'id': line.id, 'text': line.text, 'is_finished': line.is_finished} for line in lines]
+
+    def test_export_ndjson(self):
+        response = self.client.get('/api/todo_lists/export/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+
+        content = b''.join(response.streaming_content)
+        self.assertNotIn('\u2028'.encode(), content)
+        self.assertEqual([json.loads(line) for line in content.splitlines()], self.expected(self.lines))
+
+    def test_export_json(self):
+        response1 = self.client.get('/api/todo_lists/export/?format=json')
+        response2 = self.client.get('/api/todo_lists/export/', HTTP_ACCEPT='application/json')
+
+        self.assertEqual(response1['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(b''.join(response1.streaming_content)), self.expected(self.lines))
+        self.assertEqual(json.loads(b''.join(response2.streaming_content)), self.expected(self.lines))
+
+    def test_export_filtered(self):
+        response = self.client.get('/api/todo_lists/export/?format=json&is_finished=false&ordering=-id')
+
+        self.assertEqual(
+            json.loads(b''.join(response.streaming_content)),
+            self.expected(reversed([line for line in self.lines if not line.is_finished])),
+        )
+
+    def test_export_empty(self):
+        ToDoList.objects.filter(organization=self.organization1).delete()
+
+        response1 = self.client.get('/api/todo_lists/export/')
+        response2 = self.client.get('/api/todo_lists/export/?format=json')
+
+        self.assertEqual(b''.join(response1.streaming_content), b'')
+        self.assertEqual(b''.join(response2.streaming_content), b'[]')
+
+
+@override_settings(TODO_LIST_CACHE={'ENABLED': False, 'ALIAS': 'default', 'TIMEOUT': 300})
+class ToDoListFastReadTestCase(APITestCase):
+    """
+    Class for testing that list and retrieve responses read from plain rows are byte-identical to serialized ones
+    """
+    def setUp(self):
+        self.organization1 = Organization.objects.create(name='Test Company 1')
+        self.organization2 = Organization.objects.create(name='Test Company 2')
+
+        self.other_line = ToDoList.objects.create(organization=self.organization2, text='Do nothing')
+        texts = ['Line \u2028 \u2029 "quoted" \\ ё 😀', 'Control \x00 \x1f \t \n \x7f', '</script>', '']
+        self.lines = [
+            ToDoList.objects.create(organization=self.organization1, text=text, is_finished=i % 2 == 0)
+            for i, text in enumerate(texts * 3)
+        ]
+
+        data = {
+            "email": "simple@email.com",
+            "organization": "Test Company 1",
+            "password": "foo"
+        }
+
+        self.client.post('/api/register/', data)
+        self.client.post('/api/login/', data)
+
+    def assertSameContent(self, path, **extra):
+        fast = self.client.get(path, **extra)
+        with override_settings(TODO_LIST_FAST_READ=False):
+            serialized = self.client.get(path, **extra)
+
+        self.assertEqual(fast.status_code, serialized.status_code)
+        self.assertEqual(fast['Content-Type'], serialized['Content-Type'])
+        self.assertEqual(fast.content, serialized.content)
+
+        return fast
+
+    def test_list(self):
+        response = self.assertSameContent('/api/todo_lists/?page_size=5')
+        self.assertNotIn('\u2028'.encode(), response.content)
+
+        self.assertSameContent(response.data['next'])
+        self.assertSameContent('/api/todo_lists/?is_finished=true&ordering=-id&page_size=2')
+        self.assertSameContent('/api/todo_lists/?format=json')
+
+    def test_retrieve(self):
+        for line in self.lines[:4]:
+            self.assertSameContent('/api/todo_lists/%s/' % line.id)
+
+        self.assertSameContent('/api/todo_lists/%s/' % self.other_line.id)
+        self.assertSameContent('/api/todo_lists/%s/?is_finished=false' % self.lines[0].id)
+        self.assertSameContent('/api/todo_lists/abc/')
+
+    @skipIf(settings.API_ONLY, 'The browsable API is left out by SETTINGS_PROFILE=api')
+    def test_other_renderers(self):
+        self.assertSameContent('/api/todo_lists/', HTTP_ACCEPT='application/json; indent=4')
+
+        response = self.client.get('/api/todo_lists/', HTTP_ACCEPT='text/html')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/html'))
+
+    def test_without_orjson(self):
+        with mock.patch('api.renderers.orjson', None):
+            self.assertSameContent('/api/todo_lists/')
+
+
+class OrganizationStatsTestCase(APITestCase):
+    """
+    Class for testing that organization stats follow every write of todo list lines
+    """
+    def setUp(self):
+        self.organization1 = Organization.objects.create(name='Test Company 1')
+        self.organization2 = Organization.objects.create(name='Test Company 2')
+
+        self.line = ToDoList.objects.create(organization=self.organization1, text='1) Wake up')
+        ToDoList.objects.create(organization=self.organization2, text='Do nothing', is_finished=True)
+
+        data = {
+            "email": "simple@email.com",
+            "organization": "Test Company 1",
+            "password": "foo"
+        }
+
+        self.client.post('/api/register/', data)
+        self.client.post('/api/login/', data)
+
+    def assertStats(self, organization, total, finished):
+        response = self.client.get('/api/organizations/%s/stats/' % organization.id)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        lines = ToDoList.objects.filter(organization=organization)
+        self.assertEqual((lines.count(), lines.filter(is_finished=True).count()), (total, finished))
+        self.assertEqual(
+            {key: response.data[key] for key in ('organization', 'total', 'finished', 'open')},
+            {'organization': organization.id, 'total': total, 'finished': finished, 'open': total - finished},
+        )
+
+        return response.data
+
+    def test_stats_follow_writes(self):
+        self.assertStats(self.organization1, 1, 0)
+        self.assertStats(self.organization2, 1, 1)
+
+        line_id = self.client.post('/api/todo_lists/', {'text': '2) Do yoga', 'is_finished': True}).data['id']
+        self.assertStats(self.organization1, 2, 1)
+
+        self.client.patch('/api/todo_lists/%s/' % self.line.id, {'is_finished': True})
+        self.client.patch('/api/todo_lists/%s/' % self.line.id, {'is_finished': True})
+        self.assertStats(self.organization1, 2, 2)
+
+        self.client.put('/api/todo_lists/%s/' % line_id, {'text': '2) Do yoga', 'is_finished': False})
+        self.client.patch('/api/todo_lists/%s/' % line_id, {'text': '2) Do more yoga'})
+        self.assertStats(self.organization1, 2, 1)
+
+        self.client.delete('/api/todo_lists/%s/' % self.line.id)
+        self.assertStats(self.organization1, 1, 0)
+
+        self.client.post('/api/todo_lists/bulk/', {
+            'create': [{'text': '3) Make breakfast', 'is_finished': True}, {'text': '4) Go to work'}],
+            'update': [{'id': line_id, 'is_finished': True}],
+        }, format='json')
+        self.assertStats(self.organization1, 3, 2)
+
+        self.client.post('/api/todo_lists/bulk/', {'delete': [line_id, self.line.id]}, format='json')
+        self.client.post(
+            '/api/todo_lists/import/', b'{"text": "5) Go home", "is_finished": true}\n',
+            content_type='application/x-ndjson',
+        )
+        data = self.assertStats(self.organization1, 3, 2)
+        self.assertIsNotNone(data['modified_at'])
+
+        self.assertStats(self.organization2, 1, 1)
+
+    def test_stats_of_model_writes(self):
+        self.line.is_finished = True
+        self.line.save(update_fields=['text'])
+        self.assertStats(self.organization1, 1, 0)
+
+        self.line.save(update_fields=['is_finished'])
+        self.assertStats(self.organization1, 1, 1)
+
+    def test_missing_stats(self):
+        OrganizationStats.objects.all().delete()
+
+        self.assertStats(self.organization1, 1, 0)
+        self.client.post('/api/todo_lists/', {'text': '2) Do yoga'})
+        self.assertStats(self.organization1, 2, 0)
+
+    def test_organization_update_keeps_sequence(self):
+        organization = Organization.objects.get(id=self.organization1.id)
+        self.client.post('/api/todo_lists/', {'text': '2) Do yoga'})
+
+        organization.name = 'Renamed Company'
+        organization.save()
+
+        organization.refresh_from_db()
+        last_line = ToDoList.objects.filter(organization=organization).latest('sequence')
+        self.assertEqual(organization.change_sequence, last_line.sequence)
+
+
+class ToDoListChangesTestCase(APITestCase):
+    """
+    Class for testing the change feed of todo list lines
+    """
+    def setUp(self):
+        self.organization1 = Organization.objects.create(name='Test Company 1')
+        self.organization2 = Organization.objects.create(name='Test Company 2')
+
+        self.line1 = ToDoList.objects.create(organization=self.organization1, text='1) Wake up')
+        self.line2 = ToDoList.objects.create(organization=self.organization1, text='2) Do yoga')
+        ToDoList.objects.create(organization=self.organization2, text='Do nothing')
+
+        data = {
+            "email": "simple@email.com",
+            "organization": "Test Company 1",
+            "password": "foo"
+        }
+
+        self.client.post('/api/register/', data)
+        self.client.post('/api/login/', data)
+
+    def changes(self, since=None, **params):
+        if since is not None:
+            params['since'] = since
+
+        response = self.client.get('/api/todo_lists/changes/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return response.json()
+
+    def test_changes_since_token(self):
+        data = self.changes()
+        self.assertEqual(data['changed'], [
+            {'id': self.line1.id, 'text': '1) Wake up', 'is_finished': False},
+            {'id': self.line2.id, 'text': '2) Do yoga', 'is_finished': False},
+        ])
+        self.assertEqual(data['deleted'], [])
+        self.assertFalse(data['more'])
+
+        token = data['token']
+        self.assertEqual(self.changes(token), {'since': token, 'token': token, 'more': False, 'changed': [], 'deleted': []})
+
+        created = self.client.post('/api/todo_lists/', {'text': '3) Make breakfast'}).data['id']
+        self.client.patch('/api/todo_lists/%s/' % self.line1.id, {'is_finished': True})
+        self.client.delete('/api/todo_lists/%s/' % self.line2.id)
+        ToDoList.objects.create(organization=self.organization2, text='Do nothing again')
+
+        data = self.changes(token)
+        self.assertEqual(data['changed'], [
+            {'id': created, 'text': '3) Make breakfast', 'is_finished': False},
+            {'id': self.line1.id, 'text': '1) Wake up', 'is_finished': True},
+        ])
+        self.assertEqual(data['deleted'], [self.line2.id])
+        self.assertGreater(data['token'], token)
+
+    def test_changes_in_pages(self):
+        token = self.changes()['token']
+        response = self.client.post('/api/todo_lists/bulk/', {
+            'create': [{'text': '3) Make breakfast'}, {'text': '4) Go to work'}],
+            'update': [{'id': self.line1.id, 'text': '1) Wake up early'}],
+            'delete': [self.line2.id],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        changed, deleted = [], []
+        while True:
+            data = self.changes(token, page_size=1)
+            self.assertLessEqual(len(data['changed']) + len(data['deleted']), 1)
+            changed += [line['text'] for line in data['changed']]
+            deleted += data['deleted']
+            token = data['token']
+
+            if not data['more']:
+                break
+
+        self.assertEqual(changed, ['3) Make breakfast', '4) Go to work', '1) Wake up early'])
+        self.assertEqual(deleted, [self.line2.id])
+
+    def test_recreated_line(self):
+        token = self.changes()['token']
+        line_id = self.line2.id
+        self.line2.delete()
+        ToDoList.objects.create(id=line_id, organization=self.organization1, text='2) Do yoga again')
+
+        data = self.changes(token)
+        self.assertEqual(data['changed'], [{'id': line_id, 'text': '2) Do yoga again', 'is_finished': False}])
+        self.assertEqual(data['deleted'], [])
+
+    def test_search_parameter_ignored(self):
+        token = self.changes()['token']
+        self.client.patch('/api/todo_lists/%s/' % self.line1.id, {'is_finished': True})
+
+        data = self.changes(token, search='yoga', page_size=1)
+        self.assertEqual(data['changed'], [{'id': self.line1.id, 'text': '1) Wake up', 'is_finished': True}])
+
+    def test_invalid_token(self):
+        for since in ['foo', '-1', str(2 ** 63), '9' * 25]:
+            response = self.client.get('/api/todo_lists/changes/', {'since': since})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_not_modified(self):
+        token = self.changes()['token']
+        response = self.client.get('/api/todo_lists/changes/', {'since': token})
+
+        response = self.client.get('/api/todo_lists/changes/', {'since': token}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.patch('/api/todo_lists/%s/' % self.line1.id, {'is_finished': True})
+        response = self.client.get('/api/todo_lists/changes/', {'since': token}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class ToDoListSearchTestCase(APITestCase):
+    """
+    Class for testing full-text search of todo list lines
+    """
+    def setUp(self):
+        self.organization1 = Organization.objects.create(name='Test Company 1')
+        self.organization2 = Organization.objects.create(name='Test Company 2')
+
+        texts = [
+            'Buy milk',
+            'Buy milk and bread, milk for the cat',
+            'Call the café about the milk delivery',
+            'Молоко купить',
+            'Write the report',
+        ]
+        self.lines = [ToDoList.objects.create(organization=self.organization1, text=text) for text in texts]
+        ToDoList.objects.create(organization=self.organization2, text='Buy milk')
+
+        data = {
+            "email": "simple@email.com",
+            "organization": "Test Company 1",
+            "password": "foo"
+        }
+
+        self.client.post('/api/register/', data)
+        self.client.post('/api/login/', data)
+
+    def search(self, query, **params):
+        response = self.client.get('/api/todo_lists/', dict(params, search=query))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return [line['text'] for line in response.json()['results']]
+
+    def test_search(self):
+        # Ranked with bm25: short lines and repeated words first
+        self.assertEqual(self.search('milk'), [
+            'Buy milk',
+            'Buy milk and bread, milk for the cat',
+            'Call the café about the milk delivery',
+        ])
+        self.assertEqual(self.search('MILK buy'), ['Buy milk', 'Buy milk and bread, milk for the cat'])
+        self.assertEqual(self.search('cafe'), ['Call the café about the milk delivery'])
+        self.assertEqual(self.search('молоко'), ['Молоко купить'])
+        self.assertEqual(self.search('mil'), [])
+        # Query syntax of the index is not interpreted
+        self.assertEqual(self.search('"milk*" -'), self.search('milk'))
+        self.assertEqual(self.search('!?'), [])
+
+    def test_search_with_filters(self):
+        self.client.patch('/api/todo_lists/%s/' % self.lines[0].id, {'is_finished': True})
+
+        self.assertEqual(self.search('milk', is_finished='false'), [
+            'Buy milk and bread, milk for the cat',
+            'Call the café about the milk delivery',
+        ])
+
+    def test_index_follows_writes(self):
+        self.client.patch('/api/todo_lists/%s/' % self.lines[4].id, {'text': 'Write the milk report'})
+        self.client.post('/api/todo_lists/bulk/', {
+            'update': [{'id': self.lines[1].id, 'text': 'Buy bread'}],
+            'delete': [self.lines[0].id],
+        }, format='json')
+
+        self.assertEqual(self.search('milk'), ['Write the milk report', 'Call the café about the milk delivery'])
+        self.assertEqual(self.search('report'), ['Write the milk report'])
+
+        # Fails when the index differs from the lines, including after the cascade
+        organization_id = self.organization1.id
+        self.organization1.delete()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO todo_lists_todolist_fts(todo_lists_todolist_fts, rank) VALUES ('integrity-check', 1)"
+            )
+        self.assertFalse(search(ToDoList.objects.all(), 'milk', organization_id).exists())
+
+    def test_search_pages(self):
+        ToDoList.objects.bulk_create_lines(
+            self.organization1.id, [{'text': 'Pack box %s' % i, 'is_finished': False} for i in range(5)],
+        )
+
+        response = self.client.get('/api/todo_lists/', {'search': 'pack box', 'page_size': 2})
+        texts = [line['text'] for line in response.json()['results']]
+        while response.json()['next']:
+            response = self.client.get(response.json()['next'])
+            texts += [line['text'] for line in response.json()['results']]
+
+        self.assertEqual(texts, ['Pack box %s' % i for i in range(5)])
+        self.assertIsNotNone(response.json()['previous'])
+
+        response = self.client.get('/api/todo_lists/', {'search': 'pack', 'offset': 'foo'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_search_without_fast_read(self):
+        response = self.client.get('/api/todo_lists/', {'search': 'milk'})
+        with override_settings(TODO_LIST_FAST_READ=False):
+            serialized = self.client.get('/api/todo_lists/', {'search': 'milk'})
+
+        self.assertEqual(response.content, serialized.content)
+
+
+class ToDoListImportTestCase(APITestCase):
+    """
+    Class for testing batched NDJSON and CSV imports of todo list lines
+    """
+    def setUp(self):
+        self.organization1 = Organization.objects.create(name='Test Company 1')
+        self.organization2 = Organization.objects.create(name='Test Company 2')
+
+        data = {
+            "email": "simple@email.com",
+            "organization": "Test Company 1",
+            "password": "foo"
+        }
+
+        self.client.post('/api/register/', data)
+        self.client.post('/api/login/', data)
+
+    def imported(self):
+        return list(ToDoList.objects.filter(organization=self.organization1).order_by('id').values_list(
+            'text', 'is_finished',
+        ))
+
+    def test_import_ndjson(self):
+        content = (
+            '{"text": "1) Wake up", "is_finished": true}\n'
+            '\n'
+            '{"id": 100, "text": "2) Do yoga \u2028 ё"}\n'
+        ).encode()
+
+        response = self.client.post('/api/todo_lists/import/', content, content_type='application/x-ndjson')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'rows': 2, 'created': 2, 'errors_count': 0, 'errors': []})
+        self.assertEqual(self.imported(), [('1) Wake up', True), ('2) Do yoga \u2028 ё', False)])
+        self.assertFalse(ToDoList.objects.filter(organization=self.organization2).exists())
+
+    def test_import_csv(self):
+        content = '\ufefftext,is_finished\n1) Wake up,true\n"2) Do yoga,\nthen shower",0\n3) Make breakfast,\n'.encode()
+
+        response = self.client.post('/api/todo_lists/import/', content, content_type='text/csv; charset=utf-8')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual(
+            self.imported(),
+            [('1) Wake up', True), ('2) Do yoga,\nthen shower', False), ('3) Make breakfast', False)],
+        )
+
+    def test_import_file(self):
+        file = SimpleUploadedFile('todo_list.csv', b'text\n1) Wake up\n2) Do yoga\n', content_type='text/csv')
+
+        response = self.client.post('/api/todo_lists/import/', {'file': file}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.imported(), [('1) Wake up', False), ('2) Do yoga', False)])
+
+    def test_import_csv_not_utf8(self):
+        content = 'text\n1) Wake up\n"2) Café,\nthen shower"\n3) Make breakfast\n'.encode('latin-1')
+
+        response = self.client.post('/api/todo_lists/import/', content, content_type='text/csv')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {
+            'rows': 3,
+            'created': 2,
+            'errors_count': 1,
+            'errors': [{'row': 2, 'errors': {'non_field_errors': ['Invalid data. Expected UTF-8 text.']}}],
+        })
+        self.assertEqual(self.imported(), [('1) Wake up', False), ('3) Make breakfast', False)])
+
+    def test_import_row_errors(self):
+        content = (
+            '{"text": "1) Wake up"}\n'
+            'not json\n'
+            '{"is_finished": true}\n'
+            '{"text": "%s"}\n'
+            '{"text": "2) Do yoga", "is_finished": "maybe"}\n'
+            '{"text": "3) Make breakfast"}\n' % ('x' * 1001)
+        ).encode()
+
+        response = self.client.post('/api/todo_lists/import/', content, content_type='application/x-ndjson')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['rows'], 6)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['errors_count'], 4)
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 3, 4, 5])
+        self.assertEqual(list(response.data['errors'][1]['errors']), ['text'])
+        self.assertEqual(list(response.data['errors'][3]['errors']), ['is_finished'])
+        self.assertEqual(self.imported(), [('1) Wake up', False), ('3) Make breakfast', False)])
+
+    def test_import_text_checked_like_api(self):
+        content = b'{"text": "  1) Wake up  "}\n{"text": " \\t "}\n'
+
+        response1 = self.client.post('/api/todo_lists/import/', content, content_type='application/x-ndjson')
+        response2 = self.client.post('/api/todo_lists/', {'text': ' \t '})
+
+        self.assertEqual(response1.data['created'], 1)
+        self.assertEqual(response1.data['errors'], [{'row': 2, 'errors': response2.json()}])
+        self.assertEqual(response2.json(), {'text': ['This field may not be blank.']})
+        self.assertEqual(self.imported(), [('1) Wake up', False)])
+
+    @override_settings(TODO_LIST_IMPORT={'BATCH_SIZE': 2, 'MAX_ERRORS': 1})
+    def test_import_in_batches(self):
+        content = ''.join('{"text": "Line %s"}\n' % i for i in range(5)).encode() + b'[]\n[]\n'
+
+        with mock.patch.object(
+            ToDoList.objects, 'bulk_create_lines', wraps=ToDoList.objects.bulk_create_lines,
+        ) as bulk_create_lines:
+            response = self.client.post('/api/todo_lists/import/', content, content_type='application/x-ndjson')
+
+        self.assertEqual([len(call.args[1]) for call in bulk_create_lines.call_args_list], [2, 2, 1])
+        self.assertEqual(response.data['created'], 5)
+        self.assertEqual(response.data['errors_count'], 2)
+        self.assertEqual(len(response.data['errors']), 1)
+
+    def test_import_unsupported_media_type(self):
+        response1 = self.client.post('/api/todo_lists/import/', b'text', content_type='text/plain')
+        response2 = self.client.post('/api/todo_lists/import/', {}, format='multipart')
+
+        self.assertEqual(response1.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        self.assertEqual(response2.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Query plan assertions are written for SQLite')
+class ToDoListQueryPlanTestCase(APITestCase):
+    """
+    Class for testing that filtered todo list pages are read with an index range scan and without a sort
+    """
+    def setUp(self):
+        self.organization = Organization.objects.create(name='Test Company 1')
+        other_organization = Organization.objects.create(name='Test Company 2')
+
+        ToDoList.objects.bulk_create(
+            ToDoList(organization=organization, text='Line %s' % i, is_finished=i % 3 == 0)
+            for organization in (self.organization, other_organization)
+            for i in range(300)
+        )
+
+        data = {
+            "email": "simple@email.com",
+            "organization": "Test Company 1",
+            "password": "foo"
+        }
+
+        self.client.post('/api/register/', data)
+        self.client.post('/api/login/', data)
+
+    def get_query_plan(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        sql = [query['sql'] for query in context.captured_queries if 'FROM "todo_lists_todolist"' in query['sql']]
+        self.assertEqual(len(sql), 1)
+
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql[0])
+            return ' '.join(str(row[-1]) for row in cursor.fetchall())
+
+    def test_open_lines_use_composite_index(self):
+        for url in ('/api/todo_lists/?is_finished=false', '/api/todo_lists/?is_finished=true&ordering=-id'):
+            plan = self.get_query_plan(url)
+
+            self.assertIn('todo_list_org_finished_id_idx', plan)
+            self.assertIn('organization_id=? AND is_finished=?', plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_next_page_uses_composite_index(self):
+        response = self.client.get('/api/todo_lists/?is_finished=false&page_size=10')
+
+        plan = self.get_query_plan(response.json()['next'])
+
+        self.assertIn('todo_list_org_finished_id_idx', plan)
+        self.assertIn('organization_id=? AND is_finished=? AND id>?', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_search_uses_full_text_index(self):
+        plan = self.get_query_plan('/api/todo_lists/?search=line 7')
+
+        self.assertIn('todo_lists_todolist_fts VIRTUAL TABLE INDEX', plan)
+        self.assertIn('todo_lists_todolist USING INTEGER PRIMARY KEY', plan)
+
+
+class ToDoListBulkViewTestCase(APITestCase):
+    """
+    Class for testing batched ToDoList creates, updates and deletes
+    """
+    def setUp(self):
+        self.organization1 = Organization.objects.create(name='Test Company 1')
+        self.organization2 = Organization.objects.create(name='Test Company 2')
+
+        self.todo_list_line1 = ToDoList.objects.create(organization=self.organization1, text='1) Wake up')
+        self.todo_list_line2 = ToDoList.objects.create(organization=self.organization1, text='2) Do yoga')
+        self.todo_list_line3 = ToDoList.objects.create(organization=self.organization2, text='Do nothing')
+
+        data = {
+            "email": "simple@email.com",
+            "organization": "Test Company 1",
+            "password": "foo"
+        }
+
+        self.client.post('/api/register/', data)
+        self.client.post('/api/login/', data)
+
+    def test_bulk(self):
+        data = {
+            'create': [{'text': '3) Make breakfast'}, {'text': '4) Go to work', 'is_finished': True}],
+            'update': [
+                {'id': self.todo_list_line1.id, 'is_finished': True},
+                {'id': self.todo_list_line3.id, 'is_finished': True},
+            ],
+            'delete': [self.todo_list_line2.id],
+        }
+
+        response = self.client.post('/api/todo_lists/bulk/', data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        created = response.json()['create']
+        self.assertEqual([line['text'] for line in created], ['3) Make breakfast', '4) Go to work'])
+        for line in created:
+            self.assertEqual(ToDoList.objects.get(id=line['id']).organization, self.organization1)
+            self.assertEqual(ToDoList.objects.get(id=line['id']).is_finished, line['is_finished'])
+
+        self.assertEqual(response.json()['update'], [
+            {'id': self.todo_list_line1.id, 'text': '1) Wake up', 'is_finished': True},
+            {'id': self.todo_list_line3.id, 'error': 'Not found.'},
+        ])
+        self.assertEqual(response.json()['delete'], [{'id': self.todo_list_line2.id, 'deleted': True}])
+
+        self.assertTrue(ToDoList.objects.get(id=self.todo_list_line1.id).is_finished)
+        self.assertFalse(ToDoList.objects.filter(id=self.todo_list_line2.id).exists())
+        self.assertFalse(ToDoList.objects.get(id=self.todo_list_line3.id).is_finished)
+
+    def test_bulk_delete_from_another_organization(self):
+        data = {'delete': [self.todo_list_line1.id, self.todo_list_line3.id]}
+
+        response = self.client.post('/api/todo_lists/bulk/', data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['delete'], [
+            {'id': self.todo_list_line1.id, 'deleted': True},
+            {'id': self.todo_list_line3.id, 'error': 'Not found.'},
+        ])
+        self.assertTrue(ToDoList.objects.filter(id=self.todo_list_line3.id).exists())
+
+    def test_bulk_invalid_item(self):
+        data = {
+            'create': [{'text': '3) Make breakfast'}, {'is_finished': True}],
+            'delete': [self.todo_list_line1.id],
+        }
+
+        response = self.client.post('/api/todo_lists/bulk/', data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(ToDoList.objects.filter(organization=self.organization1).count(), 2)
+
+    def test_bulk_update_and_delete_same_line(self):
+        data = {
+            'update': [{'id': self.todo_list_line1.id, 'is_finished': True}],
+            'delete': [self.todo_list_line1.id],
+        }
+
+        response = self.client.post('/api/todo_lists/bulk/', data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_ids_out_of_range(self):
+        for line_id in [0, 2 ** 63, 10 ** 25]:
+            for data in [{'update': [{'id': line_id, 'is_finished': True}]}, {'delete': [line_id]}]:
+                response = self.client.post('/api/todo_lists/bulk/', data, format='json')
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_update_without_fields(self):
+        data = {
+            'update': [{'id': self.todo_list_line1.id, 'is_finished': True}, {'id': self.todo_list_line1.id}],
+        }
+
+        response = self.client.post('/api/todo_lists/bulk/', data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), {'update': [{}, {'non_field_errors': ['No fields to update.']}]})
+        self.assertFalse(ToDoList.objects.get(id=self.todo_list_line1.id).is_finished)
+
+
+class InstrumentationTestCase(APITestCase):
+    """
+    Class for testing Server-Timing headers, the metrics endpoint and query budgets
+    """
+    def setUp(self):
+        registry.reset()
+
+        organization = Organization.objects.create(name='Test Company')
+        ToDoList.objects.create(organization=organization, text='1) Wake up')
+
+        data = {
+            "email": "simple@email.com",
+            "organization": "Test Company",
+            "password": "foo"
+        }
+
+        self.client.post('/api/register/', data)
+        self.client.post('/api/login/', data)
+
+    def test_server_timing(self):
+        response = self.client.get('/api/todo_lists/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        timings = dict(part.split(';', 1) for part in response['Server-Timing'].split(', '))
+        self.assertEqual(list(timings), ['db', 'serializer', 'total'])
+        self.assertRegex(timings['db'], r'^dur=[\d.]+;desc="[1-9]\d* queries"$')
+
+    @override_settings(API_METRICS=dict(settings.API_METRICS, TOKEN='secret'))
+    def test_metrics(self):
+        self.client.get('/api/todo_lists/')
+        self.client.get('/api/todo_lists/')
+
+        response = self.client.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer secret')
+        content = response.content.decode()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn('# TYPE api_request_duration_seconds histogram', content)
+        self.assertIn('api_request_queries_count{view="todo_lists-list",method="GET"} 2', content)
+        self.assertIn('api_request_serializer_duration_seconds_bucket{view="todo_lists-list",method="GET",le="+Inf"} 2', content)
+        self.assertIn('api_response_cache_hits_total ', content)
+
+    def test_metrics_not_public(self):
+        response1 = self.client.get('/api/metrics/')
+        response2 = self.client.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer ')
+
+        CustomUser.objects.filter(email='simple@email.com').update(is_staff=True)
+        response3 = self.client.get('/api/metrics/')
+
+        self.client.logout()
+        response4 = self.client.get('/api/metrics/')
+
+        self.assertEqual(response1.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response2.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response3.status_code, status.HTTP_200_OK)
+        self.assertEqual(response4.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_query_budget(self):
+        budget = {'ENABLED': True, 'SERVER_TIMING': True, 'QUERY_BUDGET': 1, 'QUERY_BUDGET_ACTION': 'raise'}
+
+        with override_settings(API_METRICS=budget):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get('/api/todo_lists/')
+
+        with override_settings(API_METRICS=dict(budget, QUERY_BUDGET_ACTION='log')):
+            with self.assertLogs('api.middleware', 'WARNING') as logs:
+                response = self.client.get('/api/organizations/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('GET /api/organizations/ (organization-list) made', logs.output[0])
+
+    def test_query_budget_of_action(self):
+        budget = {'ENABLED': True, 'SERVER_TIMING': True, 'QUERY_BUDGET': 0, 'QUERY_BUDGET_ACTION': 'raise'}
+
+        with override_settings(API_METRICS=budget):
+            response = self.client.post('/api/todo_lists/import/', b'{"text": "2) Do yoga"}\n', content_type='application/x-ndjson')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
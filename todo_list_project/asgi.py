@@ -2,6 +2,7 @@
 ASGI config for todo_list_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The API is served by api.asgi.AsyncAPIHandler, set ASYNC_API_ENABLED=0 to use Django's handler for everything.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.0/howto/deployment/asgi/
@@ -9,8 +10,17 @@ https://docs.djangoproject.com/en/3.0/howto/deployment/asgi/
 
 import os
 
+import django
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'todo_list_project.settings')
 
-application = get_asgi_application()
+django.setup(set_prefix=False)
+
+if settings.ASYNC_API['ENABLED']:
+    from api.asgi import AsyncAPIHandler
+
+    application = AsyncAPIHandler()
+else:
+    application = get_asgi_application()
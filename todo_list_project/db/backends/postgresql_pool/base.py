@@ -0,0 +1,121 @@
+import threading
+
+from django.db import OperationalError
+from django.db.backends.postgresql import base, creation
+from psycopg2 import pool
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of psycopg2 connections, callers wait up to timeout seconds for a free connection
+    """
+    def __init__(self, min_size, max_size, timeout, conn_params):
+        self.timeout = timeout
+        self._pool = pool.ThreadedConnectionPool(min_size, max_size, **conn_params)
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    def getconn(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise OperationalError('No free database connection in the pool after %s seconds' % self.timeout)
+
+        try:
+            return self._pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, connection):
+        """
+        Return the connection to the pool, psycopg2 rolls back an open transaction and discards
+        a connection that is closed or in an unknown state
+        """
+        try:
+            self._pool.putconn(connection, close=connection.closed != 0)
+        finally:
+            self._slots.release()
+
+    def closeall(self):
+        self._pool.closeall()
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # PostgreSQL does not drop a database with open connections
+        DatabaseWrapper.close_pools(test_database_name)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL backend taking connections from a process-wide pool per database instead of
+    opening one per thread. Django "closes" the connection at the end of every request (CONN_MAX_AGE = 0),
+    which returns it to the pool, so a few connections serve all the request threads.
+
+    OPTIONS pool_min_size, pool_max_size and pool_timeout configure the pool
+    """
+    creation_class = DatabaseCreation
+
+    pools = {}
+    pools_lock = threading.Lock()
+
+    pool_options = {'pool_min_size': 1, 'pool_max_size': 20, 'pool_timeout': 10}
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        for option in self.pool_options:
+            conn_params.pop(option, None)
+
+        return conn_params
+
+    @classmethod
+    def close_pools(cls, database):
+        """
+        Close every pooled connection to the given database
+        """
+        with cls.pools_lock:
+            for key, connection_pool in list(cls.pools.items()):
+                if dict(key)['database'] == database:
+                    connection_pool.closeall()
+                    del cls.pools[key]
+
+    def get_pool(self, conn_params):
+        """
+        Return the pool for the connection parameters, the test database gets a pool of its own
+        """
+        key = tuple(sorted(conn_params.items()))
+
+        with self.pools_lock:
+            connection_pool = self.pools.get(key)
+            if connection_pool is None:
+                options = {
+                    option: self.settings_dict['OPTIONS'].get(option, default)
+                    for option, default in self.pool_options.items()
+                }
+                connection_pool = ConnectionPool(
+                    options['pool_min_size'], options['pool_max_size'], options['pool_timeout'], conn_params,
+                )
+                self.pools[key] = connection_pool
+
+            return connection_pool
+
+    def get_new_connection(self, conn_params):
+        self.connection_pool = self.get_pool(conn_params)
+        connection = self.connection_pool.getconn()
+
+        # Pooled connections are handed out idle (psycopg2 rolls back on putconn), the isolation level
+        # is set the same way as for a new connection
+        options = self.settings_dict['OPTIONS']
+        try:
+            self.isolation_level = options['isolation_level']
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.connection_pool.putconn(self.connection)
@@ -0,0 +1,39 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+# Set by api.routing.ReplicaReadMixin for the duration of a read-only request
+read_from_replica = ContextVar('read_from_replica', default=False)
+
+
+class PrimaryReplicaRouter:
+    """
+    Database router sending reads to a random alias of settings.DATABASE_REPLICAS while
+    read_from_replica is set and everything else to the primary (default) database.
+    Reads inside a transaction of the primary stay on the primary to see its own writes
+    """
+    def db_for_read(self, model, **hints):
+        if (
+            read_from_replica.get()
+            and settings.DATABASE_REPLICAS
+            and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return random.choice(settings.DATABASE_REPLICAS)
+
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+
+        return None
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """
+    Apply settings.SQLITE_TUNING['PRAGMAS'] to a new SQLite connection when the tuning is enabled.
+    journal_mode is stored in the database file, so it is left alone on read-only connections
+    """
+    if connection.vendor != 'sqlite' or not settings.SQLITE_TUNING['ENABLED']:
+        return
+
+    read_only = 'mode=ro' in str(connection.settings_dict['NAME'])
+
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_TUNING['PRAGMAS'].items():
+            if name == 'journal_mode' and read_only:
+                continue
+
+            cursor.execute('PRAGMA %s = %s' % (name, value))
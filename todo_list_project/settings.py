@@ -11,6 +11,9 @@ https://docs.djangoproject.com/en/3.0/ref/settings/
 """
 
 import os
+import sys
+from importlib.util import find_spec
+from pathlib import Path
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -30,6 +33,14 @@ ALLOWED_HOSTS = ['*']
 
 # Application definition
 
+# SETTINGS_PROFILE=api is meant for nodes serving only the API: the admin, messages, static files, templates
+# and the browsable API are left out, so workers import and set up less and start faster.
+# The CSRF middleware stays: it sets the csrftoken cookie on login, which DRF checks on writes of session clients.
+# python -m benchmarks.startup compares the startup of both profiles
+
+SETTINGS_PROFILE = os.environ.get('SETTINGS_PROFILE', 'full')
+API_ONLY = SETTINGS_PROFILE == 'api'
+
 INSTALLED_APPS = [
     'django.contrib.admin',
     'django.contrib.auth',
@@ -41,9 +52,11 @@ INSTALLED_APPS = [
     'api',
     'users',
     'todo_lists',
+    'jobs',
 ]
 
 MIDDLEWARE = [
+    'api.middleware.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -71,24 +84,284 @@ TEMPLATES = [
     },
 ]
 
+if API_ONLY:
+    INSTALLED_APPS = [
+        app for app in INSTALLED_APPS
+        if app not in ('django.contrib.admin', 'django.contrib.messages', 'django.contrib.staticfiles')
+    ]
+    MIDDLEWARE = [
+        middleware for middleware in MIDDLEWARE
+        if middleware not in (
+            'django.contrib.messages.middleware.MessageMiddleware',
+            'django.middleware.clickjacking.XFrameOptionsMiddleware',
+        )
+    ]
+    TEMPLATES = []
+
 AUTH_USER_MODEL = 'users.CustomUser'
 
 WSGI_APPLICATION = 'todo_list_project.wsgi.application'
 
 REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'api.authentication.SignedTokenAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'EXCEPTION_HANDLER': 'api.throttling.exception_handler',
+    # Proxies in front of the app whose X-Forwarded-For is trusted, client IPs are REMOTE_ADDR when unset
+    'NUM_PROXIES': int(os.environ['API_NUM_PROXIES']) if os.environ.get('API_NUM_PROXIES') else None,
+}
+
+if API_ONLY:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = ['api.renderers.FastJSONRenderer']
+
+# Lifetime in seconds of the tokens issued by /api/token/, see api.authentication.SignedTokenAuthentication
+
+SIGNED_TOKEN = {
+    'MAX_AGE': int(os.environ.get('SIGNED_TOKEN_MAX_AGE', 3600)),
+}
+
+# Keyset pagination of ToDoListViewSet.list, clients may request up to MAX_PAGE_SIZE rows with ?page_size=
+
+TODO_LIST_PAGINATION = {
+    'PAGE_SIZE': int(os.environ.get('TODO_LIST_PAGE_SIZE', 100)),
+    'MAX_PAGE_SIZE': int(os.environ.get('TODO_LIST_MAX_PAGE_SIZE', 1000)),
+    # Search results are paginated with ?offset=, see api.pagination.ToDoListSearchPagination
+    'MAX_SEARCH_OFFSET': int(os.environ.get('TODO_LIST_MAX_SEARCH_OFFSET', 10000)),
+}
+
+# Maximum number of creates, updates and deletes in one request to /api/todo_lists/bulk/
+
+TODO_LIST_BULK_MAX_ITEMS = int(os.environ.get('TODO_LIST_BULK_MAX_ITEMS', 1000))
+
+# JSON list and retrieve responses of /api/todo_lists/ are built from .values() rows instead of the serializer,
+# see api.fast_read.ValuesReadMixin
+
+TODO_LIST_FAST_READ = os.environ.get('TODO_LIST_FAST_READ', '1') == '1'
+
+# Rows fetched from the database and encoded per chunk by /api/todo_lists/export/
+
+TODO_LIST_EXPORT_CHUNK_SIZE = int(os.environ.get('TODO_LIST_EXPORT_CHUNK_SIZE', 2000))
+
+# Rows validated and inserted per transaction and row errors reported by /api/todo_lists/import/
+# and manage.py import_todos
+
+TODO_LIST_IMPORT = {
+    'BATCH_SIZE': int(os.environ.get('TODO_LIST_IMPORT_BATCH_SIZE', 1000)),
+    'MAX_ERRORS': int(os.environ.get('TODO_LIST_IMPORT_MAX_ERRORS', 100)),
+}
+
+# Organizations purged through /api/organizations/{id}/purge/ and manage.py purge_organization (see todo_lists.purge):
+# rows deleted per transaction, seconds to sleep between batches, seconds without progress after which a running
+# purge counts as interrupted, and whether the API queues purges as jobs or runs them within the request
+
+TODO_LIST_PURGE = {
+    'BATCH_SIZE': int(os.environ.get('TODO_LIST_PURGE_BATCH_SIZE', 1000)),
+    'PAUSE': float(os.environ.get('TODO_LIST_PURGE_PAUSE', 0)),
+    'STALE_AFTER': int(os.environ.get('TODO_LIST_PURGE_STALE_AFTER', 300)),
+    'BACKGROUND': os.environ.get('TODO_LIST_PURGE_BACKGROUND', '1') == '1',
+}
+
+# Job queue in the database, run by manage.py run_workers (see jobs): worker processes, seconds a job is hidden
+# from other workers once taken (long jobs extend it), attempts per job, first retry delay (doubled by every retry),
+# seconds between polls of an idle worker and the directory of the files made by jobs (exports)
+
+JOBS = {
+    'CONCURRENCY': int(os.environ.get('JOBS_CONCURRENCY', 2)),
+    'VISIBILITY_TIMEOUT': int(os.environ.get('JOBS_VISIBILITY_TIMEOUT', 300)),
+    'MAX_ATTEMPTS': int(os.environ.get('JOBS_MAX_ATTEMPTS', 3)),
+    'RETRY_DELAY': int(os.environ.get('JOBS_RETRY_DELAY', 10)),
+    'POLL_INTERVAL': float(os.environ.get('JOBS_POLL_INTERVAL', 1)),
+    'FILES_DIR': os.environ.get('JOBS_FILES_DIR', os.path.join(BASE_DIR, 'job_files')),
+}
+
+# Per-view SQL query count, SQL time, serializer time and latency (see api.middleware.InstrumentationMiddleware),
+# served in Server-Timing headers and at /api/metrics/ (to staff users or with "Authorization: Bearer <TOKEN>").
+# Requests over the query budget are logged, with API_QUERY_BUDGET_ACTION=raise (the default in tests) they fail
+
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+
+API_METRICS = {
+    'ENABLED': os.environ.get('API_METRICS_ENABLED', '1') == '1',
+    'SERVER_TIMING': os.environ.get('API_SERVER_TIMING', '1') == '1',
+    'QUERY_BUDGET': int(os.environ.get('API_QUERY_BUDGET', 20)),
+    'QUERY_BUDGET_ACTION': os.environ.get('API_QUERY_BUDGET_ACTION', 'raise' if TESTING else 'log'),
+    'TOKEN': os.environ.get('API_METRICS_TOKEN', ''),
 }
 
 # Database
 # https://docs.djangoproject.com/en/3.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
+# DATABASE_PROFILE=sqlite (default) uses the local file, DATABASE_PROFILE=postgresql the DATABASE_* variables.
+# Connections are kept open for DATABASE_CONN_MAX_AGE seconds, with DATABASE_POOL=1 they are instead
+# returned to an in-process pool (see todo_list_project.db.backends.postgresql_pool) at the end of a request.
+# DATABASE_REPLICA_HOSTS is a comma separated list of read replicas used for list/retrieve requests
+# (see todo_list_project.db.routers), in tests the replicas mirror the default database
+
+DATABASE_PROFILE = os.environ.get('DATABASE_PROFILE', 'sqlite')
+
+if DATABASE_PROFILE == 'postgresql':
+    DATABASE_POOL = os.environ.get('DATABASE_POOL', '0') == '1'
+
+    DATABASES = {
+        'default': {
+            'ENGINE': (
+                'todo_list_project.db.backends.postgresql_pool' if DATABASE_POOL else 'django.db.backends.postgresql'
+            ),
+            'NAME': os.environ.get('DATABASE_NAME', 'todo_list'),
+            'USER': os.environ.get('DATABASE_USER', 'todo_list'),
+            'PASSWORD': os.environ.get('DATABASE_PASSWORD', ''),
+            'HOST': os.environ.get('DATABASE_HOST', 'localhost'),
+            'PORT': os.environ.get('DATABASE_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.environ.get('DATABASE_CONN_MAX_AGE', 0 if DATABASE_POOL else 60)),
+            'OPTIONS': {
+                'connect_timeout': int(os.environ.get('DATABASE_CONNECT_TIMEOUT', 5)),
+            },
+        }
+    }
+
+    if DATABASE_POOL:
+        DATABASES['default']['OPTIONS'].update({
+            'pool_min_size': int(os.environ.get('DATABASE_POOL_MIN_SIZE', 2)),
+            'pool_max_size': int(os.environ.get('DATABASE_POOL_MAX_SIZE', 20)),
+            'pool_timeout': float(os.environ.get('DATABASE_POOL_TIMEOUT', 10)),
+        })
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DATABASE_NAME', os.path.join(BASE_DIR, 'todo_list_project', 'db.sqlite3')),
+        }
+    }
+
+DATABASE_REPLICAS = []
+
+# SQLITE_TUNING=1 applies the PRAGMAs below to every SQLite connection (see todo_list_project.db.sqlite):
+# WAL lets readers run alongside the writer and busy_timeout makes writers wait for the lock instead of failing.
+# SQLITE_READ_ONLY_ALIAS=1 adds a read-only connection to the same file used as a read replica
+
+SQLITE_TUNING = {
+    'ENABLED': os.environ.get('SQLITE_TUNING', '0') == '1',
+    'PRAGMAS': {
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        # Negative sizes are in KiB
+        'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -64000)),
+        'temp_store': 'MEMORY',
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),
+    },
+}
+
+if DATABASE_PROFILE != 'postgresql' and os.environ.get('SQLITE_READ_ONLY_ALIAS', '0') == '1':
+    DATABASES['readonly'] = {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'todo_list_project', 'db.sqlite3'),
+        'NAME': Path(DATABASES['default']['NAME']).resolve().as_uri() + '?mode=ro',
+        'OPTIONS': {'uri': True},
+        'TEST': {'MIRROR': 'default'},
     }
+    DATABASE_REPLICAS.append('readonly')
+
+for number, host in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_HOSTS', '').split(',')), start=1):
+    alias = 'replica%s' % number
+    DATABASES[alias] = dict(DATABASES['default'], HOST=host.strip(), TEST={'MIRROR': 'default'})
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['todo_list_project.db.routers.PrimaryReplicaRouter']
+
+
+# ASGI serving of the API paths without a thread per connection, see api.asgi.AsyncAPIHandler
+
+ASYNC_API = {
+    'ENABLED': os.environ.get('ASYNC_API_ENABLED', '1') == '1',
+    'PREFIX': '/api/',
+    'WORKERS': int(os.environ.get('ASYNC_API_WORKERS', 32)),
+}
+
+# Server-sent events of todo list changes at /api/todo_lists/events/ (ASGI only, see api.events): events queued
+# per client, clients per process, lines per event before clients are sent to the change feed
+# and the seconds between keep-alive comments
+
+TODO_LIST_EVENTS = {
+    'ENABLED': os.environ.get('TODO_LIST_EVENTS_ENABLED', '1') == '1',
+    'BROKER': os.environ.get('TODO_LIST_EVENTS_BROKER', 'api.events.InProcessBroker'),
+    'QUEUE_SIZE': int(os.environ.get('TODO_LIST_EVENTS_QUEUE_SIZE', 100)),
+    'MAX_SUBSCRIPTIONS': int(os.environ.get('TODO_LIST_EVENTS_MAX_SUBSCRIPTIONS', 10000)),
+    'MAX_CHANGES': int(os.environ.get('TODO_LIST_EVENTS_MAX_CHANGES', 100)),
+    'KEEPALIVE': float(os.environ.get('TODO_LIST_EVENTS_KEEPALIVE', 15)),
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+# Cache of ToDoList list and retrieve payloads per organization, see api.cache
+
+TODO_LIST_CACHE = {
+    'ENABLED': os.environ.get('TODO_LIST_CACHE_ENABLED', '1') == '1',
+    'ALIAS': 'default',
+    'TIMEOUT': int(os.environ.get('TODO_LIST_CACHE_TIMEOUT', 300)),
+}
+
+
+# Password hashing
+# PASSWORD_HASHING_ALGORITHM picks the hasher of new and upgraded hashes (argon2, bcrypt_sha256 or pbkdf2_sha256),
+# argon2 and bcrypt fall back to pbkdf2_sha256 when their library is not installed.
+# Hashes made with another algorithm or cost are upgraded on the next successful login.
+# Hashing runs in a pool of WORKERS threads with at most QUEUE_SIZE more hashes waiting, further password checks
+# are refused with 503, see users.hashers
+
+PASSWORD_HASHING = {
+    'ALGORITHM': os.environ.get('PASSWORD_HASHING_ALGORITHM', 'pbkdf2_sha256'),
+    'PBKDF2_ITERATIONS': int(os.environ.get('PASSWORD_HASHING_PBKDF2_ITERATIONS', 180000)),
+    'ARGON2_TIME_COST': int(os.environ.get('PASSWORD_HASHING_ARGON2_TIME_COST', 2)),
+    'ARGON2_MEMORY_COST': int(os.environ.get('PASSWORD_HASHING_ARGON2_MEMORY_COST', 512)),
+    'ARGON2_PARALLELISM': int(os.environ.get('PASSWORD_HASHING_ARGON2_PARALLELISM', 2)),
+    'BCRYPT_ROUNDS': int(os.environ.get('PASSWORD_HASHING_BCRYPT_ROUNDS', 12)),
+    'WORKERS': int(os.environ.get('PASSWORD_HASHING_WORKERS', os.cpu_count() or 1)),
+    'QUEUE_SIZE': int(os.environ.get('PASSWORD_HASHING_QUEUE_SIZE', 64)),
+}
+
+_PASSWORD_HASHERS = {
+    'pbkdf2_sha256': ('users.hashers.PBKDF2PasswordHasher', 'hashlib'),
+    'argon2': ('users.hashers.Argon2PasswordHasher', 'argon2'),
+    'bcrypt_sha256': ('users.hashers.BCryptSHA256PasswordHasher', 'bcrypt'),
+}
+
+if find_spec(_PASSWORD_HASHERS[PASSWORD_HASHING['ALGORITHM']][1]) is None:
+    PASSWORD_HASHING['ALGORITHM'] = 'pbkdf2_sha256'
+
+# The first hasher is the preferred one, the others only verify existing hashes
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASHING['ALGORITHM']][0]] + [
+    hasher for algorithm, (hasher, library) in _PASSWORD_HASHERS.items() if algorithm != PASSWORD_HASHING['ALGORITHM']
+] + ['django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher']
+
+
+# Token buckets of registration, login and token attempts per client IP and per (email, organization), see
+# api.throttling (behind proxies set API_NUM_PROXIES, see REST_FRAMEWORK['NUM_PROXIES']): a bucket holds up to
+# *_BURST attempts and refills at *_PER_MINUTE. The default store keeps at most MAX_KEYS buckets in the process.
+# RETRY_AFTER is sent with the 503 of password checks refused by the hasher pool
+
+AUTH_THROTTLE = {
+    'ENABLED': os.environ.get('AUTH_THROTTLE_ENABLED', '1') == '1',
+    'STORE': os.environ.get('AUTH_THROTTLE_STORE', 'api.throttling.InMemoryBucketStore'),
+    'IP_BURST': int(os.environ.get('AUTH_THROTTLE_IP_BURST', 30)),
+    'IP_PER_MINUTE': float(os.environ.get('AUTH_THROTTLE_IP_PER_MINUTE', 30)),
+    'CREDENTIALS_BURST': int(os.environ.get('AUTH_THROTTLE_CREDENTIALS_BURST', 10)),
+    'CREDENTIALS_PER_MINUTE': float(os.environ.get('AUTH_THROTTLE_CREDENTIALS_PER_MINUTE', 5)),
+    'MAX_KEYS': int(os.environ.get('AUTH_THROTTLE_MAX_KEYS', 100000)),
+    'RETRY_AFTER': int(os.environ.get('AUTH_THROTTLE_RETRY_AFTER', 1)),
 }
 
 
@@ -133,3 +406,10 @@ STATIC_URL = '/static/'
 AUTHENTICATION_BACKENDS = {
     'users.backends.CustomBackend',
 }
+
+# Optional process-local LRU of recent successful credential lookups (disabled when MAX_SIZE is 0)
+
+AUTH_USER_CACHE = {
+    'MAX_SIZE': int(os.environ.get('AUTH_USER_CACHE_SIZE', 0)),
+    'TTL': int(os.environ.get('AUTH_USER_CACHE_TTL', 60)),
+}
@@ -0,0 +1 @@
+default_app_config = 'todo_lists.apps.TodoListsConfig'
@@ -1,7 +1,26 @@
+from collections import defaultdict
+
 from django.contrib import admin
+from django.db import router, transaction
 
 from .models import ToDoList, Organization
 
 
-admin.site.register(ToDoList)
+class ToDoListAdmin(admin.ModelAdmin):
+    def delete_queryset(self, request, queryset):
+        """
+        "Delete selected" deletes the lines with ToDoListManager.bulk_delete_lines, a QuerySet.delete would
+        leave no tombstones in the change feed and skip the stats and the cache invalidation
+        """
+        ids = defaultdict(list)
+        for organization_id, line_id in queryset.values_list('organization_id', 'id'):
+            ids[organization_id].append(line_id)
+
+        using = router.db_for_write(ToDoList)
+        with transaction.atomic(using=using):
+            for organization_id in sorted(ids):
+                ToDoList.objects.db_manager(using).bulk_delete_lines(organization_id, ids[organization_id])
+
+
+admin.site.register(ToDoList, ToDoListAdmin)
 admin.site.register(Organization)
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class TodoListsConfig(AppConfig):
     name = 'todo_lists'
+
+    def ready(self):
+        from . import receivers  # noqa: F401
@@ -0,0 +1,62 @@
+import threading
+
+from django.db import transaction
+
+
+class OrganizationIdCache:
+    """
+    Process-local mapping of organization names to ids.
+
+    Entries are dropped by Organization save/delete signals (see todo_lists.receivers) and the whole
+    mapping is cleared when the tables are flushed. Ids read inside a transaction are cached only after
+    it commits, so a rolled back organization never gets into the cache
+    """
+    def __init__(self):
+        self._ids = {}
+        self._lock = threading.Lock()
+
+    def get_id(self, name):
+        """
+        Return the id of the organization with the given name or None if it does not exist
+        """
+        organization_id = self._ids.get(name)
+        if organization_id is not None:
+            return organization_id
+
+        from .models import Organization
+
+        organization_id = Organization.objects.filter(name=name).values_list('id', flat=True).first()
+        if organization_id is not None:
+            self.remember(name, organization_id)
+
+        return organization_id
+
+    def get_cached_id(self, name):
+        """
+        Return the cached id of the organization with the given name without querying the database
+        """
+        return self._ids.get(name)
+
+    def remember(self, name, organization_id):
+        """
+        Cache an id read from the database once the current transaction (if any) commits
+        """
+        transaction.on_commit(lambda: self.set_id(name, organization_id))
+
+    def set_id(self, name, organization_id):
+        with self._lock:
+            self._ids[name] = organization_id
+
+    def invalidate(self, organization_id):
+        """
+        Drop every name pointing to the given organization id
+        """
+        with self._lock:
+            self._ids = {name: pk for name, pk in self._ids.items() if pk != organization_id}
+
+    def clear(self):
+        with self._lock:
+            self._ids = {}
+
+
+organization_ids = OrganizationIdCache()
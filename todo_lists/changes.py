@@ -0,0 +1,54 @@
+"""
+Change feed of organization todo lists.
+
+Every write of a line gives it the next change sequence number of its organization
+(ToDoList.sequence, see ToDoListManager.allocate_sequence) and every delete leaves a ToDoListTombstone
+with one, so the changes since a sequence number are read from the (organization, sequence) indexes
+and cost in proportion to the number of changes, not to the size of the list
+"""
+from .models import ToDoList, ToDoListTombstone
+
+
+FIELDS = ('id', 'text', 'is_finished')
+
+
+def read_changes(organization_id, since=0, limit=100):
+    """
+    Return up to limit changes of the organization with a sequence number above since as a dict of
+    since, token (the sequence number to pass as since of the next request), more (whether changes were left out),
+    changed (rows of created and updated lines) and deleted (ids of deleted lines).
+
+    A line recreated with the id of a deleted one is only in changed, so clients can apply deleted before changed
+    """
+    lines = list(
+        ToDoList.objects
+        .filter(organization_id=organization_id, sequence__gt=since)
+        .order_by('sequence')
+        .values('sequence', *FIELDS)[:limit + 1]
+    )
+    tombstones = list(
+        ToDoListTombstone.objects
+        .filter(organization_id=organization_id, sequence__gt=since)
+        .order_by('sequence')
+        .values_list('sequence', 'line_id')[:limit + 1]
+    )
+
+    changes = [(line.pop('sequence'), line, None) for line in lines]
+    changes += [(sequence, None, line_id) for sequence, line_id in tombstones]
+    changes.sort(key=lambda change: change[0])
+    more = len(changes) > limit
+    changes = changes[:limit]
+
+    changed = [line for _, line, _ in changes if line is not None]
+    changed_ids = {line['id'] for line in changed}
+    deleted = list(dict.fromkeys(
+        line_id for _, _, line_id in changes if line_id is not None and line_id not in changed_ids
+    ))
+
+    return {
+        'since': since,
+        'token': changes[-1][0] if changes else since,
+        'more': more,
+        'changed': changed,
+        'deleted': deleted,
+    }
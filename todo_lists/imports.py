@@ -0,0 +1,172 @@
+import codecs
+import csv
+import json
+
+from django.db import transaction
+
+from .models import ToDoList
+
+
+TEXT_MAX_LENGTH = ToDoList._meta.get_field('text').max_length
+
+TRUE_VALUES = {True, 1, 'true', 'True', 'TRUE', 't', 'T', 'yes', 'on', '1'}
+FALSE_VALUES = {False, 0, 'false', 'False', 'FALSE', 'f', 'F', 'no', 'off', '0', '', None}
+
+FORMATS = ('ndjson', 'csv')
+
+# Row of a CSV file read from bytes that are not UTF-8
+NOT_UTF8 = object()
+
+
+class ImportResult:
+    """
+    Counters and per-row errors of an import, at most max_errors errors are kept
+    """
+    def __init__(self, max_errors):
+        self.rows = 0
+        self.created = 0
+        self.errors_count = 0
+        self.errors = []
+        self.max_errors = max_errors
+
+    def add_error(self, row, errors):
+        self.errors_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'row': row, 'errors': errors})
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'errors_count': self.errors_count,
+            'errors': self.errors,
+        }
+
+
+def read_ndjson(lines):
+    """
+    Yield (row number, row) pairs of NDJSON byte lines, blank lines are skipped and
+    lines that are not a JSON object give None
+    """
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+
+        yield number, row if isinstance(row, dict) else None
+
+
+def read_csv(lines):
+    """
+    Yield (row number, row) pairs of UTF-8 CSV byte lines with a header row, the first data row is number 1.
+    Rows with bytes that are not UTF-8 give NOT_UTF8
+    """
+    invalid_lines = []
+
+    def decode(lines):
+        # A newline byte is never part of a multibyte UTF-8 sequence, so every line decodes on its own
+        for index, line in enumerate(lines):
+            if index == 0 and line.startswith(codecs.BOM_UTF8):
+                line = line[len(codecs.BOM_UTF8):]
+
+            try:
+                yield line.decode('utf-8')
+            except UnicodeDecodeError:
+                invalid_lines.append(index)
+                yield line.decode('utf-8', 'replace')
+
+    # The reader takes the lines of a row as it is read, so lines that failed to decode belong to the row just read
+    reader = csv.DictReader(decode(lines))
+
+    for number, row in enumerate(reader, start=1):
+        if invalid_lines:
+            invalid_lines.clear()
+            row = NOT_UTF8
+
+        yield number, row
+
+
+def validate_row(row):
+    """
+    Return (line, None) with the model fields of a valid row or (None, errors)
+    """
+    if row is None:
+        return None, {'non_field_errors': ['Invalid data. Expected a JSON object.']}
+    if row is NOT_UTF8:
+        return None, {'non_field_errors': ['Invalid data. Expected UTF-8 text.']}
+
+    errors = {}
+
+    # Stripped and checked like the text of the API serializer
+    text = row.get('text')
+    if isinstance(text, str):
+        text = text.strip()
+    if not isinstance(text, str):
+        errors['text'] = ['This field is required.']
+    elif not text:
+        errors['text'] = ['This field may not be blank.']
+    elif len(text) > TEXT_MAX_LENGTH:
+        errors['text'] = ['Ensure this field has no more than %s characters.' % TEXT_MAX_LENGTH]
+
+    is_finished = row.get('is_finished')
+    if isinstance(is_finished, str):
+        is_finished = is_finished.strip()
+    try:
+        if is_finished in TRUE_VALUES:
+            is_finished = True
+        elif is_finished in FALSE_VALUES:
+            is_finished = False
+        else:
+            errors['is_finished'] = ['Must be a valid boolean.']
+    except TypeError:
+        errors['is_finished'] = ['Must be a valid boolean.']
+
+    if errors:
+        return None, errors
+
+    return {'text': text, 'is_finished': is_finished}, None
+
+
+def import_lines(organization_id, lines, file_format, batch_size=1000, max_errors=100, progress=None):
+    """
+    Import ToDoList lines of an organization from an iterable of NDJSON or CSV byte lines.
+
+    The input is parsed incrementally, every batch of batch_size rows is validated with plain checks
+    (no serializer per row) and inserted with bulk_create in a transaction of its own, so memory
+    is bounded by the batch size and the rows imported so far stay imported if a later batch fails.
+    progress(result) is called after every batch
+    """
+    reader = read_ndjson if file_format == 'ndjson' else read_csv
+    result = ImportResult(max_errors)
+    batch = []
+
+    def flush(batch):
+        with transaction.atomic():
+            ToDoList.objects.bulk_create_lines(organization_id, batch, batch_size=batch_size)
+
+        result.created += len(batch)
+
+        if progress is not None:
+            progress(result)
+
+    for number, row in reader(lines):
+        result.rows += 1
+        line, errors = validate_row(row)
+
+        if errors:
+            result.add_error(number, errors)
+            continue
+
+        batch.append(line)
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+
+    if batch:
+        flush(batch)
+
+    return result
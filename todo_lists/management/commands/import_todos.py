@@ -0,0 +1,57 @@
+import contextlib
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from todo_lists.cache import organization_ids
+from todo_lists.imports import FORMATS, import_lines
+
+
+class Command(BaseCommand):
+    """
+    Command importing ToDoList lines of an organization from an NDJSON or CSV file
+    """
+    help = 'Imports todo list lines of an organization from an NDJSON or CSV file ("-" reads stdin)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('organization', help='name of the organization')
+        parser.add_argument('path', help='NDJSON or CSV file, "-" for stdin')
+        parser.add_argument('--format', choices=FORMATS, help='defaults to the file extension, ndjson for stdin')
+        parser.add_argument('--batch-size', type=int, default=settings.TODO_LIST_IMPORT['BATCH_SIZE'])
+        parser.add_argument('--max-errors', type=int, default=settings.TODO_LIST_IMPORT['MAX_ERRORS'])
+
+    def handle(self, organization, path, **options):
+        organization_id = organization_ids.get_id(organization)
+        if organization_id is None:
+            raise CommandError('Organization "%s" does not exist' % organization)
+
+        file_format = options['format']
+        if file_format is None:
+            file_format = 'csv' if path.lower().endswith('.csv') else 'ndjson'
+
+        def progress(result):
+            self.stdout.write('Imported %s of %s rows' % (result.created, result.rows))
+
+        # stdin is not closed, it belongs to the caller of the command
+        try:
+            opened = contextlib.nullcontext(sys.stdin.buffer) if path == '-' else open(path, 'rb')
+        except OSError as error:
+            raise CommandError(error)
+
+        with opened as file:
+            result = import_lines(
+                organization_id,
+                file,
+                file_format,
+                batch_size=options['batch_size'],
+                max_errors=options['max_errors'],
+                progress=progress if options['verbosity'] > 0 else None,
+            )
+
+        for error in result.errors:
+            self.stderr.write('Row %s: %s' % (error['row'], error['errors']))
+
+        self.stdout.write(self.style.SUCCESS(
+            'Created %s lines from %s rows, %s rows with errors' % (result.created, result.rows, result.errors_count)
+        ))
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from todo_lists.models import Organization, OrganizationPurge
+from todo_lists.purge import resumable, run_purge
+
+
+class Command(BaseCommand):
+    """
+    Command deleting organizations with all their data in batches, see todo_lists.purge.
+    It can be stopped at any time and run again with --resume, which continues every unfinished purge
+    """
+    help = 'Deletes the given organizations with their lines and users in batches, resumes unfinished purges'
+
+    def add_arguments(self, parser):
+        parser.add_argument('organizations', nargs='*', help='names of the organizations to purge')
+        parser.add_argument('--resume', action='store_true', help='also continue unfinished purges')
+        parser.add_argument('--batch-size', type=int, help='rows deleted per transaction')
+        parser.add_argument('--pause', type=float, help='seconds to sleep between batches')
+
+    def handle(self, organizations, **options):
+        if not organizations and not options['resume']:
+            raise CommandError('Give the names of the organizations to purge or --resume')
+
+        queryset = Organization.objects.filter(name__in=organizations)
+        missing = set(organizations) - set(queryset.values_list('name', flat=True))
+        if missing:
+            raise CommandError('Organizations do not exist: %s' % ', '.join(sorted(missing)))
+
+        purge_ids = [OrganizationPurge.objects.start(organization).id for organization in queryset.order_by('id')]
+
+        if options['resume']:
+            unfinished = OrganizationPurge.objects.filter(resumable()).exclude(id__in=purge_ids).order_by('id')
+            purge_ids += unfinished.values_list('id', flat=True)
+
+        def progress(purge):
+            if options['verbosity'] > 1:
+                self.stdout.write('%s: %s, deleted %s lines, %s tombstones, %s users' % (
+                    purge.organization_name, purge.step, purge.lines, purge.tombstones, purge.users,
+                ))
+
+        purged = 0
+        for purge_id in purge_ids:
+            if not run_purge(purge_id, batch_size=options['batch_size'], pause=options['pause'], progress=progress):
+                self.stderr.write('Purge %s is run by another process' % purge_id)
+                continue
+
+            purge = OrganizationPurge.objects.get(id=purge_id)
+            purged += 1
+            self.stdout.write('Purged %s: %s lines, %s tombstones, %s users' % (
+                purge.organization_name, purge.lines, purge.tombstones, purge.users,
+            ))
+
+        self.stdout.write(self.style.SUCCESS('Purged %s organizations' % purged))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from todo_lists.models import Organization, OrganizationStats
+
+
+class Command(BaseCommand):
+    """
+    Command rebuilding OrganizationStats from the lines, a chunk of organizations per transaction
+    """
+    help = 'Counts the todo list lines of every organization (or of the given ones) and fixes their stats'
+
+    def add_arguments(self, parser):
+        parser.add_argument('organizations', nargs='*', help='names of the organizations, all of them by default')
+        parser.add_argument('--chunk-size', type=int, default=100, help='organizations counted per transaction')
+
+    def handle(self, organizations, **options):
+        queryset = Organization.objects.order_by('id')
+
+        if organizations:
+            queryset = queryset.filter(name__in=organizations)
+            missing = set(organizations) - set(queryset.values_list('name', flat=True))
+            if missing:
+                raise CommandError('Organizations do not exist: %s' % ', '.join(sorted(missing)))
+
+        reconciled = fixed = last_id = 0
+        while True:
+            # Keyset chunks, so every chunk is read from the primary key index
+            organization_ids = list(queryset.filter(id__gt=last_id).values_list('id', flat=True)[:options['chunk_size']])
+            if not organization_ids:
+                break
+
+            with transaction.atomic():
+                fixed += OrganizationStats.objects.reconcile(organization_ids)
+
+            reconciled += len(organization_ids)
+            last_id = organization_ids[-1]
+
+            if options['verbosity'] > 1:
+                self.stdout.write('Reconciled %s organizations' % reconciled)
+
+        self.stdout.write(self.style.SUCCESS(
+            'Reconciled %s organizations, fixed the stats of %s' % (reconciled, fixed)
+        ))
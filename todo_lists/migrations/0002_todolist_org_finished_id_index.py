@@ -0,0 +1,17 @@
+# Generated by Django 3.0.7 on 2026-10-18 17:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo_lists', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='todolist',
+            index=models.Index(fields=['organization', 'is_finished', 'id'], name='todo_list_org_finished_id_idx'),
+        ),
+    ]
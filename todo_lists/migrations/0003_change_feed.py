@@ -0,0 +1,61 @@
+# Generated by Django 3.0.7 on 2026-10-18 17:49
+
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+import django.db.models.deletion
+
+
+def number_existing_lines(apps, schema_editor):
+    """
+    Existing lines get their id as the sequence number, unique within an organization,
+    and every organization continues from the highest one
+    """
+    Organization = apps.get_model('todo_lists', 'Organization')
+    ToDoList = apps.get_model('todo_lists', 'ToDoList')
+
+    ToDoList.objects.update(sequence=models.F('id'))
+    Organization.objects.filter(todo_list__isnull=False).update(change_sequence=Subquery(
+        ToDoList.objects.filter(organization=OuterRef('pk')).values('organization').annotate(last=Max('id')).values('last')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo_lists', '0002_todolist_org_finished_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ToDoListTombstone',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('line_id', models.IntegerField()),
+                ('sequence', models.BigIntegerField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='organization',
+            name='change_sequence',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='todolist',
+            name='sequence',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(number_existing_lines, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='todolist',
+            index=models.Index(fields=['organization', 'sequence'], name='todo_list_org_sequence_idx'),
+        ),
+        migrations.AddField(
+            model_name='todolisttombstone',
+            name='organization',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='todo_list_tombstones', to='todo_lists.Organization'),
+        ),
+        migrations.AddIndex(
+            model_name='todolisttombstone',
+            index=models.Index(fields=['organization', 'sequence'], name='todo_list_tombstone_seq_idx'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+from django.db import migrations
+
+
+SQLITE_FORWARD = [
+    # External content table: the index only, the text is read from todo_lists_todolist
+    "CREATE VIRTUAL TABLE todo_lists_todolist_fts USING fts5("
+    "text, organization_id, content='todo_lists_todolist', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    # The organization id only scopes the search, it does not count for the rank
+    "INSERT INTO todo_lists_todolist_fts(todo_lists_todolist_fts, rank) VALUES('rank', 'bm25(1.0, 0.0)')",
+    "INSERT INTO todo_lists_todolist_fts(todo_lists_todolist_fts) VALUES('rebuild')",
+    "CREATE TRIGGER todo_lists_todolist_fts_insert AFTER INSERT ON todo_lists_todolist BEGIN "
+    "INSERT INTO todo_lists_todolist_fts(rowid, text, organization_id) VALUES (new.id, new.text, new.organization_id); "
+    "END",
+    "CREATE TRIGGER todo_lists_todolist_fts_delete AFTER DELETE ON todo_lists_todolist BEGIN "
+    "INSERT INTO todo_lists_todolist_fts(todo_lists_todolist_fts, rowid, text, organization_id) "
+    "VALUES ('delete', old.id, old.text, old.organization_id); "
+    "END",
+    "CREATE TRIGGER todo_lists_todolist_fts_update AFTER UPDATE OF text, organization_id ON todo_lists_todolist BEGIN "
+    "INSERT INTO todo_lists_todolist_fts(todo_lists_todolist_fts, rowid, text, organization_id) "
+    "VALUES ('delete', old.id, old.text, old.organization_id); "
+    "INSERT INTO todo_lists_todolist_fts(rowid, text, organization_id) VALUES (new.id, new.text, new.organization_id); "
+    "END",
+]
+
+SQLITE_BACKWARD = [
+    'DROP TRIGGER todo_lists_todolist_fts_update',
+    'DROP TRIGGER todo_lists_todolist_fts_delete',
+    'DROP TRIGGER todo_lists_todolist_fts_insert',
+    'DROP TABLE todo_lists_todolist_fts',
+]
+
+POSTGRESQL_FORWARD = [
+    "CREATE INDEX todo_list_text_search_idx ON todo_lists_todolist USING GIN (to_tsvector('simple', text))",
+]
+
+POSTGRESQL_BACKWARD = [
+    'DROP INDEX todo_list_text_search_idx',
+]
+
+
+def run(statements):
+    """
+    Return a migration function running the statements of the database vendor, see todo_lists.search
+    """
+    def execute(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+
+    return execute
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo_lists', '0003_change_feed'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRESQL_FORWARD}),
+            run({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRESQL_BACKWARD}),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 3.0.7 on 2026-10-18 18:03
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+import django.db.models.deletion
+
+
+def count_lines(apps, schema_editor):
+    """
+    Stats of the existing organizations, manage.py reconcile_stats does the same in chunks
+    """
+    Organization = apps.get_model('todo_lists', 'Organization')
+    OrganizationStats = apps.get_model('todo_lists', 'OrganizationStats')
+    ToDoList = apps.get_model('todo_lists', 'ToDoList')
+
+    counts = {
+        row['organization_id']: row for row in
+        ToDoList.objects.order_by().values('organization_id').annotate(
+            total=Count('id'), finished=Count('id', filter=Q(is_finished=True)),
+        )
+    }
+    OrganizationStats.objects.bulk_create(
+        OrganizationStats(
+            organization_id=organization_id,
+            total=counts.get(organization_id, {}).get('total', 0),
+            finished=counts.get(organization_id, {}).get('finished', 0),
+        )
+        for organization_id in Organization.objects.values_list('id', flat=True).iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo_lists', '0004_todolist_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrganizationStats',
+            fields=[
+                ('organization', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='todo_lists.Organization')),
+                ('total', models.BigIntegerField(default=0)),
+                ('finished', models.BigIntegerField(default=0)),
+                ('modified_at', models.DateTimeField(null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'organization stats',
+            },
+        ),
+        migrations.RunPython(count_lines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 3.0.7 on 2026-10-18 18:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo_lists', '0005_organization_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrganizationPurge',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('organization_id', models.IntegerField()),
+                ('organization_name', models.CharField(max_length=100)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('failed', 'Failed'), ('finished', 'Finished')], default='pending', max_length=10)),
+                ('step', models.CharField(blank=True, max_length=20)),
+                ('lines', models.BigIntegerField(default=0)),
+                ('tombstones', models.BigIntegerField(default=0)),
+                ('users', models.BigIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='organizationpurge',
+            constraint=models.UniqueConstraint(condition=models.Q(_negated=True, status='finished'), fields=('organization_id',), name='todo_list_purge_org_active_uniq'),
+        ),
+    ]
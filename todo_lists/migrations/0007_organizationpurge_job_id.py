@@ -0,0 +1,18 @@
+# Generated by Django 3.0.7 on 2026-10-18 18:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo_lists', '0006_organization_purge'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='organizationpurge',
+            name='job_id',
+            field=models.IntegerField(null=True),
+        ),
+    ]
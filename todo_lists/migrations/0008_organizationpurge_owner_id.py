@@ -0,0 +1,18 @@
+# Generated by Django 3.0.7 on 2026-10-18 18:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo_lists', '0007_organizationpurge_job_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='organizationpurge',
+            name='owner_id',
+            field=models.IntegerField(null=True),
+        ),
+    ]
@@ -1,4 +1,9 @@
-from django.db import models
+from django.db import IntegrityError, connections, models, router, transaction
+from django.db.models import Count, F, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .signals import todo_list_changed
 
 
 class Organization(models.Model):
@@ -6,10 +11,201 @@ class Organization(models.Model):
     A table representing organizations
     """
     name = models.CharField(max_length=100, blank=False, unique=True)
+    # The last change sequence number given to a line or a tombstone of the organization
+    change_sequence = models.BigIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        """
+        Updates leave change_sequence alone, it is only changed by ToDoListManager.allocate_sequence
+        and the value loaded with the instance may be outdated
+        """
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'change_sequence'
+            ]
+
+        super().save(*args, **kwargs)
+
+
+class ToDoListManager(models.Manager):
+    """
+    ToDoList manager with set-based writes scoped to a single organization.
+    Every method is expected to be called inside a transaction and sends todo_list_changed.
+    Written lines get the next change sequence numbers of the organization, deleted lines leave tombstones
+    and the counters of OrganizationStats follow every write
+    """
+    def allocate_sequence(self, organization_id, count=1):
+        """
+        Reserve count change sequence numbers of the organization and return the last one.
+
+        The UPDATE locks the organization's row until the transaction ends, so changes of an organization
+        commit in the order of their sequence numbers and a client that has seen a sequence number
+        never misses a change committed later with a lower one. Writers take this lock before writing
+        any line, so concurrent writes of an organization do not deadlock
+        """
+        using = self._db or router.db_for_write(Organization)
+        connection = connections[using]
+
+        if connection.vendor == 'postgresql' or (
+                connection.vendor == 'sqlite' and connection.Database.sqlite_version_info >= (3, 35)):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'UPDATE %s SET change_sequence = change_sequence + %%s WHERE id = %%s RETURNING change_sequence'
+                    % connection.ops.quote_name(Organization._meta.db_table),
+                    [count, organization_id],
+                )
+                row = cursor.fetchone()
+        else:
+            organizations = Organization.objects.using(using).filter(id=organization_id)
+            organizations.update(change_sequence=F('change_sequence') + count)
+            row = organizations.values_list('change_sequence').first()
+
+        if row is None:
+            raise Organization.DoesNotExist('Organization %s does not exist' % organization_id)
+
+        return row[0]
+
+    def lock_organization(self, organization_id):
+        """
+        Take the lock of allocate_sequence without reserving a sequence number, for writes that read
+        the lines first. A transaction that reads before its first write can not take the write lock later
+        on SQLite in WAL mode once another writer committed (SQLITE_BUSY_SNAPSHOT)
+        """
+        self.allocate_sequence(organization_id, 0)
+
+    def change_stats(self, organization_id, lines=0, finished=0, replaced_ids=()):
+        """
+        Add lines to the total and finished to the finished lines of the organization's OrganizationStats,
+        the finished lines among replaced_ids are subtracted as they are in the database.
+
+        Called after allocate_sequence locked the organization and before the lines are written, so the counters
+        move by exactly the difference between the written lines and the lines they replace
+        """
+        using = self._db or router.db_for_write(OrganizationStats)
+        changes = {'total': F('total') + lines, 'finished': F('finished') + finished, 'modified_at': timezone.now()}
+
+        if replaced_ids:
+            replaced_finished = (
+                self.using(using)
+                .filter(organization_id=organization_id, id__in=replaced_ids, is_finished=True)
+                .order_by()
+                .values('organization_id')
+                .annotate(count=Count('id'))
+                .values('count')
+            )
+            changes['finished'] -= Coalesce(Subquery(replaced_finished), 0, output_field=models.BigIntegerField())
+
+        stats = OrganizationStats.objects.using(using).filter(organization_id=organization_id)
+        if not stats.update(**changes):
+            # Organizations created without signals (bulk_create) have no stats yet
+            OrganizationStats.objects.db_manager(using).reconcile([organization_id])
+            stats.update(**changes)
+
+    def send_changed(self, organization_id, created=(), updated=(), deleted=(), sequence=None):
+        todo_list_changed.send(
+            sender=self.model,
+            organization_id=organization_id,
+            created=list(created),
+            updated=list(updated),
+            deleted=list(deleted),
+            sequence=sequence,
+        )
+
+    def bulk_create_lines(self, organization_id, lines, batch_size=None):
+        """
+        Insert the given lines (dicts with text and is_finished) with bulk_create
+        and return the created instances with their primary keys
+        """
+        objs = [ToDoList(organization_id=organization_id, **line) for line in lines]
+        if not objs:
+            return objs
+
+        last_sequence = self.allocate_sequence(organization_id, len(objs))
+        for sequence, obj in enumerate(objs, last_sequence - len(objs) + 1):
+            obj.sequence = sequence
+
+        self.change_stats(organization_id, lines=len(objs), finished=sum(obj.is_finished for obj in objs))
+
+        # Django 3.0 does not cap an explicit batch_size to the backend limit (999 variables on SQLite)
+        fields = [field for field in self.model._meta.concrete_fields if not field.primary_key]
+        max_batch_size = connections[self.db].ops.bulk_batch_size(fields, objs)
+        batch_size = min(batch_size, max_batch_size) if batch_size else max_batch_size
+
+        self.bulk_create(objs, batch_size=batch_size)
+
+        if objs[0].pk is None:
+            # The backend can not return ids from a bulk insert (SQLite with Django 3.0).
+            # The transaction holds the write lock since the first INSERT and ids are autoincremented,
+            # so the newly inserted rows are the ones with the highest ids of the organization
+            ids = self.filter(organization_id=organization_id).order_by('-id').values_list('id', flat=True)
+            for obj, pk in zip(objs, reversed(ids[:len(objs)])):
+                obj.pk = pk
+
+        self.send_changed(organization_id, created=objs, sequence=last_sequence)
+
+        return objs
+
+    def bulk_update_lines(self, organization_id, changes, batch_size=None):
+        """
+        Apply the given changes (dict of line id -> dict of changed fields) with bulk_update
+        and return the updated instances, ids of other organizations are skipped
+        """
+        if not changes:
+            return []
+
+        # Lock the organization before reading the lines, see lock_organization
+        self.lock_organization(organization_id)
+        objs = list(self.filter(organization_id=organization_id, id__in=changes))
+        fields = set()
+
+        for obj in objs:
+            for field, value in changes[obj.id].items():
+                setattr(obj, field, value)
+                fields.add(field)
+
+        if objs and fields:
+            last_sequence = self.allocate_sequence(organization_id, len(objs))
+            for sequence, obj in enumerate(objs, last_sequence - len(objs) + 1):
+                obj.sequence = sequence
+
+            self.change_stats(
+                organization_id, finished=sum(obj.is_finished for obj in objs), replaced_ids=[obj.id for obj in objs],
+            )
+            self.bulk_update(objs, sorted(fields | {'sequence'}), batch_size=batch_size)
+            self.send_changed(organization_id, updated=objs, sequence=last_sequence)
+
+        return objs
+
+    def bulk_delete_lines(self, organization_id, ids):
+        """
+        Delete the lines with the given ids with a single DELETE statement, leave their tombstones
+        and return the ids that were actually deleted
+        """
+        if not ids:
+            return []
+
+        self.lock_organization(organization_id)
+        queryset = self.filter(organization_id=organization_id, id__in=ids)
+        deleted_ids = list(queryset.values_list('id', flat=True))
+
+        if deleted_ids:
+            last_sequence = self.allocate_sequence(organization_id, len(deleted_ids))
+            self.change_stats(organization_id, lines=-len(deleted_ids), replaced_ids=deleted_ids)
+
+            # ToDoList has neither cascades nor delete signal receivers, so this is a fast delete
+            self.filter(id__in=deleted_ids).delete()
+            ToDoListTombstone.objects.bulk_create(
+                ToDoListTombstone(organization_id=organization_id, line_id=line_id, sequence=sequence)
+                for sequence, line_id in enumerate(deleted_ids, last_sequence - len(deleted_ids) + 1)
+            )
+            self.send_changed(organization_id, deleted=deleted_ids, sequence=last_sequence)
+
+        return deleted_ids
+
 
 class ToDoList(models.Model):
     """
@@ -18,6 +214,206 @@ class ToDoList(models.Model):
     organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='todo_list')
     text = models.TextField(max_length=1000)
     is_finished = models.BooleanField(default=False)
+    # The organization's change sequence number of the last write of the line
+    sequence = models.BigIntegerField(default=0, editable=False)
+
+    objects = ToDoListManager()
+
+    class Meta:
+        indexes = [
+            # Serves organization-scoped lists filtered by is_finished and ordered by id without a sort
+            models.Index(fields=['organization', 'is_finished', 'id'], name='todo_list_org_finished_id_idx'),
+            # Serves the change feed of an organization since a sequence number
+            models.Index(fields=['organization', 'sequence'], name='todo_list_org_sequence_idx'),
+        ]
 
     def __str__(self):
         return '%s' % self.id
+
+    def save(self, *args, **kwargs):
+        """
+        Saves the line with the next change sequence number of the organization and updates its stats
+        """
+        using = kwargs.get('using') or router.db_for_write(ToDoList, instance=self)
+        manager = ToDoList.objects.db_manager(using)
+
+        with transaction.atomic(using=using, savepoint=False):
+            self.sequence = manager.allocate_sequence(self.organization_id)
+
+            if self._state.adding:
+                manager.change_stats(self.organization_id, lines=1, finished=int(self.is_finished))
+            elif kwargs.get('update_fields') is None or 'is_finished' in kwargs['update_fields']:
+                manager.change_stats(self.organization_id, finished=int(self.is_finished), replaced_ids=[self.pk])
+            else:
+                manager.change_stats(self.organization_id)
+
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = set(kwargs['update_fields']) | {'sequence'}
+
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        """
+        Deletes the line, leaves its tombstone and sends todo_list_changed. A post_delete receiver is not used
+        on purpose: any delete signal receiver disables fast deletes of ToDoList rows, including the cascade
+        from Organization
+        """
+        line_id, organization_id = self.id, self.organization_id
+        using = kwargs.get('using') or router.db_for_write(ToDoList, instance=self)
+
+        manager = ToDoList.objects.db_manager(using)
+
+        with transaction.atomic(using=using, savepoint=False):
+            sequence = manager.allocate_sequence(organization_id)
+            manager.change_stats(organization_id, lines=-1, replaced_ids=[line_id])
+            result = super().delete(*args, **kwargs)
+            ToDoListTombstone.objects.using(using).create(
+                organization_id=organization_id, line_id=line_id, sequence=sequence,
+            )
+
+        ToDoList.objects.send_changed(organization_id, deleted=[line_id], sequence=sequence)
+
+        return result
+
+
+class ToDoListTombstone(models.Model):
+    """
+    A table representing deleted lines of ToDoList for the change feed
+    """
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='todo_list_tombstones')
+    line_id = models.IntegerField()
+    sequence = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['organization', 'sequence'], name='todo_list_tombstone_seq_idx'),
+        ]
+
+    def __str__(self):
+        return '%s' % self.line_id
+
+
+class OrganizationStatsManager(models.Manager):
+    def reconcile(self, organization_ids):
+        """
+        Count the lines of the given organizations and write their stats, return the number of stats rows
+        that were missing or wrong. Expected to be called inside a transaction, the organizations are locked
+        like writers lock them, so concurrent writes wait for the counts
+        """
+        organization_ids = list(
+            Organization.objects.using(self.db).select_for_update().filter(id__in=organization_ids)
+            .order_by('id').values_list('id', flat=True)
+        )
+        counts = {
+            row['organization_id']: row for row in
+            ToDoList.objects.using(self.db)
+            .filter(organization_id__in=organization_ids)
+            .order_by()
+            .values('organization_id')
+            .annotate(total=Count('id'), finished=Count('id', filter=Q(is_finished=True)))
+        }
+        existing = {stats.organization_id: stats for stats in self.filter(organization_id__in=organization_ids)}
+
+        created, updated = [], []
+        for organization_id in organization_ids:
+            count = counts.get(organization_id, {'total': 0, 'finished': 0})
+            stats = existing.get(organization_id)
+
+            if stats is None:
+                created.append(OrganizationStats(
+                    organization_id=organization_id, total=count['total'], finished=count['finished'],
+                ))
+            elif (stats.total, stats.finished) != (count['total'], count['finished']):
+                stats.total, stats.finished = count['total'], count['finished']
+                updated.append(stats)
+
+        self.bulk_create(created)
+        self.bulk_update(updated, ['total', 'finished'])
+
+        return len(created) + len(updated)
+
+
+class OrganizationStats(models.Model):
+    """
+    A table representing line counters of organizations, maintained by every write of ToDoList lines
+    (see ToDoListManager.change_stats) and rebuilt by manage.py reconcile_stats
+    """
+    organization = models.OneToOneField(Organization, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    total = models.BigIntegerField(default=0)
+    finished = models.BigIntegerField(default=0)
+    modified_at = models.DateTimeField(null=True)
+
+    objects = OrganizationStatsManager()
+
+    class Meta:
+        verbose_name_plural = 'organization stats'
+
+    def __str__(self):
+        return '%s' % self.organization_id
+
+    @property
+    def open(self):
+        return self.total - self.finished
+
+
+class OrganizationPurgeManager(models.Manager):
+    def start(self, organization, owner_id=None):
+        """
+        Return the unfinished purge of the organization, a new pending one of owner_id if there is none
+        """
+        purges = self.filter(organization_id=organization.id).exclude(status=OrganizationPurge.FINISHED)
+
+        purge = purges.first()
+        if purge is not None:
+            return purge
+
+        try:
+            with transaction.atomic(using=self.db):
+                return self.create(
+                    organization_id=organization.id, organization_name=organization.name, owner_id=owner_id,
+                )
+        except IntegrityError:
+            # Started by a concurrent request
+            return purges.get()
+
+
+class OrganizationPurge(models.Model):
+    """
+    A table representing deletions of organizations with all their data in batches (see todo_lists.purge),
+    the row outlives the organization, so it keeps the progress of a purge and the step to resume it from
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    FINISHED = 'finished'
+    STATUSES = [(PENDING, 'Pending'), (RUNNING, 'Running'), (FAILED, 'Failed'), (FINISHED, 'Finished')]
+
+    organization_id = models.IntegerField()
+    organization_name = models.CharField(max_length=100)
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
+    # The step of todo_lists.purge.STEPS being run or to resume from
+    step = models.CharField(max_length=20, blank=True)
+    lines = models.BigIntegerField(default=0)
+    tombstones = models.BigIntegerField(default=0)
+    users = models.BigIntegerField(default=0)
+    error = models.TextField(blank=True)
+    # The jobs.Job running the purge in the background, if any
+    job_id = models.IntegerField(null=True)
+    # The organization that requested the purge through the API, it can read the purge as well as the purged one
+    owner_id = models.IntegerField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Moved by every batch, a running purge not updated for TODO_LIST_PURGE['STALE_AFTER'] seconds was interrupted
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True)
+
+    objects = OrganizationPurgeManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['organization_id'], condition=~Q(status='finished'), name='todo_list_purge_org_active_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return '%s' % self.organization_name
@@ -0,0 +1,164 @@
+"""
+Deletion of an organization with all its data in bounded batches, recorded in an OrganizationPurge row.
+
+Deleting an organization with the ORM cascades to every line in a single DELETE, which holds its locks and
+grows the journal (WAL) with the size of the organization. A purge runs the STEPS in order instead, each batch
+in a transaction of its own together with the progress of the purge:
+
+- the users of the organization are deactivated, so they can not log in or get tokens any more. The update sends
+  no signals, so their cached credentials (users.cache) are dropped explicitly, in this process; other processes
+  notice within AUTH_USER_CACHE['TTL']
+- lines and tombstones are deleted with DELETE ... WHERE id IN (SELECT id ... LIMIT n), no rows are read
+  into memory
+- users are deleted with the ORM, a batch at a time, for the cascades and the signals of the user model
+- the organization row is deleted last with the ORM, with its stats and the lines written since the purge started
+
+Every step deletes whatever is left of the organization, so an interrupted purge resumes from its recorded step
+(by the job queue or manage.py purge_organization --resume) and a step run twice does no harm
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, router, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from jobs.models import Job
+from users.cache import users_by_credentials
+from .models import Organization, OrganizationPurge, ToDoList, ToDoListTombstone
+
+STEPS = ('lines', 'tombstones', 'users', 'organization')
+
+
+def resumable():
+    """
+    Return the filter of the purges that can be run: pending, failed and running ones whose progress did not move
+    for TODO_LIST_PURGE['STALE_AFTER'] seconds, as they were interrupted
+    """
+    stale = timezone.now() - timedelta(seconds=settings.TODO_LIST_PURGE['STALE_AFTER'])
+
+    return (
+        Q(status__in=[OrganizationPurge.PENDING, OrganizationPurge.FAILED]) |
+        Q(status=OrganizationPurge.RUNNING, updated_at__lt=stale)
+    )
+
+
+def claim(purge_id, using):
+    """
+    Mark the purge running and return True, False when it is finished or run by someone else
+    """
+    return bool(
+        OrganizationPurge.objects.using(using).filter(resumable(), pk=purge_id)
+        .update(status=OrganizationPurge.RUNNING, error='', updated_at=timezone.now())
+    )
+
+
+def delete_batch(model, organization_id, batch_size, using):
+    """
+    Delete at most batch_size rows of the organization from the table of the model and return their number
+    """
+    connection = connections[using]
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = connection.ops.quote_name(model._meta.get_field('organization').column)
+
+    with connection.cursor() as cursor:
+        # No ORDER BY: the first rows of the organization's index are deleted, without sorting all of them
+        cursor.execute(
+            'DELETE FROM %s WHERE id IN (SELECT id FROM %s WHERE %s = %%s LIMIT %%s)' % (table, table, column),
+            [organization_id, batch_size],
+        )
+        return cursor.rowcount
+
+
+def delete_users_batch(organization_id, batch_size, using):
+    user_model = get_user_model()
+    users = user_model.objects.using(using)
+    ids = list(users.filter(organization_id_id=organization_id).values_list('id', flat=True)[:batch_size])
+
+    if ids:
+        users.filter(id__in=ids).delete()
+
+    return len(ids)
+
+
+def run_purge(purge_id, batch_size=None, pause=None, progress=None):
+    """
+    Run the purge from its recorded step, return False when it could not be claimed (see claim).
+    Sleeps pause seconds between batches to leave room to other writers, progress(purge) is called after
+    every batch. A failure is recorded in the purge and raised
+    """
+    batch_size = batch_size or settings.TODO_LIST_PURGE['BATCH_SIZE']
+    pause = settings.TODO_LIST_PURGE['PAUSE'] if pause is None else pause
+    using = router.db_for_write(OrganizationPurge)
+
+    if not claim(purge_id, using):
+        return False
+
+    purges = OrganizationPurge.objects.using(using).filter(pk=purge_id)
+    purge = purges.get()
+    organization_id = purge.organization_id
+
+    batches = {
+        'lines': lambda: delete_batch(ToDoList, organization_id, batch_size, using),
+        'tombstones': lambda: delete_batch(ToDoListTombstone, organization_id, batch_size, using),
+        'users': lambda: delete_users_batch(organization_id, batch_size, using),
+    }
+
+    try:
+        get_user_model().objects.using(using).filter(organization_id_id=organization_id).update(is_active=False)
+        users_by_credentials.invalidate_organization(organization_id)
+
+        for step in STEPS[STEPS.index(purge.step) if purge.step else 0:]:
+            purges.update(step=step, updated_at=timezone.now())
+
+            if step == 'organization':
+                with transaction.atomic(using=using):
+                    organization = Organization.objects.using(using).filter(id=organization_id).first()
+                    if organization is not None:
+                        organization.delete()
+                    purges.update(status=OrganizationPurge.FINISHED, finished_at=timezone.now())
+                break
+
+            while True:
+                with transaction.atomic(using=using):
+                    deleted = batches[step]()
+                    purges.update(**{step: F(step) + deleted, 'updated_at': timezone.now()})
+
+                if progress is not None:
+                    progress(purges.get())
+
+                if deleted < batch_size:
+                    break
+
+                if pause:
+                    time.sleep(pause)
+    except Exception as error:
+        purges.update(status=OrganizationPurge.FAILED, error=repr(error)[:1000])
+        raise
+
+    if progress is not None:
+        progress(purges.get())
+
+    return True
+
+
+def start_purge(organization, owner_id=None):
+    """
+    Start (or return the unfinished) purge of the organization. It is queued as a todo_lists.purge job
+    readable by the owner organization (see todo_lists.tasks), or run right away when
+    TODO_LIST_PURGE['BACKGROUND'] is off
+    """
+    purge = OrganizationPurge.objects.start(organization, owner_id)
+
+    if settings.TODO_LIST_PURGE['BACKGROUND']:
+        if not Job.objects.filter(id=purge.job_id, status__in=[Job.QUEUED, Job.RUNNING]).exists():
+            job = Job.objects.enqueue('todo_lists.purge', {'purge_id': purge.id}, organization_id=owner_id)
+            OrganizationPurge.objects.filter(id=purge.id).update(job_id=job.id)
+            purge.job_id = job.id
+    else:
+        run_purge(purge.id)
+        purge.refresh_from_db()
+
+    return purge
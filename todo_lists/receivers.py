@@ -0,0 +1,36 @@
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from .cache import organization_ids
+from .models import Organization, OrganizationStats, ToDoList
+
+
+@receiver(post_save, sender=Organization)
+@receiver(post_delete, sender=Organization)
+def invalidate_organization_id(sender, instance, **kwargs):
+    """
+    Organization was renamed, created or deleted, so its cached name is no longer valid
+    """
+    organization_ids.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=Organization)
+def create_organization_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        OrganizationStats.objects.create(organization=instance)
+
+
+@receiver(post_migrate)
+def clear_organization_ids(sender, **kwargs):
+    """
+    Tables were migrated or flushed (flush emits post_migrate), cached ids may point to removed rows
+    """
+    organization_ids.clear()
+
+
+@receiver(post_save, sender=ToDoList)
+def send_todo_list_changed(sender, instance, created, **kwargs):
+    if created:
+        ToDoList.objects.send_changed(instance.organization_id, created=[instance], sequence=instance.sequence)
+    else:
+        ToDoList.objects.send_changed(instance.organization_id, updated=[instance], sequence=instance.sequence)
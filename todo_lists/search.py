@@ -0,0 +1,66 @@
+"""
+Full-text search of ToDoList.text within an organization.
+
+SQLite: the FTS5 table todo_lists_todolist_fts indexes the text and the organization id of every line, it is an
+external content table kept in sync by triggers on todo_lists_todolist, so set-based writes, fast deletes and the
+cascade from Organization are indexed as well. The organization is a term of the MATCH expression, so a search
+only reads the index entries of its words within the organization, results are ranked with bm25.
+
+PostgreSQL: a GIN index on to_tsvector('simple', text), results are ranked with ts_rank.
+
+Both backends tokenize without stemming and find the lines containing every word of the query.
+Other backends fall back to an unindexed icontains filter
+"""
+import re
+
+from django.db import connections
+from django.db.models.expressions import RawSQL
+
+
+FTS_TABLE = 'todo_lists_todolist_fts'
+TS_CONFIG = 'simple'
+
+WORD_RE = re.compile(r'\w+')
+
+
+def search_words(query):
+    return WORD_RE.findall(query.lower())
+
+
+def search(queryset, query, organization_id):
+    """
+    Return the lines of the organization in the queryset containing every word of the query, the most relevant first
+    """
+    queryset = queryset.filter(organization_id=organization_id)
+
+    words = search_words(query)
+    if not words:
+        return queryset.none()
+
+    vendor = connections[queryset.db].vendor
+    table = queryset.model._meta.db_table
+
+    if vendor == 'sqlite':
+        match = 'organization_id : "%s" AND text : (%s)' % (
+            int(organization_id), ' AND '.join('"%s"' % word for word in words),
+        )
+
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=['%s.rowid = %s.id' % (FTS_TABLE, table), '%s MATCH %%s' % FTS_TABLE],
+            params=[match],
+        ).order_by(RawSQL('%s.rank' % FTS_TABLE, ()), 'id')
+
+    if vendor == 'postgresql':
+        text = ' '.join(words)
+        vector = "to_tsvector('%s', %s.text)" % (TS_CONFIG, table)
+        tsquery = "plainto_tsquery('%s', %%s)" % TS_CONFIG
+
+        return queryset.extra(
+            where=['%s @@ %s' % (vector, tsquery)], params=[text],
+        ).order_by(RawSQL('ts_rank(%s, %s)' % (vector, tsquery), (text,)).desc(), 'id')
+
+    for word in words:
+        queryset = queryset.filter(text__icontains=word)
+
+    return queryset.order_by('id')
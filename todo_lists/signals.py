@@ -0,0 +1,8 @@
+from django.dispatch import Signal
+
+
+# Sent after ToDoList lines of an organization were written, including the set-based writes of
+# ToDoListManager that bypass model signals. Arguments: organization_id, created and updated (lists of
+# ToDoList instances), deleted (list of ids) and sequence (the last change sequence number of the write).
+# Receivers run inside the writing transaction, if any
+todo_list_changed = Signal()
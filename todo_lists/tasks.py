@@ -0,0 +1,16 @@
+from jobs.registry import task
+from .models import OrganizationPurge
+from .purge import run_purge
+
+
+@task('todo_lists.purge')
+def purge(job, purge_id):
+    """
+    Run the purge, every batch extends the visibility timeout of the job
+    """
+    if not run_purge(purge_id, progress=lambda purge: job.touch()):
+        if not OrganizationPurge.objects.filter(id=purge_id, status=OrganizationPurge.FINISHED).exists():
+            # Retried once the purge of a dead worker is stale
+            raise RuntimeError('Purge %s is run by another process' % purge_id)
+
+    return {'purge_id': purge_id}
@@ -1,22 +1,95 @@
 from django.contrib.auth.backends import ModelBackend
+from django.utils.crypto import get_random_string
 
+from todo_lists.cache import organization_ids
+from .cache import users_by_credentials
+from .hashers import (
+    check_password,
+    check_password_async,
+    make_password,
+    verify_password,
+    verify_password_async,
+)
 from .models import CustomUser
 
 
 class CustomBackend(ModelBackend):
     """
-    Class that overrides default authentication backend
+    Class that overrides default authentication backend.
+
+    Credentials are resolved through the (organization_id, email) unique index with at most one query:
+    by organization_id when the organization name is cached, otherwise joined by organization name.
+    Unknown credentials are checked against a dummy hash, so a miss costs the same as a wrong password.
+    Hashing runs in the hasher pool and outdated hashes are upgraded on successful login (see users.hashers)
     """
+    _dummy_password = None
+
     def authenticate(self, request, **kwargs):
         email = kwargs.get('email')
         organization = kwargs.get('organization')
         password = kwargs.get('password')
 
-        try:
-            user = CustomUser.objects.get(email=email, organization=organization)
+        if email is None or organization is None or password is None:
+            return None
+
+        user = self.get_user_by_credentials(email, organization)
+
+        if user is None:
+            self.check_dummy_password(password)
+            return None
+
+        if verify_password(user, password) and self.user_can_authenticate(user):
+            users_by_credentials.set(user)
+            return user
+
+    async def authenticate_async(self, run_sync, email=None, organization=None, password=None):
+        """
+        Coroutine variant of authenticate for the ASGI API: queries are made through run_sync,
+        a coroutine function running a blocking callable in a database thread pool, and hashing
+        awaits the hasher pool
+        """
+        if email is None or organization is None or password is None:
+            return None
+
+        user = await run_sync(self.get_user_by_credentials, email, organization)
+
+        if user is None:
+            await check_password_async(password, self.get_dummy_password())
+            return None
 
-            if getattr(user, 'is_active') and user.check_password(password):
+        if await verify_password_async(user, password, run_sync) and self.user_can_authenticate(user):
+            users_by_credentials.set(user)
+            return user
+
+    def get_user_by_credentials(self, email, organization):
+        """
+        Return the user with the given email and organization name or None
+        """
+        organization_id = organization_ids.get_cached_id(organization)
+
+        if organization_id is not None:
+            user = users_by_credentials.get(organization_id, email)
+            if user is not None:
                 return user
 
-        except CustomUser.DoesNotExist:
-            pass
+            return CustomUser.objects.filter(organization_id=organization_id, email=email).first()
+
+        user = CustomUser.objects.filter(organization_id__name=organization, email=email).first()
+        if user is not None:
+            organization_ids.remember(organization, user.organization_id_id)
+
+        return user
+
+    @classmethod
+    def get_dummy_password(cls):
+        if cls._dummy_password is None:
+            cls._dummy_password = make_password(get_random_string(32))
+
+        return cls._dummy_password
+
+    @classmethod
+    def check_dummy_password(cls, password):
+        """
+        Run the password hasher once against a random hash to hide whether the user exists
+        """
+        check_password(password, cls.get_dummy_password())
@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class UserLookupCache:
+    """
+    Process-local LRU of recent successful credential lookups with a TTL.
+
+    Keys are (organization_id, email) pairs. Only the column values are kept, every hit builds
+    a fresh CustomUser instance so requests never share a mutable object. Entries are dropped
+    by CustomUser save/delete signals (see users.receivers), the TTL bounds how long a change made
+    by another process can go unnoticed
+    """
+    def __init__(self, max_size=None, ttl=None):
+        self._max_size = max_size
+        self._ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def max_size(self):
+        return settings.AUTH_USER_CACHE['MAX_SIZE'] if self._max_size is None else self._max_size
+
+    @property
+    def ttl(self):
+        return settings.AUTH_USER_CACHE['TTL'] if self._ttl is None else self._ttl
+
+    def get(self, organization_id, email):
+        """
+        Return a CustomUser built from the cached row or None
+        """
+        key = (organization_id, email)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires, _, model, db, field_names, values = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+
+        return model.from_db(db, field_names, values)
+
+    def set(self, user):
+        if self.max_size <= 0:
+            return
+
+        key = (user.organization_id_id, user.email)
+        field_names = [field.attname for field in user._meta.concrete_fields]
+        entry = (
+            time.monotonic() + self.ttl,
+            user.pk,
+            type(user),
+            user._state.db,
+            field_names,
+            [getattr(user, name) for name in field_names],
+        )
+
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry[1] == user_id]:
+                del self._entries[key]
+
+    def invalidate_organization(self, organization_id):
+        """
+        Drop the users of an organization, for updates that send no CustomUser signals
+        """
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == organization_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+users_by_credentials = UserLookupCache()
@@ -0,0 +1,193 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """
+    PBKDF2 hasher with the number of iterations taken from settings.PASSWORD_HASHING
+    """
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASHING['PBKDF2_ITERATIONS']
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """
+    Argon2 hasher with the time cost, memory cost and parallelism taken from settings.PASSWORD_HASHING
+    """
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_HASHING['ARGON2_TIME_COST']
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_HASHING['ARGON2_MEMORY_COST']
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_HASHING['ARGON2_PARALLELISM']
+
+
+class BCryptSHA256PasswordHasher(hashers.BCryptSHA256PasswordHasher):
+    """
+    BCrypt hasher with the number of rounds taken from settings.PASSWORD_HASHING
+    """
+    @property
+    def rounds(self):
+        return settings.PASSWORD_HASHING['BCRYPT_ROUNDS']
+
+
+class HashingOverloaded(Exception):
+    """
+    All the slots of the hasher pool are taken, the password check is refused instead of waiting
+    """
+
+
+class HasherPool:
+    """
+    Bounded pool of threads running password hashing off the request thread.
+
+    The hashing libraries release the GIL, so WORKERS threads hash in parallel while at most
+    WORKERS + QUEUE_SIZE hashes are in flight. Further callers fail fast with HashingOverloaded,
+    so a burst of logins can not take every request thread (answered with 503, see api.throttling).
+    With WORKERS set to 0 hashing runs inline
+    """
+    def __init__(self):
+        self._executor = None
+        self._max_in_flight = 0
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.shed = 0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None and settings.PASSWORD_HASHING['WORKERS'] > 0:
+                workers = settings.PASSWORD_HASHING['WORKERS']
+                self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hasher')
+                self._max_in_flight = workers + settings.PASSWORD_HASHING['QUEUE_SIZE']
+
+            return self._executor
+
+    def _acquire(self):
+        with self._lock:
+            if self.in_flight >= self._max_in_flight:
+                self.shed += 1
+                raise HashingOverloaded('%s password hashes are already in flight' % self.in_flight)
+
+            self.in_flight += 1
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def run(self, func, *args):
+        """
+        Run func(*args) in the pool and wait for the result
+        """
+        executor = self._get_executor()
+        if executor is None:
+            return func(*args)
+
+        self._acquire()
+        try:
+            return executor.submit(func, *args).result()
+        finally:
+            self._release()
+
+    async def run_async(self, func, *args):
+        """
+        Run func(*args) in the pool without blocking the event loop
+        """
+        executor = self._get_executor()
+        if executor is None:
+            return func(*args)
+
+        self._acquire()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+        finally:
+            self._release()
+
+    def stats(self):
+        with self._lock:
+            return {'in_flight': self.in_flight, 'shed': self.shed}
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+hasher_pool = HasherPool()
+
+
+@receiver(setting_changed)
+def reset_hasher_pool(setting, **kwargs):
+    if setting == 'PASSWORD_HASHING':
+        hasher_pool.shutdown()
+
+
+def _check_password(password, encoded):
+    """
+    Return whether the password matches the hash and whether the hash should be upgraded
+    """
+    must_update = []
+    is_correct = hashers.check_password(password, encoded, setter=lambda raw_password: must_update.append(True))
+
+    return is_correct, bool(must_update)
+
+
+def make_password(password):
+    """
+    Hash the password with the preferred hasher in the hasher pool
+    """
+    return hasher_pool.run(hashers.make_password, password)
+
+
+def check_password(password, encoded):
+    """
+    Check the password against the hash in the hasher pool
+    """
+    return hasher_pool.run(_check_password, password, encoded)[0]
+
+
+def verify_password(user, password):
+    """
+    Check the user's password in the hasher pool and transparently rehash it with the preferred
+    hasher and cost when it is correct but was hashed with another algorithm or cost
+    """
+    is_correct, must_update = hasher_pool.run(_check_password, password, user.password)
+
+    if is_correct and must_update:
+        user.password = make_password(password)
+        user.save(update_fields=['password'])
+
+    return is_correct
+
+
+async def check_password_async(password, encoded):
+    """
+    Coroutine variant of check_password, the event loop is not blocked while hashing
+    """
+    return (await hasher_pool.run_async(_check_password, password, encoded))[0]
+
+
+async def verify_password_async(user, password, run_sync):
+    """
+    Coroutine variant of verify_password, the rehashed password is saved through run_sync,
+    a coroutine function running a blocking callable in a database thread pool
+    """
+    is_correct, must_update = await hasher_pool.run_async(_check_password, password, user.password)
+
+    if is_correct and must_update:
+        user.password = await hasher_pool.run_async(hashers.make_password, password)
+        await run_sync(user.save, update_fields=['password'])
+
+    return is_correct
@@ -0,0 +1,21 @@
+# Generated by Django 3.0.7 on 2026-10-18 17:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='customuser',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='customuser',
+            constraint=models.UniqueConstraint(fields=('organization_id', 'email'), name='users_customuser_org_email_uniq'),
+        ),
+    ]
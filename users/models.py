@@ -3,6 +3,7 @@ from django.contrib.auth.models import PermissionsMixin
 from django.core.exceptions import ValidationError
 from django.db import models
 
+from todo_lists.cache import organization_ids
 from todo_lists.models import Organization
 
 
@@ -21,15 +22,14 @@ class CustomUserManager(BaseUserManager):
         if not organization:
             raise ValueError('Users must have an organization name')
 
-        try:
-            organization_obj = Organization.objects.get(name=organization)
-        except Organization.DoesNotExist:
+        organization_id = organization_ids.get_id(organization)
+        if organization_id is None:
             raise ValueError('You can not register a user if his organization does not exist')
 
         user = self.model(
             email=self.normalize_email(email),
             organization=organization,
-            organization_id=organization_obj,
+            organization_id_id=organization_id,
         )
 
         user.set_password(password)
@@ -73,23 +73,39 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     objects = CustomUserManager()
 
     class Meta:
-        unique_together = ['email', 'organization']
+        constraints = [
+            # Also the index used by authentication, see users.backends.CustomBackend
+            models.UniqueConstraint(fields=['organization_id', 'email'], name='users_customuser_org_email_uniq'),
+        ]
 
     def __str__(self):
         return self.email + ' - ' + self.organization
 
-    def save(self, *args, **kwargs):
+    def validate_unique(self, exclude=None):
         """
-        Additional validation that user has valid organization_id corresponding to organization name
+        Additional validation of the (organization_id, email) constraint for model forms
         """
-        try:
-            organization_obj = Organization.objects.get(name=self.organization)
-        except Organization.DoesNotExist:
-            raise ValidationError(
-                {'validation_error': "User's organization does not exist"}
-            )
+        super().validate_unique(exclude=exclude)
+
+        if exclude and ('email' in exclude or 'organization' in exclude):
+            return
 
+        users = CustomUser.objects.filter(email=self.email, organization=self.organization).exclude(pk=self.pk)
+        if users.exists():
+            raise ValidationError({'email': 'User with this email already exists in the organization'})
+
+    def save(self, *args, **kwargs):
+        """
+        Additional validation that user has valid organization_id corresponding to organization name,
+        the organization is looked up only when organization_id is not set yet
+        """
         if self.organization_id_id is None:
-            self.organization_id = organization_obj
+            organization_id = organization_ids.get_id(self.organization)
+            if organization_id is None:
+                raise ValidationError(
+                    {'validation_error': "User's organization does not exist"}
+                )
+
+            self.organization_id_id = organization_id
 
         super().save(*args, **kwargs)
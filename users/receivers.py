@@ -0,0 +1,26 @@
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from .cache import users_by_credentials
+from .models import CustomUser
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_user_on_save(sender, instance, update_fields=None, **kwargs):
+    """
+    Drop the cached credentials of a changed user, the last_login update done by every login is ignored
+    """
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+
+    users_by_credentials.invalidate(instance.pk)
+
+
+@receiver(post_delete, sender=CustomUser)
+def invalidate_user_on_delete(sender, instance, **kwargs):
+    users_by_credentials.invalidate(instance.pk)
+
+
+@receiver(post_migrate)
+def clear_users_by_credentials(sender, **kwargs):
+    users_by_credentials.clear()